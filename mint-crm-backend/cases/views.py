@@ -14,19 +14,23 @@ from .serializers import (
 )
 from .permissions import CasePermission
 from .services import CaseService, EmailService
+from api.exports import ExportMixin
+from contacts.hierarchy import CompanyGroupFilter
 
-class CaseViewSet(viewsets.ModelViewSet):
+class CaseViewSet(ExportMixin, viewsets.ModelViewSet):
     """ViewSet for Case model with advanced features"""
     queryset = Case.objects.select_related(
         'customer', 'company', 'assigned_to', 'created_by'
     ).prefetch_related('responses', 'attachments')
     serializer_class = CaseSerializer
     permission_classes = [permissions.IsAuthenticated, CasePermission]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, CompanyGroupFilter, SearchFilter, OrderingFilter]
     filterset_fields = [
         'status', 'priority', 'category', 'source', 'assigned_to', 
         'customer', 'company', 'created_by'
     ]
+    # A case is in a group through its own company or its customer's company
+    company_group_lookups = ['company', 'customer__company']
     search_fields = [
         'case_number', 'title', 'description'
     ]
@@ -34,6 +38,15 @@ class CaseViewSet(viewsets.ModelViewSet):
         'created_at', 'updated_at', 'due_date', 'priority', 'status'
     ]
     ordering = ['-priority', '-created_at']
+    export_name = 'cases'
+    export_fields = [
+        ('case_number', 'case_number'), ('title', 'title'), ('category', 'category'),
+        ('priority', 'priority'), ('status', 'status'), ('source', 'source'),
+        ('customer_email', 'customer__email'), ('company', 'company__name'),
+        ('assigned_to', 'assigned_to__email'), ('created_by', 'created_by__email'),
+        ('created_at', 'created_at'), ('due_date', 'due_date'), ('resolved_at', 'resolved_at'),
+        ('resolution_time', 'resolution_time'), ('tags', 'tags'),
+    ]
     
     def get_serializer_class(self):
         if self.action == 'create':
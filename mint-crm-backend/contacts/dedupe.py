@@ -0,0 +1,236 @@
+"""Duplicate contact detection and merging.
+
+Contacts are only compared with contacts that share one of their blocking
+keys (see ``BLOCKS``). Blocks are found with GROUP BY queries on the indexed
+key columns and blocks larger than ``CONTACT_DEDUPE_MAX_BLOCK_SIZE`` are
+skipped, so the number of comparisons follows the number of likely duplicates
+instead of growing with the square of the table.
+"""
+import logging
+from functools import reduce
+from itertools import combinations
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+
+from cases.models import Case
+from emails.models import SMS
+from meetings.models import Meeting
+
+from .models import CompanyStats, Contact, DuplicateSuggestion
+
+logger = logging.getLogger(__name__)
+
+# Key columns contacts are grouped on. The domain + name block still catches
+# same-company duplicates when a common name is too frequent to block on alone.
+BLOCKS = [
+    ('phone_e164',),
+    ('mobile_e164',),
+    ('email_local',),
+    ('email_domain', 'name_soundex'),
+    ('name_soundex',),
+]
+
+COMPARE_FIELDS = [
+    'id', 'first_name', 'last_name', 'email_local', 'email_domain', 'name_soundex',
+    'phone_e164', 'mobile_e164', 'company_id',
+]
+
+# Blank fields on the kept contact are filled from the merged duplicates
+MERGE_FILL_FIELDS = [
+    'title', 'phone', 'mobile', 'company', 'job_title', 'department', 'address',
+    'city', 'state', 'country', 'postal_code', 'birthday', 'linkedin_url', 'twitter_handle',
+]
+
+
+def score_pair(a, b):
+    """Likelihood in [0, 1] that two contacts (``COMPARE_FIELDS`` dicts) are one person"""
+    score = 0.0
+    reasons = []
+
+    if a['email_local'] and a['email_local'] == b['email_local']:
+        if a['email_domain'] == b['email_domain']:
+            score += 0.6
+            reasons.append('email')
+        else:
+            score += 0.3
+            reasons.append('email_local')
+
+    phones = {a['phone_e164'], a['mobile_e164']} - {''}
+    if phones & {b['phone_e164'], b['mobile_e164']}:
+        score += 0.4
+        reasons.append('phone')
+
+    same_name = (
+        f"{a['first_name']} {a['last_name']}".strip().casefold() ==
+        f"{b['first_name']} {b['last_name']}".strip().casefold()
+    )
+    if same_name:
+        score += 0.3
+        reasons.append('name')
+    elif a['name_soundex'] and a['name_soundex'] == b['name_soundex']:
+        score += 0.15
+        reasons.append('name_soundex')
+
+    if a['company_id'] and a['company_id'] == b['company_id']:
+        score += 0.1
+        reasons.append('company')
+
+    return min(round(score, 2), 1.0), reasons
+
+
+class DuplicateFinder:
+    """Find likely duplicate contacts block by block and store them as suggestions"""
+
+    def __init__(self, contacts=None, max_block_size=None, min_score=None, batch_size=500):
+        # ``contacts`` limits the search to the blocks those contacts belong to
+        self.contacts = contacts
+        self.max_block_size = max_block_size or settings.CONTACT_DEDUPE_MAX_BLOCK_SIZE
+        self.min_score = min_score if min_score is not None else settings.CONTACT_DEDUPE_MIN_SCORE
+        self.batch_size = batch_size
+        self.stats = {'blocks': 0, 'skipped_blocks': 0, 'comparisons': 0, 'suggestions': 0}
+        # Pairs sharing several keys are found once per block type
+        self.pairs = set()
+
+    def run(self):
+        for columns in BLOCKS:
+            keys = []
+            for key in self.iter_block_keys(columns):
+                keys.append(key)
+                if len(keys) >= self.batch_size:
+                    self.process_blocks(columns, keys)
+                    keys = []
+            if keys:
+                self.process_blocks(columns, keys)
+        return self.stats
+
+    def iter_block_keys(self, columns):
+        """Key tuples shared by 2 to ``max_block_size`` contacts"""
+        queryset = Contact.objects.all()
+        for column in columns:
+            queryset = queryset.exclude(**{column: ''})
+            if self.contacts is not None:
+                queryset = queryset.filter(**{f'{column}__in': self.contacts.values(column)})
+
+        groups = (
+            queryset.order_by().values(*columns)
+            .annotate(size=Count('id'))
+            .filter(size__gt=1)
+            .values_list(*columns, 'size')
+        )
+        for *key, size in groups.iterator(chunk_size=self.batch_size):
+            if size > self.max_block_size:
+                self.stats['skipped_blocks'] += 1
+                logger.info(f"Skipping duplicate block {dict(zip(columns, key))} of {size} contacts")
+                continue
+            yield tuple(key)
+
+    def process_blocks(self, columns, keys):
+        if len(columns) == 1:
+            members = Contact.objects.filter(**{f'{columns[0]}__in': [key[0] for key in keys]})
+        else:
+            members = Contact.objects.filter(reduce(or_, (Q(**dict(zip(columns, key))) for key in keys)))
+
+        blocks = {}
+        for row in members.order_by('id').values(*COMPARE_FIELDS):
+            blocks.setdefault(tuple(row[column] for column in columns), []).append(row)
+
+        found = {}
+        for block in blocks.values():
+            self.stats['blocks'] += 1
+            for a, b in combinations(block, 2):
+                self.stats['comparisons'] += 1
+                score, reasons = score_pair(a, b)
+                if score >= self.min_score:
+                    found[(a['id'], b['id'])] = (score, reasons)
+        self.save(found)
+
+    def save(self, found):
+        """Upsert suggestions; a dismissed pair keeps its status"""
+        if not found:
+            return
+        DuplicateSuggestion.objects.bulk_create(
+            [
+                DuplicateSuggestion(contact_id=contact_id, duplicate_id=duplicate_id, score=score, reasons=reasons)
+                for (contact_id, duplicate_id), (score, reasons) in found.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['contact', 'duplicate'],
+            update_fields=['score', 'reasons', 'updated_at'],
+        )
+        self.pairs.update(found)
+        self.stats['suggestions'] = len(self.pairs)
+
+
+def find_duplicates(contacts=None, **options):
+    """Refresh duplicate suggestions; returns the run statistics"""
+    return DuplicateFinder(contacts, **options).run()
+
+
+def merge_contacts(primary, duplicates):
+    """Merge ``duplicates`` into ``primary`` and delete them.
+
+    Cases, SMS messages and meetings are re-pointed with one UPDATE per table,
+    blank fields on ``primary`` are filled from the duplicates and opt-outs are
+    kept. Returns the number of re-pointed rows per relation.
+    """
+    duplicate_ids = [contact.id for contact in duplicates if contact.id != primary.id]
+    if not duplicate_ids:
+        return {}
+
+    with transaction.atomic():
+        primary = Contact.objects.select_for_update().get(id=primary.id)
+        duplicates = list(
+            Contact.objects.select_for_update().filter(id__in=duplicate_ids).order_by('-updated_at')
+        )
+        duplicate_ids = [contact.id for contact in duplicates]
+
+        moved = {
+            'cases': Case.objects.filter(customer_id__in=duplicate_ids).update(customer=primary),
+            'sms_messages': SMS.objects.filter(contact_id__in=duplicate_ids).update(contact=primary),
+            'meetings': Meeting.objects.filter(contact_id__in=duplicate_ids).update(contact=primary),
+        }
+
+        changed = set()
+        for field in MERGE_FILL_FIELDS:
+            attname = Contact._meta.get_field(field).attname
+            if getattr(primary, attname) in (None, ''):
+                value = next((getattr(d, attname) for d in duplicates if getattr(d, attname) not in (None, '')), None)
+                if value is not None:
+                    setattr(primary, attname, value)
+                    changed.add(field)
+
+        notes = [d.notes for d in duplicates if d.notes]
+        if notes:
+            primary.notes = '\n\n'.join(filter(None, [primary.notes, *notes]))
+            changed.add('notes')
+
+        for field in ('email_opt_out', 'phone_opt_out'):
+            if not getattr(primary, field) and any(getattr(d, field) for d in duplicates):
+                setattr(primary, field, True)
+                changed.add(field)
+
+        if not primary.is_customer and any(d.is_customer for d in duplicates):
+            primary.is_customer, primary.is_prospect = True, False
+            changed |= {'is_customer', 'is_prospect'}
+
+        # The portal account is one-to-one, so it is detached before being moved
+        user_id = primary.user_id or next((d.user_id for d in duplicates if d.user_id), None)
+        Contact.objects.filter(id__in=duplicate_ids, user__isnull=False).update(user=None)
+        if user_id != primary.user_id:
+            primary.user_id = user_id
+            changed.add('user')
+        moved['user'] = int(user_id is not None and 'user' in changed)
+
+        Contact.objects.filter(id__in=duplicate_ids).delete()
+        if changed:
+            primary.save(update_fields=[*changed, 'updated_at'])
+
+        # The re-pointed cases and meetings may now count towards another company
+        company_ids = {primary.company_id, *(d.company_id for d in duplicates)}
+        transaction.on_commit(lambda: CompanyStats.refresh(company_ids))
+
+    logger.info(f"Merged contacts {duplicate_ids} into {primary.id}: {moved}")
+    return moved
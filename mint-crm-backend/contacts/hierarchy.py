@@ -0,0 +1,41 @@
+"""Company group filtering.
+
+A company group is a company and all its subsidiaries. Membership is one
+``path__startswith`` predicate on the materialized ``Company.path``, which is
+backed by a pattern-ops index, so no recursive query or Python walk is needed.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Company
+
+
+def group_q(path, lookups):
+    """Rows whose company, through any of ``lookups`` ('' for Company itself), is in the group"""
+    return reduce(or_, (
+        Q(**{f'{lookup}__path__startswith' if lookup else 'path__startswith': path})
+        for lookup in lookups
+    ))
+
+
+class CompanyGroupFilter(BaseFilterBackend):
+    """``?company_group=<id>`` limits a list to that company and its subsidiaries.
+
+    Views set ``company_group_lookups`` to the company relations to match on.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        group_id = request.query_params.get('company_group')
+        if not group_id:
+            return queryset
+        if not group_id.isdigit():
+            raise ValidationError({'company_group': 'Must be a company id'})
+
+        path = Company.objects.filter(id=group_id).values_list('path', flat=True).first()
+        if not path:
+            return queryset.none()
+        return queryset.filter(group_q(path, view.company_group_lookups))
@@ -0,0 +1,384 @@
+"""Streaming bulk import of contacts and companies from CSV/XLSX files.
+
+Rows are parsed one at a time and written in chunks: companies are resolved by
+name with one query per chunk (missing ones are bulk-created), and contacts are
+upserted on ``email`` with ``bulk_create(update_conflicts=True)``. ``save()``
+is never called, so the per-row side effects of ``Contact.save`` are replaced
+by one set-based company update at the end of the run.
+"""
+import csv
+import io
+import os
+import time
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models.functions import Upper
+from django.utils import timezone
+
+from .models import Company, CompanyStats, Contact, ImportJob
+
+HEADER_ALIASES = {
+    'company_name': 'company',
+    'organization': 'company',
+    'e_mail': 'email',
+    'email_address': 'email',
+    'mobile_phone': 'mobile',
+    'cell': 'mobile',
+    'phone_number': 'phone',
+    'first': 'first_name',
+    'last': 'last_name',
+    'zip': 'postal_code',
+    'zip_code': 'postal_code',
+}
+
+CONTACT_FIELDS = [
+    'title', 'first_name', 'last_name', 'email', 'phone', 'mobile', 'company',
+    'job_title', 'department', 'address', 'city', 'state', 'country', 'postal_code',
+    'notes', 'birthday', 'linkedin_url', 'twitter_handle', 'is_active', 'is_customer',
+    'is_prospect', 'email_opt_out', 'phone_opt_out',
+]
+
+COMPANY_FIELDS = [
+    'name', 'industry', 'website', 'phone', 'address', 'city', 'state', 'country',
+    'postal_code', 'description', 'annual_revenue', 'employee_count', 'is_active',
+    'is_customer', 'is_prospect',
+]
+
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y', 'x'}
+FALSE_VALUES = {'0', 'false', 'f', 'no', 'n', ''}
+
+
+class ImportFileError(Exception):
+    """The file as a whole cannot be imported"""
+
+
+def normalize_header(name):
+    key = str(name or '').strip().lower().replace('-', '_').replace(' ', '_')
+    return HEADER_ALIASES.get(key, key)
+
+
+def iter_rows(fileobj, filename):
+    """Yield ``(row_number, {column: value})`` from a CSV or XLSX file without loading it whole"""
+    extension = os.path.splitext(filename)[1].lower()
+
+    if extension == '.xlsx':
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [normalize_header(cell) for cell in next(rows, [])]
+            for number, values in enumerate(rows, start=2):
+                if any(value not in (None, '') for value in values):
+                    yield number, dict(zip(header, values))
+        finally:
+            workbook.close()
+
+    elif extension == '.csv':
+        if isinstance(fileobj, io.TextIOBase):
+            text = fileobj
+        else:
+            text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+        reader = csv.reader(text)
+        header = [normalize_header(cell) for cell in next(reader, [])]
+        for values in reader:
+            if any(values):
+                yield reader.line_num, dict(zip(header, values))
+
+    else:
+        raise ImportFileError(f"Unsupported file type '{extension}'; use .csv or .xlsx")
+
+
+def create_company_stats(companies):
+    """Zeroed rollups of bulk-created companies, which the post_save signal never saw"""
+    CompanyStats.objects.bulk_create([CompanyStats(company=company) for company in companies], ignore_conflicts=True)
+
+
+class BaseImporter:
+    """Chunked writer shared by the contact and company importers"""
+
+    # ImportJob kind, its label and the file types it reads; see register_importer
+    kind = None
+    label = ''
+    extensions = ('.csv', '.xlsx')
+    model = None
+    fields = []
+    required = []
+
+    def __init__(self, job=None, chunk_size=2000):
+        self.job = job
+        self.chunk_size = chunk_size
+        self.started_at = None
+        self.stats = {'processed': 0, 'created': 0, 'updated': 0, 'errors': 0}
+        self.errors = []
+
+    def run(self, fileobj, filename):
+        """Import every row of the file; returns the run statistics"""
+        self.started_at = timezone.now()
+        started = time.monotonic()
+        rows = iter_rows(fileobj, filename)
+
+        chunk = []
+        columns = None
+        for number, row in rows:
+            if columns is None:
+                columns = self.check_columns(row)
+            chunk.append((number, row))
+            if len(chunk) >= self.chunk_size:
+                self.process_chunk(chunk, columns)
+                self.report(started)
+                chunk = []
+        if chunk:
+            self.process_chunk(chunk, columns)
+
+        self.finish()
+        self.report(started)
+        return self.stats
+
+    def check_columns(self, row):
+        """Importable columns present in the file; required ones must be there"""
+        missing = [field for field in self.required if field not in row]
+        if missing:
+            raise ImportFileError(f"Missing required columns: {', '.join(missing)}")
+        return [field for field in self.fields if field in row]
+
+    def clean_row(self, row, columns):
+        """Cleaned values of the row's filled cells; blank cells are left out so upserts keep what is stored"""
+        data = {}
+        for name in columns:
+            value = row.get(name)
+            if isinstance(value, str):
+                value = value.strip()
+            if value in (None, ''):
+                continue
+            data[name] = self.clean_value(name, value)
+        for name in self.required:
+            if not data.get(name):
+                raise ValidationError(f"{name} is required")
+        return data
+
+    def clean_value(self, name, value):
+        if name == 'company':
+            return str(value).strip()
+
+        field = self.model._meta.get_field(name)
+        if isinstance(field, models.BooleanField):
+            text = str(value if value is not None else '').strip().lower()
+            if text in TRUE_VALUES:
+                return True
+            if text in FALSE_VALUES:
+                return False
+            raise ValidationError(f"{name}: '{value}' is not a yes/no value")
+        try:
+            return field.clean(value, None)
+        except ValidationError as e:
+            raise ValidationError(f"{name}: {' '.join(e.messages)}")
+
+    def add_error(self, number, error):
+        self.stats['errors'] += 1
+        if len(self.errors) < ImportJob.MAX_STORED_ERRORS:
+            self.errors.append({'row': number, 'error': error})
+
+    def clean_chunk(self, chunk, columns):
+        cleaned = []
+        for number, row in chunk:
+            try:
+                cleaned.append((number, self.clean_row(row, columns)))
+            except ValidationError as e:
+                self.add_error(number, ' '.join(e.messages))
+        return cleaned
+
+    def process_chunk(self, chunk, columns):
+        raise NotImplementedError
+
+    def finish(self):
+        """Set-based work after the last chunk"""
+
+    def report(self, started):
+        elapsed = time.monotonic() - started
+        self.stats['rows_per_second'] = round(self.stats['processed'] / elapsed, 1) if elapsed else None
+        if self.job is None:
+            return
+        ImportJob.objects.filter(id=self.job.id).update(
+            processed_rows=self.stats['processed'],
+            created_count=self.stats['created'],
+            updated_count=self.stats['updated'],
+            error_count=self.stats['errors'],
+            errors=self.errors,
+            rows_per_second=self.stats['rows_per_second'],
+        )
+
+    @staticmethod
+    def resolve_companies(names):
+        """Map upper-cased company names to ids, bulk-creating the missing companies"""
+        if not names:
+            return {}
+        by_key = {}
+        for name in names:
+            by_key.setdefault(name.upper(), name)
+
+        resolved = {}
+        existing = (
+            Company.objects.annotate(key=Upper('name'))
+            .filter(key__in=list(by_key))
+            .order_by('-id')
+            .values_list('key', 'id')
+        )
+        # Ordered by -id so the oldest company wins for duplicate names
+        for key, company_id in existing:
+            resolved[key] = company_id
+
+        missing = [Company(name=name) for key, name in by_key.items() if key not in resolved]
+        for company in Company.objects.bulk_create(missing):
+            resolved[company.name.upper()] = company.id
+        if missing:
+            Company.fill_missing_paths()
+            create_company_stats(missing)
+        return resolved
+
+
+class ContactImporter(BaseImporter):
+    """Upsert contacts on email"""
+
+    kind = 'contacts'
+    label = 'Contacts'
+    model = Contact
+    fields = CONTACT_FIELDS
+    required = ['email', 'first_name', 'last_name']
+
+    def process_chunk(self, chunk, columns):
+        # Later rows win when the same email appears twice in one chunk
+        rows = {data['email']: data for _, data in self.clean_chunk(chunk, columns)}
+        self.stats['processed'] += len(chunk)
+        if not rows:
+            return
+
+        with transaction.atomic():
+            companies = {}
+            if 'company' in columns:
+                companies = self.resolve_companies({data['company'] for data in rows.values() if data.get('company')})
+            existing = set(Contact.objects.filter(email__in=list(rows)).values_list('email', flat=True))
+
+            # Rows update only their filled columns, so rows are upserted per set of filled columns
+            groups = {}
+            for data in rows.values():
+                filled = tuple(name for name in columns if name in data)
+                data = dict(data)
+                if 'company' in data:
+                    data['company_id'] = companies.get(data.pop('company').upper())
+                contact = Contact(**data)
+                contact.normalize_phones()
+                contact.compute_match_keys()
+                groups.setdefault(filled, []).append(contact)
+
+            for filled, contacts in groups.items():
+                Contact.objects.bulk_create(
+                    contacts,
+                    update_conflicts=True,
+                    unique_fields=['email'],
+                    update_fields=self.get_update_fields(filled),
+                )
+
+        self.stats['updated'] += len(existing)
+        self.stats['created'] += len(rows) - len(existing)
+
+    def get_update_fields(self, columns):
+        fields = [name for name in columns if name != 'email']
+        if 'phone' in columns:
+            fields.append('phone_e164')
+        if 'mobile' in columns:
+            fields.append('mobile_e164')
+        # email, first_name and last_name are required, so the match keys are always fresh
+        return fields + ['email_local', 'email_domain', 'name_soundex', 'updated_at']
+
+    def finish(self):
+        imported = Contact.objects.filter(updated_at__gte=self.started_at)
+        # One statement instead of a Company write per customer contact
+        Company.sync_customer_status(contacts=imported)
+        CompanyStats.refresh(
+            imported.exclude(company=None).order_by().values_list('company_id', flat=True).distinct()
+        )
+
+
+class CompanyImporter(BaseImporter):
+    """Create or update companies matched case-insensitively by name"""
+
+    kind = 'companies'
+    label = 'Companies'
+    model = Company
+    fields = COMPANY_FIELDS
+    required = ['name']
+
+    def process_chunk(self, chunk, columns):
+        rows = {data['name'].upper(): data for _, data in self.clean_chunk(chunk, columns)}
+        self.stats['processed'] += len(chunk)
+        if not rows:
+            return
+
+        with transaction.atomic():
+            existing = {}
+            matches = (
+                Company.objects.annotate(key=Upper('name'))
+                .filter(key__in=list(rows))
+                .order_by('-id')
+            )
+            for company in matches:
+                existing[company.key] = company
+
+            now = timezone.now()
+            created, updated = [], []
+            for key, data in rows.items():
+                company = existing.get(key)
+                if company is None:
+                    created.append(Company(**data))
+                    continue
+                for name, value in data.items():
+                    setattr(company, name, value)
+                company.updated_at = now
+                updated.append(company)
+
+            Company.objects.bulk_create(created)
+            if created:
+                Company.fill_missing_paths()
+                create_company_stats(created)
+            if updated:
+                # Blank cells were left out of the rows, so those fields are written back unchanged
+                Company.objects.bulk_update(updated, [*columns, 'updated_at'])
+
+        self.stats['created'] += len(created)
+        self.stats['updated'] += len(updated)
+
+
+# ImportJob kind -> importer class
+IMPORTERS = {}
+
+
+def register_importer(importer):
+    """Run ImportJobs of ``importer.kind`` with ``importer``.
+
+    The kind's label and file types come from the importer, so other apps call
+    this from ``AppConfig.ready()`` to take uploads through the same jobs.
+    """
+    IMPORTERS[importer.kind] = importer
+    return importer
+
+
+register_importer(ContactImporter)
+register_importer(CompanyImporter)
+
+
+def run_job(job):
+    """Run an ImportJob, recording its status, progress and outcome"""
+    ImportJob.objects.filter(id=job.id).update(status='running', started_at=timezone.now())
+    importer = IMPORTERS[job.kind](job)
+    try:
+        with job.file.open('rb') as fileobj:
+            importer.run(fileobj, job.file.name)
+    except Exception as e:
+        ImportJob.objects.filter(id=job.id).update(
+            status='failed', error_message=str(e), completed_at=timezone.now()
+        )
+        raise
+    ImportJob.objects.filter(id=job.id).update(status='completed', completed_at=timezone.now())
+    return importer.stats
@@ -0,0 +1,97 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from contacts.models import Contact
+from contacts.phone import to_e164
+from emails.models import SMS
+from emails.services import SMSService
+
+
+class Command(BaseCommand):
+    help = 'Fill the E.164 phone columns on contacts and SMS messages in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows read and updated per batch')
+        parser.add_argument('--skip-contacts', action='store_true', help='Do not backfill contacts')
+        parser.add_argument('--skip-sms', action='store_true', help='Do not backfill SMS messages')
+        parser.add_argument(
+            '--link-contacts', action='store_true',
+            help='Attach SMS messages without a contact to the contact owning their number'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        if not options['skip_contacts']:
+            started = time.monotonic()
+            scanned, updated = self.backfill(
+                Contact.objects.only('id', 'phone', 'mobile', 'phone_e164', 'mobile_e164'),
+                self.normalize_contact,
+                ['phone_e164', 'mobile_e164'],
+                batch_size
+            )
+            self.stdout.write(
+                f'Contacts: {updated} of {scanned} updated in {time.monotonic() - started:.1f}s'
+            )
+
+        if not options['skip_sms']:
+            started = time.monotonic()
+            fields = ['from_number_e164', 'to_number_e164', 'conversation_id']
+            if options['link_contacts']:
+                fields.append('contact')
+            scanned, updated = self.backfill(
+                SMS.objects.only(
+                    'id', 'sms_type', 'from_number', 'to_number', 'from_number_e164',
+                    'to_number_e164', 'conversation_id', 'contact_id'
+                ),
+                self.normalize_sms,
+                fields,
+                batch_size,
+                link_contacts=options['link_contacts']
+            )
+            self.stdout.write(
+                f'SMS messages: {updated} of {scanned} updated in {time.monotonic() - started:.1f}s'
+            )
+
+        self.stdout.write(self.style.SUCCESS('Phone number backfill complete'))
+
+    def backfill(self, queryset, normalize, fields, batch_size, link_contacts=False):
+        """Walk the table by primary key and bulk_update the rows whose columns changed"""
+        scanned = updated = 0
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id).order_by('id')[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            scanned += len(batch)
+
+            changed = {obj.id: obj for obj in batch if normalize(obj)}
+            if link_contacts:
+                for sms in SMSService.link_contacts(batch):
+                    changed[sms.id] = sms
+
+            if changed:
+                with transaction.atomic():
+                    queryset.model.objects.bulk_update(changed.values(), fields)
+                updated += len(changed)
+
+        return scanned, updated
+
+    @staticmethod
+    def normalize_contact(contact):
+        phone_e164, mobile_e164 = to_e164(contact.phone), to_e164(contact.mobile)
+        if (phone_e164, mobile_e164) == (contact.phone_e164, contact.mobile_e164):
+            return False
+        contact.phone_e164, contact.mobile_e164 = phone_e164, mobile_e164
+        return True
+
+    @staticmethod
+    def normalize_sms(sms):
+        current = (sms.from_number_e164, sms.to_number_e164, sms.conversation_id)
+        sms.normalize_numbers()
+        # Rebuild the thread key so it uses the E.164 form of both numbers
+        sms.conversation_id = SMS.build_conversation_id(sms.contact_number, sms.sender_number)
+        return current != (sms.from_number_e164, sms.to_number_e164, sms.conversation_id)
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from contacts.dedupe import find_duplicates
+from contacts.models import Contact
+
+
+class Command(BaseCommand):
+    help = 'Find likely duplicate contacts and store them as merge suggestions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backfill-keys', action='store_true',
+            help='Compute the blocking keys of existing contacts first'
+        )
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per backfill batch')
+        parser.add_argument('--max-block-size', type=int, help='Skip blocks with more contacts than this')
+        parser.add_argument('--min-score', type=float, help='Lowest score stored as a suggestion')
+
+    def handle(self, *args, **options):
+        if options['backfill_keys']:
+            started = time.monotonic()
+            scanned, updated = self.backfill_keys(options['batch_size'])
+            self.stdout.write(f'Keys: {updated} of {scanned} contacts updated in {time.monotonic() - started:.1f}s')
+
+        started = time.monotonic()
+        stats = find_duplicates(max_block_size=options['max_block_size'], min_score=options['min_score'])
+        self.stdout.write(
+            f"{stats['comparisons']} comparisons in {stats['blocks']} blocks "
+            f"({stats['skipped_blocks']} oversized blocks skipped) in {time.monotonic() - started:.1f}s"
+        )
+        self.stdout.write(self.style.SUCCESS(f"{stats['suggestions']} duplicate suggestions stored"))
+
+    def backfill_keys(self, batch_size):
+        """Walk contacts by primary key and bulk_update the ones whose keys changed"""
+        fields = ['email_local', 'email_domain', 'name_soundex']
+        queryset = Contact.objects.only('id', 'email', 'first_name', 'last_name', *fields)
+        scanned = updated = 0
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id).order_by('id')[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            scanned += len(batch)
+
+            changed = []
+            for contact in batch:
+                current = [getattr(contact, field) for field in fields]
+                contact.compute_match_keys()
+                if current != [getattr(contact, field) for field in fields]:
+                    changed.append(contact)
+
+            if changed:
+                with transaction.atomic():
+                    Contact.objects.bulk_update(changed, fields)
+                updated += len(changed)
+
+        return scanned, updated
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from contacts.importer import CompanyImporter, ContactImporter, ImportFileError
+
+# Other kinds of import job have their own commands, such as import_ics
+IMPORTERS = {importer.kind: importer for importer in (ContactImporter, CompanyImporter)}
+
+
+class Command(BaseCommand):
+    help = 'Import contacts or companies from a CSV or XLSX file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to a .csv or .xlsx file')
+        parser.add_argument('--kind', choices=list(IMPORTERS), default='contacts')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows written per batch')
+
+    def handle(self, *args, **options):
+        importer = IMPORTERS[options['kind']](chunk_size=options['chunk_size'])
+
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                stats = importer.run(fileobj, options['path'])
+        except (OSError, ImportFileError) as e:
+            raise CommandError(str(e))
+
+        for error in importer.errors[:20]:
+            self.stdout.write(self.style.WARNING(f"Row {error['row']}: {error['error']}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {stats['processed']} rows: {stats['created']} created, {stats['updated']} updated, "
+            f"{stats['errors']} errors ({stats['rows_per_second']} rows/s)"
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from contacts.models import Company, Contact
+
+
+class Command(BaseCommand):
+    help = 'Promote companies that have a customer contact but are not flagged as customers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many companies would change')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            pending = Company.objects.filter(
+                Exists(Contact.objects.filter(company=OuterRef('pk'), is_customer=True))
+            ).exclude(is_customer=True, is_prospect=False).count()
+            self.stdout.write(f'{pending} companies would be promoted to customer')
+            return
+
+        updated = Company.sync_customer_status()
+        self.stdout.write(self.style.SUCCESS(f'{updated} companies promoted to customer'))
@@ -0,0 +1,76 @@
+"""Blocking keys used to find duplicate contacts.
+
+Keys are cheap to compute per row and are stored on the contact, so candidate
+duplicates can be found with indexed GROUP BY queries instead of comparing
+every pair of contacts.
+"""
+import re
+import unicodedata
+
+_NON_LETTERS = re.compile(r'[^A-Z]')
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys('BFPV', '1'),
+    **dict.fromkeys('CGJKQSXZ', '2'),
+    **dict.fromkeys('DT', '3'),
+    'L': '4',
+    **dict.fromkeys('MN', '5'),
+    'R': '6',
+}
+
+# Mailbox providers that ignore dots in the local part
+DOTLESS_DOMAINS = {'gmail.com', 'googlemail.com'}
+DOMAIN_ALIASES = {'googlemail.com': 'gmail.com'}
+
+# Shared role mailboxes say nothing about the person behind them
+ROLE_LOCAL_PARTS = {
+    'admin', 'billing', 'contact', 'hello', 'help', 'info', 'mail', 'office',
+    'noreply', 'no-reply', 'sales', 'support', 'team',
+}
+
+
+def soundex(name):
+    """American Soundex code of ``name`` (e.g. 'Robert' -> 'R163'), or ''"""
+    letters = _NON_LETTERS.sub(
+        '', unicodedata.normalize('NFKD', name or '').encode('ascii', 'ignore').decode().upper()
+    )
+    if not letters:
+        return ''
+
+    code = letters[0]
+    previous = _SOUNDEX_CODES.get(letters[0], '')
+    for letter in letters[1:]:
+        digit = _SOUNDEX_CODES.get(letter, '')
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        if letter not in 'HW':
+            # H and W do not separate letters with the same code
+            previous = digit
+    return code.ljust(4, '0')
+
+
+def name_key(first_name, last_name):
+    """Soundex of the last name followed by the first name, or '' without a last name"""
+    last = soundex(last_name)
+    return f"{last}{soundex(first_name)}" if last else ''
+
+
+def email_parts(email):
+    """``(local, domain)`` of an address with tags, provider dots and case removed.
+
+    Role mailboxes such as info@ get an empty local part so they never form a
+    block of their own.
+    """
+    local, _, domain = (email or '').strip().lower().rpartition('@')
+    if not local or not domain:
+        return '', ''
+
+    domain = DOMAIN_ALIASES.get(domain, domain)
+    local = local.split('+', 1)[0]
+    if domain in DOTLESS_DOMAINS:
+        local = local.replace('.', '')
+    if local in ROLE_LOCAL_PARTS:
+        local = ''
+    return local, domain
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.2 on 2026-10-19 01:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contact',
+            name='mobile_e164',
+            field=models.CharField(blank=True, editable=False, help_text='Mobile in E.164 format', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='phone_e164',
+            field=models.CharField(blank=True, editable=False, help_text='Phone in E.164 format', max_length=16),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['phone_e164'], name='contact_phone_e164_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['mobile_e164'], name='contact_mobile_e164_idx'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.0.2 on 2026-10-19 02:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0005_importjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DuplicateSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('reasons', models.JSONField(blank=True, default=list)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('dismissed', 'Dismissed')], default='pending', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-score', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='email_domain',
+            field=models.CharField(blank=True, editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='email_local',
+            field=models.CharField(blank=True, editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='name_soundex',
+            field=models.CharField(blank=True, editable=False, max_length=8),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['email_local'], name='contact_email_local_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['email_domain', 'name_soundex'], name='contact_domain_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['name_soundex'], name='contact_name_soundex_idx'),
+        ),
+        migrations.AddField(
+            model_name='duplicatesuggestion',
+            name='contact',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_suggestions', to='contacts.contact'),
+        ),
+        migrations.AddField(
+            model_name='duplicatesuggestion',
+            name='duplicate',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contacts.contact'),
+        ),
+        migrations.AddIndex(
+            model_name='duplicatesuggestion',
+            index=models.Index(fields=['status', '-score'], name='contacts_du_status_c56eef_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='duplicatesuggestion',
+            constraint=models.UniqueConstraint(fields=('contact', 'duplicate'), name='unique_duplicate_pair'),
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 5.0.2 on 2026-10-19 02:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Avg, Count, F, Max, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def fill_company_stats(apps, schema_editor):
+    # Existing companies get their rollup row, computed as CompanyStats.compute does
+    Company = apps.get_model('contacts', 'Company')
+    CompanyStats = apps.get_model('contacts', 'CompanyStats')
+    Contact = apps.get_model('contacts', 'Contact')
+    Case = apps.get_model('cases', 'Case')
+    Meeting = apps.get_model('meetings', 'Meeting')
+    closed = Q(status__in=['resolved', 'closed'])
+    now = timezone.now()
+
+    last_id = 0
+    while True:
+        ids = list(Company.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:1000])
+        if not ids:
+            break
+        last_id = ids[-1]
+        stats = {company_id: CompanyStats(company_id=company_id) for company_id in ids}
+
+        for row in Contact.objects.filter(company_id__in=ids).order_by().values('company_id').annotate(total=Count('id')):
+            stats[row['company_id']].contact_count = row['total']
+
+        cases = (
+            Case.objects.filter(Q(company_id__in=ids) | Q(company__isnull=True, customer__company_id__in=ids))
+            .annotate(owner=Coalesce('company_id', 'customer__company_id'))
+            .order_by().values('owner')
+            .annotate(
+                open_cases=Count('id', filter=~closed),
+                closed_cases=Count('id', filter=closed),
+                last_case=Max('updated_at'),
+                avg_resolution_time=Avg(
+                    F('resolved_at') - F('created_at'),
+                    filter=Q(resolved_at__isnull=False),
+                    output_field=models.DurationField(),
+                ),
+            )
+        )
+        for row in cases:
+            row_stats = stats[row['owner']]
+            row_stats.open_cases = row['open_cases']
+            row_stats.closed_cases = row['closed_cases']
+            row_stats.avg_resolution_time = row['avg_resolution_time']
+            row_stats.last_activity_at = row['last_case']
+
+        meetings = (
+            Meeting.objects.filter(
+                Q(company_id__in=ids) | Q(company__isnull=True, contact__company_id__in=ids), start_time__lte=now
+            )
+            .annotate(owner=Coalesce('company_id', 'contact__company_id'))
+            .order_by().values('owner')
+            .annotate(last_meeting=Max('start_time'))
+        )
+        for row in meetings:
+            row_stats = stats[row['owner']]
+            row_stats.last_activity_at = max(filter(None, [row_stats.last_activity_at, row['last_meeting']]))
+
+        CompanyStats.objects.bulk_create(stats.values(), ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0002_initial'),
+        ('contacts', '0006_duplicate_detection'),
+        ('meetings', '0003_meetingreminder_meetingtemplate_meeting_agenda_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompanyStats',
+            fields=[
+                ('company', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='contacts.company')),
+                ('contact_count', models.IntegerField(default=0)),
+                ('open_cases', models.IntegerField(default=0)),
+                ('closed_cases', models.IntegerField(default=0)),
+                ('last_activity_at', models.DateTimeField(blank=True, help_text='Latest case update or past meeting', null=True)),
+                ('avg_resolution_time', models.DurationField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Company Stats',
+                'verbose_name_plural': 'Company Stats',
+                'indexes': [models.Index(fields=['contact_count'], name='contacts_co_contact_e3b370_idx'), models.Index(fields=['open_cases'], name='contacts_co_open_ca_d93387_idx'), models.Index(fields=['closed_cases'], name='contacts_co_closed__4815cf_idx'), models.Index(fields=['last_activity_at'], name='contacts_co_last_ac_692128_idx'), models.Index(fields=['avg_resolution_time'], name='contacts_co_avg_res_2c5bd6_idx')],
+            },
+        ),
+        migrations.RunPython(fill_company_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.0.2 on 2026-10-19 02:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Value
+from django.db.models.functions import Cast, Coalesce, Concat
+
+
+def fill_root_paths(apps, schema_editor):
+    # Every existing company starts as the root of its own group
+    Company = apps.get_model('contacts', 'Company')
+    Company.objects.update(path=Concat(Cast('id', output_field=models.CharField()), Value('/')), depth=0)
+
+
+def fill_resolved_cases(apps, schema_editor):
+    # Rows backfilled before the column existed count their resolved cases
+    CompanyStats = apps.get_model('contacts', 'CompanyStats')
+    Case = apps.get_model('cases', 'Case')
+
+    last_id = 0
+    while True:
+        ids = list(
+            CompanyStats.objects.filter(company_id__gt=last_id).order_by('company_id')
+            .values_list('company_id', flat=True)[:1000]
+        )
+        if not ids:
+            break
+        last_id = ids[-1]
+        counts = (
+            Case.objects.filter(Q(company_id__in=ids) | Q(company__isnull=True, customer__company_id__in=ids))
+            .filter(resolved_at__isnull=False)
+            .annotate(owner=Coalesce('company_id', 'customer__company_id'))
+            .order_by().values_list('owner').annotate(total=Count('id'))
+        )
+        CompanyStats.objects.bulk_update(
+            [CompanyStats(company_id=company_id, resolved_cases=total) for company_id, total in counts],
+            ['resolved_cases'], batch_size=500
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0002_initial'),
+        ('contacts', '0007_company_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='subsidiaries', to='contacts.company'),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='companystats',
+            name='resolved_cases',
+            field=models.IntegerField(default=0, help_text='Cases with a resolution time'),
+        ),
+        migrations.AddIndex(
+            model_name='company',
+            index=models.Index(fields=['path'], name='company_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(fill_root_paths, migrations.RunPython.noop),
+        migrations.RunPython(fill_resolved_cases, migrations.RunPython.noop),
+    ]
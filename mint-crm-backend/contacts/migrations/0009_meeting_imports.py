@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-19 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0008_company_hierarchy'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='importjob',
+            name='kind',
+            field=models.CharField(choices=[('contacts', 'Contacts'), ('companies', 'Companies'), ('meetings', 'Meetings')], default='contacts', max_length=10),
+        ),
+    ]
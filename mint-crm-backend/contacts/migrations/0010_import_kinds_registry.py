@@ -0,0 +1,19 @@
+# Generated by Django 5.0.2 on 2026-10-19 03:50
+
+import contacts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contacts', '0009_meeting_imports'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='importjob',
+            name='kind',
+            field=models.CharField(choices=contacts.models.import_kinds, default='contacts', max_length=10),
+        ),
+    ]
@@ -1,6 +1,13 @@
 from django.db import models
+from django.db.models import Exists, OuterRef, Q, Value
+from django.db.models.functions import Cast, Coalesce, Concat, Substr, Upper
+from django.core.exceptions import ValidationError
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from .matching import email_parts, name_key
+from .phone import to_e164
 
 User = get_user_model()
 
@@ -38,6 +45,12 @@ class Company(models.Model):
     is_customer = models.BooleanField(default=False)
     is_prospect = models.BooleanField(default=True)
     
+    # Hierarchy: ``path`` lists the ids from the top of the group down to this
+    # company ("12/40/73/"), so a whole group is one ``path__startswith``
+    parent = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='subsidiaries')
+    path = models.CharField(max_length=255, blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -46,10 +59,75 @@ class Company(models.Model):
         verbose_name = _('company')
         verbose_name_plural = _('companies')
         ordering = ['name']
+        indexes = [
+            # Typeahead: trigram matching and UPPER() prefix matching
+            GinIndex(fields=['name'], name='company_name_trgm', opclasses=['gin_trgm_ops']),
+            models.Index(OpClass(Upper('name'), name='text_pattern_ops'), name='company_name_prefix'),
+            models.Index(fields=['path'], name='company_path_idx', opclasses=['varchar_pattern_ops']),
+        ]
     
     def __str__(self):
         return self.name
     
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        moved = update_fields is None or 'parent' in update_fields or 'parent_id' in update_fields
+        if moved and self.parent_id and self.path:
+            parent_path = self.parent.path
+            if parent_path.startswith(self.path):
+                raise ValidationError(_('A company cannot be moved under itself or one of its subsidiaries.'))
+        
+        super().save(*args, **kwargs)
+        
+        if moved and self.path != self.expected_path():
+            self.move_subtree()
+    
+    def expected_path(self):
+        parent_path = self.parent.path if self.parent_id else ''
+        return f"{parent_path}{self.pk}/"
+    
+    def move_subtree(self):
+        """Rewrite the path and depth of this company and all its subsidiaries in one UPDATE"""
+        old_path, new_path = self.path, self.expected_path()
+        new_depth = new_path.count('/') - 1
+        if old_path:
+            Company.objects.filter(path__startswith=old_path).update(
+                path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+                depth=models.F('depth') + (new_depth - self.depth),
+            )
+        else:
+            Company.objects.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+        self.path, self.depth = new_path, new_depth
+    
+    @classmethod
+    def fill_missing_paths(cls):
+        """Give companies created with bulk_create() their root path in one UPDATE"""
+        return cls.objects.filter(path='', parent__isnull=True).update(
+            path=Concat(Cast('id', output_field=models.CharField()), Value('/')),
+            depth=0,
+        )
+    
+    def group(self):
+        """This company and all its subsidiaries, at any depth"""
+        return Company.objects.filter(path__startswith=self.path)
+    
+    @classmethod
+    def sync_customer_status(cls, contacts=None, company_ids=None):
+        """Promote companies with a customer contact to customer in one UPDATE.
+        
+        ``contacts`` narrows the contacts considered (e.g. those touched by an
+        import) and ``company_ids`` the companies. Companies already flagged are
+        not rewritten, and status is never demoted, matching the manual flag.
+        Returns the number of companies changed.
+        """
+        contacts = Contact.objects.all() if contacts is None else contacts
+        companies = cls.objects.filter(
+            Exists(contacts.filter(company=OuterRef('pk'), is_customer=True))
+        ).exclude(is_customer=True, is_prospect=False)
+        if company_ids is not None:
+            companies = companies.filter(id__in=company_ids)
+        return companies.update(is_customer=True, is_prospect=False, updated_at=timezone.now())
+    
     @property
     def full_address(self):
         """Get full formatted address"""
@@ -75,6 +153,13 @@ class Contact(models.Model):
     email = models.EmailField(unique=True)
     phone = models.CharField(max_length=20, blank=True)
     mobile = models.CharField(max_length=20, blank=True)
+    phone_e164 = models.CharField(max_length=16, blank=True, editable=False, help_text="Phone in E.164 format")
+    mobile_e164 = models.CharField(max_length=16, blank=True, editable=False, help_text="Mobile in E.164 format")
+    
+    # Duplicate detection blocking keys (see contacts.matching)
+    email_local = models.CharField(max_length=254, blank=True, editable=False)
+    email_domain = models.CharField(max_length=254, blank=True, editable=False)
+    name_soundex = models.CharField(max_length=8, blank=True, editable=False)
     
     # Company Information
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='contacts', null=True, blank=True)
@@ -114,6 +199,18 @@ class Contact(models.Model):
             models.Index(fields=['email']),
             models.Index(fields=['company', 'is_active']),
             models.Index(fields=['is_customer', 'is_prospect']),
+            models.Index(fields=['phone_e164'], name='contact_phone_e164_idx'),
+            models.Index(fields=['mobile_e164'], name='contact_mobile_e164_idx'),
+            models.Index(fields=['email_local'], name='contact_email_local_idx'),
+            models.Index(fields=['email_domain', 'name_soundex'], name='contact_domain_name_idx'),
+            models.Index(fields=['name_soundex'], name='contact_name_soundex_idx'),
+            # Typeahead: trigram matching and UPPER() prefix matching
+            GinIndex(fields=['first_name'], name='contact_first_name_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['last_name'], name='contact_last_name_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['email'], name='contact_email_trgm', opclasses=['gin_trgm_ops']),
+            models.Index(OpClass(Upper('first_name'), name='text_pattern_ops'), name='contact_first_name_prefix'),
+            models.Index(OpClass(Upper('last_name'), name='text_pattern_ops'), name='contact_last_name_prefix'),
+            models.Index(OpClass(Upper('email'), name='text_pattern_ops'), name='contact_email_prefix'),
         ]
     
     def __str__(self):
@@ -142,12 +239,290 @@ class Contact(models.Model):
         """Get primary phone number (mobile preferred)"""
         return self.mobile or self.phone
     
+    def normalize_phones(self):
+        """Refresh the E.164 columns from ``phone`` and ``mobile``"""
+        self.phone_e164 = to_e164(self.phone)
+        self.mobile_e164 = to_e164(self.mobile)
+    
+    def compute_match_keys(self):
+        """Refresh the duplicate detection keys from the email and name"""
+        self.email_local, self.email_domain = email_parts(self.email)
+        self.name_soundex = name_key(self.first_name, self.last_name)
+    
+    @classmethod
+    def resolve_phone_numbers(cls, numbers):
+        """Map phone numbers to contacts with one indexed lookup.
+        
+        Returns ``{number: contact}`` for the numbers that match; a mobile match
+        wins over a landline one, and active contacts over inactive ones.
+        """
+        by_e164 = {}
+        for number in numbers:
+            e164 = to_e164(number)
+            if e164:
+                by_e164.setdefault(e164, []).append(number)
+        if not by_e164:
+            return {}
+        
+        keys = list(by_e164)
+        matches = {}
+        candidates = cls.objects.filter(
+            Q(mobile_e164__in=keys) | Q(phone_e164__in=keys)
+        ).select_related('company').order_by('-is_active', 'id')
+        for contact in candidates:
+            for e164, rank in ((contact.mobile_e164, 0), (contact.phone_e164, 1)):
+                if e164 in by_e164:
+                    current = matches.get(e164)
+                    if current is None or (rank, not contact.is_active) < current[0]:
+                        matches[e164] = ((rank, not contact.is_active), contact)
+        
+        return {
+            number: matches[e164][1]
+            for e164, originals in by_e164.items() if e164 in matches
+            for number in originals
+        }
+    
     def save(self, *args, **kwargs):
-        # Update company status based on contact status
-        if self.company:
-            if self.is_customer:
-                self.company.is_customer = True
-                self.company.is_prospect = False
-                self.company.save(update_fields=['is_customer', 'is_prospect'])
+        self.normalize_phones()
+        self.compute_match_keys()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if {'phone', 'mobile'} & update_fields:
+                update_fields |= {'phone_e164', 'mobile_e164'}
+            if {'email', 'first_name', 'last_name'} & update_fields:
+                update_fields |= {'email_local', 'email_domain', 'name_soundex'}
+            kwargs['update_fields'] = update_fields
+        
+        # Company customer status follows in contacts.signals, only on a transition
+        super().save(*args, **kwargs) 
+class CompanyStats(models.Model):
+    """Materialized per-company rollup of contacts, cases and activity.
+    
+    A case belongs to its ``company`` or, without one, to its customer's
+    company; meetings likewise. Rows are refreshed for the affected companies
+    by the signal handlers in ``contacts.signals``, and ``reconcile()``
+    rebuilds every row periodically to catch writes that bypass ``save()``.
+    """
+    
+    CLOSED_CASE_STATUSES = ['resolved', 'closed']
+    
+    COUNTED_FIELDS = [
+        'contact_count', 'open_cases', 'closed_cases', 'resolved_cases', 'last_activity_at',
+        'avg_resolution_time',
+    ]
+    
+    company = models.OneToOneField(Company, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    
+    contact_count = models.IntegerField(default=0)
+    open_cases = models.IntegerField(default=0)
+    closed_cases = models.IntegerField(default=0)
+    resolved_cases = models.IntegerField(default=0, help_text="Cases with a resolution time")
+    last_activity_at = models.DateTimeField(null=True, blank=True, help_text="Latest case update or past meeting")
+    avg_resolution_time = models.DurationField(null=True, blank=True)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Company Stats"
+        verbose_name_plural = "Company Stats"
+        # Backs sorting the company list by each rollup
+        indexes = [
+            models.Index(fields=['contact_count']),
+            models.Index(fields=['open_cases']),
+            models.Index(fields=['closed_cases']),
+            models.Index(fields=['last_activity_at']),
+            models.Index(fields=['avg_resolution_time']),
+        ]
+    
+    def __str__(self):
+        return f"{self.company_id}: {self.contact_count} contacts, {self.open_cases} open cases"
+    
+    @classmethod
+    def compute(cls, company_ids):
+        """Get ``{company_id: rollup}`` for the given companies with one grouped query per table"""
+        from cases.models import Case
+        from meetings.models import Meeting
+        
+        rollups = {
+            company_id: {
+                'contact_count': 0, 'open_cases': 0, 'closed_cases': 0, 'resolved_cases': 0,
+                'last_activity_at': None, 'avg_resolution_time': None,
+            }
+            for company_id in company_ids
+        }
+        
+        contacts = (
+            Contact.objects.filter(company_id__in=company_ids)
+            .order_by().values('company_id').annotate(total=models.Count('id'))
+        )
+        for row in contacts:
+            rollups[row['company_id']]['contact_count'] = row['total']
+        
+        closed = Q(status__in=cls.CLOSED_CASE_STATUSES)
+        # Filtering on the columns rather than the COALESCE lets each side use its index
+        cases = (
+            Case.objects.filter(Q(company_id__in=company_ids) | Q(company__isnull=True, customer__company_id__in=company_ids))
+            .annotate(owner=Coalesce('company_id', 'customer__company_id'))
+            .order_by().values('owner')
+            .annotate(
+                open_cases=models.Count('id', filter=~closed),
+                closed_cases=models.Count('id', filter=closed),
+                resolved_cases=models.Count('id', filter=Q(resolved_at__isnull=False)),
+                last_case=models.Max('updated_at'),
+                avg_resolution_time=models.Avg(
+                    models.F('resolved_at') - models.F('created_at'),
+                    filter=Q(resolved_at__isnull=False),
+                    output_field=models.DurationField(),
+                ),
+            )
+        )
+        for row in cases:
+            rollup = rollups[row['owner']]
+            rollup['open_cases'] = row['open_cases']
+            rollup['closed_cases'] = row['closed_cases']
+            rollup['resolved_cases'] = row['resolved_cases']
+            rollup['avg_resolution_time'] = row['avg_resolution_time']
+            rollup['last_activity_at'] = row['last_case']
+        
+        meetings = (
+            Meeting.objects.filter(
+                Q(company_id__in=company_ids) | Q(company__isnull=True, contact__company_id__in=company_ids),
+                start_time__lte=timezone.now(),
+            )
+            .annotate(owner=Coalesce('company_id', 'contact__company_id'))
+            .order_by().values('owner')
+            .annotate(last_meeting=models.Max('start_time'))
+        )
+        for row in meetings:
+            rollup = rollups[row['owner']]
+            rollup['last_activity_at'] = max(filter(None, [rollup['last_activity_at'], row['last_meeting']]))
         
-        super().save(*args, **kwargs) 
\ No newline at end of file
+        return rollups
+    
+    @classmethod
+    def refresh(cls, company_ids, batch_size=1000):
+        """Recompute the rollups of the given companies in batches"""
+        company_ids = list(dict.fromkeys(filter(None, company_ids)))
+        for start in range(0, len(company_ids), batch_size):
+            batch = company_ids[start:start + batch_size]
+            # Companies deleted in the meantime have no row to point at
+            existing = set(Company.objects.filter(id__in=batch).values_list('id', flat=True))
+            rollups = cls.compute([company_id for company_id in batch if company_id in existing])
+            cls.objects.bulk_create(
+                [cls(company_id=company_id, **rollup) for company_id, rollup in rollups.items()],
+                update_conflicts=True,
+                unique_fields=['company'],
+                update_fields=cls.COUNTED_FIELDS + ['updated_at'],
+            )
+    
+    @classmethod
+    def group_rollup(cls, company):
+        """Rollup of a company and all its subsidiaries from one aggregate over their rows"""
+        summed = ['contact_count', 'open_cases', 'closed_cases', 'resolved_cases']
+        row = cls.objects.filter(company__path__startswith=company.path).aggregate(
+            companies=models.Count('company'),
+            last_activity_at=models.Max('last_activity_at'),
+            # Per-company averages weighted by their resolved case counts
+            total_resolution_time=models.Sum(
+                models.ExpressionWrapper(
+                    models.F('avg_resolution_time') * models.F('resolved_cases'),
+                    output_field=models.DurationField()
+                ),
+                filter=Q(resolved_cases__gt=0),
+            ),
+            **{f'sum_{field}': Coalesce(models.Sum(field), 0) for field in summed},
+        )
+        totals = {'companies': row['companies'], **{field: row[f'sum_{field}'] for field in summed}}
+        totals['last_activity_at'] = row['last_activity_at']
+        total = row['total_resolution_time']
+        totals['avg_resolution_time'] = total / totals['resolved_cases'] if total is not None and totals['resolved_cases'] else None
+        return totals
+    
+    @classmethod
+    def reconcile(cls, batch_size=1000):
+        """Rebuild every company's rollup, walking companies by primary key"""
+        reconciled = 0
+        last_id = 0
+        while True:
+            batch = list(
+                Company.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1]
+            cls.refresh(batch, batch_size=batch_size)
+            reconciled += len(batch)
+        return reconciled
+
+class DuplicateSuggestion(models.Model):
+    """A pair of contacts that are probably the same person"""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('dismissed', 'Dismissed'),
+    ]
+    
+    # ``contact`` always has the lower id, so each pair is stored once
+    contact = models.ForeignKey(Contact, on_delete=models.CASCADE, related_name='duplicate_suggestions')
+    duplicate = models.ForeignKey(Contact, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    reasons = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-score', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['contact', 'duplicate'], name='unique_duplicate_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['status', '-score']),
+        ]
+    
+    def __str__(self):
+        return f"{self.contact_id} ~ {self.duplicate_id} ({self.score:.2f})"
+
+def import_kinds():
+    """Kinds of ImportJob: one per registered importer (see ``contacts.importer.register_importer``)"""
+    from .importer import IMPORTERS
+    return [(kind, importer.label) for kind, importer in IMPORTERS.items()]
+
+class ImportJob(models.Model):
+    """Bulk import of an uploaded file by the importer registered for its kind"""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    # Only the first errors are kept; error_count has the total
+    MAX_STORED_ERRORS = 1000
+    
+    kind = models.CharField(max_length=10, choices=import_kinds, default='contacts')
+    file = models.FileField(upload_to='imports/')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    
+    # Progress
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True, help_text="Per-row errors as {row, error}")
+    rows_per_second = models.FloatField(null=True, blank=True)
+    error_message = models.TextField(blank=True)
+    
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='import_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} import {self.id} - {self.get_status_display()}"
@@ -0,0 +1,47 @@
+"""Phone number normalization shared by contacts and SMS."""
+import re
+
+from django.conf import settings
+
+_NON_DIGITS = re.compile(r'\D')
+
+
+def normalize_phone(number):
+    """Reduce a phone number to its digits, keeping an international '+' prefix"""
+    if not number:
+        return ''
+    number = number.strip()
+    international = number.startswith('+') or number.startswith('00')
+    digits = _NON_DIGITS.sub('', number)
+    if number.startswith('00'):
+        digits = digits[2:]
+    if not digits:
+        return ''
+    return f"+{digits}" if international else digits
+
+
+def to_e164(number, country_code=None):
+    """Convert a free-form phone number to E.164, or '' if it cannot be one.
+
+    Numbers without an international prefix are treated as national numbers in
+    ``PHONE_DEFAULT_COUNTRY_CODE`` (a leading trunk '0' is dropped).
+    """
+    normalized = normalize_phone(number)
+    if not normalized:
+        return ''
+
+    if normalized.startswith('+'):
+        digits = normalized[1:]
+    else:
+        country_code = country_code or settings.PHONE_DEFAULT_COUNTRY_CODE
+        national = normalized.lstrip('0')
+        if normalized.startswith(country_code) and len(normalized) > settings.PHONE_NATIONAL_NUMBER_LENGTH:
+            # Country code written without the '+'
+            digits = normalized
+        else:
+            digits = f"{country_code}{national}"
+
+    # E.164 allows at most 15 digits; anything under 8 is an extension or short code
+    if not 8 <= len(digits) <= 15 or digits.startswith('0'):
+        return ''
+    return f"+{digits}"
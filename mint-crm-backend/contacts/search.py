@@ -0,0 +1,111 @@
+"""Contact search: the list search filter and the ranked typeahead.
+
+Typeahead matches each search token against first name, last name, email and
+company name. On PostgreSQL, tokens of three or more characters use the
+``pg_trgm`` word-similarity operator backed by the GIN indexes on those
+columns; shorter tokens (and other databases) use prefix matching on the
+``UPPER()`` pattern indexes. Only ``limit`` rows are ever ranked and returned.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, FloatField, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+from rest_framework.filters import SearchFilter
+
+from .models import Company
+from .phone import to_e164
+
+# Search terms that look like a whole phone number rather than a name fragment
+PHONE_LIKE = re.compile(r'^\+?[\d\s().-]{7,}$')
+
+TRIGRAM_MIN_LENGTH = 3
+MAX_TOKENS = 3
+
+
+def phone_filter(term):
+    """Exact E.164 filter for a phone-number search term, or None"""
+    e164 = to_e164(term) if PHONE_LIKE.match(term) else ''
+    if not e164:
+        return None
+    return Q(mobile_e164=e164) | Q(phone_e164=e164)
+
+
+def use_trigrams():
+    return connection.vendor == 'postgresql'
+
+
+class ContactSearchFilter(SearchFilter):
+    """SearchFilter that resolves full phone numbers through the E.164 indexes"""
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        by_phone = phone_filter(' '.join(terms)) if terms else None
+        if by_phone is not None:
+            return queryset.filter(by_phone)
+        return super().filter_queryset(request, queryset, view)
+
+
+def _token_filter(token):
+    """Predicate matching one token against any of the typeahead fields"""
+    if use_trigrams() and len(token) >= TRIGRAM_MIN_LENGTH:
+        companies = Company.objects.filter(name__trigram_word_similar=token).values('id')
+        return (
+            Q(first_name__trigram_word_similar=token) |
+            Q(last_name__trigram_word_similar=token) |
+            Q(email__trigram_word_similar=token) |
+            Q(company_id__in=companies)
+        )
+
+    companies = Company.objects.filter(name__istartswith=token).values('id')
+    return (
+        Q(first_name__istartswith=token) |
+        Q(last_name__istartswith=token) |
+        Q(email__istartswith=token) |
+        Q(company_id__in=companies)
+    )
+
+
+def _token_rank(token):
+    """Score for one token: prefix hits first, then trigram word similarity"""
+    prefix = Case(
+        When(Q(last_name__istartswith=token) | Q(first_name__istartswith=token), then=Value(2)),
+        When(Q(email__istartswith=token) | Q(company__name__istartswith=token), then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    if not (use_trigrams() and len(token) >= TRIGRAM_MIN_LENGTH):
+        return prefix
+
+    from django.contrib.postgres.search import TrigramWordSimilarity
+    similarity = Greatest(
+        TrigramWordSimilarity(token, 'first_name'),
+        TrigramWordSimilarity(token, 'last_name'),
+        TrigramWordSimilarity(token, 'email'),
+        TrigramWordSimilarity(token, 'company__name'),
+        output_field=FloatField(),
+    )
+    return prefix + similarity
+
+
+def rank_contacts(queryset, term, limit=None):
+    """Rank contacts matching ``term`` and return at most ``limit`` of them"""
+    limit = min(limit or settings.CONTACT_TYPEAHEAD_LIMIT, settings.CONTACT_TYPEAHEAD_MAX_LIMIT)
+
+    by_phone = phone_filter(term)
+    if by_phone is not None:
+        return queryset.filter(by_phone).annotate(rank=Value(3.0, output_field=FloatField()))[:limit]
+
+    tokens = term.lower().split()[:MAX_TOKENS]
+    if not tokens:
+        return queryset.none()
+
+    rank = Value(0.0, output_field=FloatField())
+    for token in tokens:
+        queryset = queryset.filter(_token_filter(token))
+        rank = rank + _token_rank(token)
+
+    return queryset.annotate(rank=rank).order_by(
+        F('rank').desc(), 'last_name', 'first_name', 'id'
+    )[:limit]
@@ -1,21 +1,36 @@
+import os
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Contact, Company
+from .models import Contact, Company, DuplicateSuggestion, ImportJob
+from .importer import IMPORTERS
 
 User = get_user_model()
 
 class CompanySerializer(serializers.ModelSerializer):
     """Serializer for Company model"""
     
+    # Materialized rollups (CompanyStats); select_related('stats') to avoid a query per company
+    contact_count = serializers.IntegerField(source='stats.contact_count', read_only=True, default=0)
+    open_cases = serializers.IntegerField(source='stats.open_cases', read_only=True, default=0)
+    closed_cases = serializers.IntegerField(source='stats.closed_cases', read_only=True, default=0)
+    last_activity_at = serializers.DateTimeField(source='stats.last_activity_at', read_only=True, default=None)
+    avg_resolution_time = serializers.DurationField(source='stats.avg_resolution_time', read_only=True, default=None)
+    
     class Meta:
         model = Company
         fields = [
             'id', 'name', 'industry', 'website', 'phone', 'address', 'city',
             'state', 'country', 'postal_code', 'description', 'annual_revenue',
             'employee_count', 'is_active', 'is_customer', 'is_prospect',
-            'created_at', 'updated_at'
+            'parent', 'path', 'depth', 'contact_count', 'open_cases', 'closed_cases',
+            'last_activity_at', 'avg_resolution_time', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'path', 'depth', 'created_at', 'updated_at']
+    
+    def validate_parent(self, value):
+        if value and self.instance and value.path.startswith(self.instance.path):
+            raise serializers.ValidationError('A company cannot be moved under itself or one of its subsidiaries')
+        return value
 
 class CompanyCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating companies"""
@@ -25,7 +40,7 @@ class CompanyCreateSerializer(serializers.ModelSerializer):
         fields = [
             'name', 'industry', 'website', 'phone', 'address', 'city',
             'state', 'country', 'postal_code', 'description', 'annual_revenue',
-            'employee_count', 'is_active', 'is_customer', 'is_prospect'
+            'employee_count', 'is_active', 'is_customer', 'is_prospect', 'parent'
         ]
 
 class ContactSerializer(serializers.ModelSerializer):
@@ -38,12 +53,13 @@ class ContactSerializer(serializers.ModelSerializer):
         model = Contact
         fields = [
             'id', 'title', 'first_name', 'last_name', 'email', 'phone', 'mobile',
+            'phone_e164', 'mobile_e164',
             'company', 'job_title', 'department', 'address', 'city', 'state',
             'country', 'postal_code', 'notes', 'birthday', 'linkedin_url',
             'twitter_handle', 'is_active', 'is_customer', 'is_prospect',
             'email_opt_out', 'phone_opt_out', 'user', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'user', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'phone_e164', 'mobile_e164', 'user', 'created_at', 'updated_at']
 
 class ContactCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating contacts"""
@@ -84,4 +100,55 @@ class ContactListSerializer(serializers.ModelSerializer):
         ]
     
     def get_full_name(self, obj):
-        return obj.get_full_name() 
\ No newline at end of file
+        return obj.get_full_name() 
+
+class ContactPhoneLookupSerializer(serializers.Serializer):
+    """Serializer for resolving a batch of phone numbers to contacts"""
+    numbers = serializers.ListField(
+        child=serializers.CharField(max_length=32),
+        allow_empty=False,
+        max_length=5000
+    )
+
+class DuplicateSuggestionSerializer(serializers.ModelSerializer):
+    """Serializer for suggested duplicate contact pairs"""
+    
+    contact = ContactListSerializer(read_only=True)
+    duplicate = ContactListSerializer(read_only=True)
+    
+    class Meta:
+        model = DuplicateSuggestion
+        fields = ['id', 'contact', 'duplicate', 'score', 'reasons', 'status', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+class ContactMergeSerializer(serializers.Serializer):
+    """Serializer for merging contacts into the one being kept"""
+    duplicates = serializers.PrimaryKeyRelatedField(
+        queryset=Contact.objects.all(),
+        many=True,
+        allow_empty=False
+    )
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    """Serializer for import jobs and their progress"""
+    
+    created_by = serializers.StringRelatedField(read_only=True)
+    
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id', 'kind', 'file', 'status', 'processed_rows', 'created_count',
+            'updated_count', 'error_count', 'errors', 'rows_per_second',
+            'error_message', 'created_by', 'created_at', 'started_at', 'completed_at'
+        ]
+        read_only_fields = [
+            'id', 'status', 'processed_rows', 'created_count', 'updated_count',
+            'error_count', 'errors', 'rows_per_second', 'error_message',
+            'created_by', 'created_at', 'started_at', 'completed_at'
+        ]
+    
+    def validate(self, attrs):
+        extensions = IMPORTERS[attrs.get('kind', 'contacts')].extensions
+        if os.path.splitext(attrs['file'].name)[1].lower() not in extensions:
+            raise serializers.ValidationError({'file': f"Upload a {' or '.join(extensions)} file"})
+        return attrs
@@ -0,0 +1,114 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Substr
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from cases.models import Case
+from meetings.models import Meeting
+from .models import Contact, Company, CompanyStats
+
+STATUS_SOURCE_FIELDS = {'is_customer', 'company_id'}
+
+
+@receiver(post_init, sender=Contact)
+def remember_customer_status(sender, instance, **kwargs):
+    if instance.pk is None or STATUS_SOURCE_FIELDS & instance.get_deferred_fields():
+        # Reading deferred fields here would cost a query per row
+        instance._customer_snapshot = None
+    else:
+        instance._customer_snapshot = (instance.is_customer, instance.company_id)
+
+
+@receiver(post_save, sender=Contact)
+def promote_company_on_customer_change(sender, instance, created, update_fields=None, **kwargs):
+    """Mark the company as a customer when a contact becomes its customer"""
+    previous = None if created else instance._customer_snapshot
+    instance._customer_snapshot = (instance.is_customer, instance.company_id)
+    
+    if update_fields is not None and not {'is_customer', 'company', 'company_id'} & set(update_fields):
+        return
+    if not (instance.is_customer and instance.company_id):
+        return
+    if previous == (True, instance.company_id):
+        # Already a customer of this company; the company was promoted back then
+        return
+    
+    # Filtered so an already-flagged company is not rewritten (or locked)
+    Company.sync_customer_status(
+        contacts=Contact.objects.filter(id=instance.id),
+        company_ids=[instance.company_id]
+    )
+
+
+def refresh_company_stats(company_ids):
+    company_ids = set(filter(None, company_ids))
+    if company_ids:
+        transaction.on_commit(lambda: CompanyStats.refresh(company_ids))
+
+
+def owner_company_ids(owners):
+    """Companies of ``(company_id, contact_id)`` pairs, falling back to the contact's company"""
+    company_ids = {company_id for company_id, _ in owners if company_id}
+    contact_ids = {contact_id for company_id, contact_id in owners if not company_id and contact_id}
+    if contact_ids:
+        company_ids.update(Contact.objects.filter(id__in=contact_ids).values_list('company_id', flat=True))
+    return company_ids
+
+
+@receiver(post_save, sender=Company)
+def create_company_stats(sender, instance, created, **kwargs):
+    if created:
+        CompanyStats.objects.create(company=instance)
+
+
+@receiver(post_init, sender=Contact)
+def remember_stats_company(sender, instance, **kwargs):
+    instance._stats_company_id = None if 'company_id' in instance.get_deferred_fields() else instance.company_id
+
+
+@receiver(post_save, sender=Contact)
+def refresh_stats_on_contact_save(sender, instance, created, update_fields=None, **kwargs):
+    """Contact counts and case ownership follow the contact's company"""
+    previous = instance._stats_company_id
+    instance._stats_company_id = instance.company_id
+    if created or previous != instance.company_id:
+        refresh_company_stats([previous, instance.company_id])
+
+
+@receiver(post_delete, sender=Contact)
+def refresh_stats_on_contact_delete(sender, instance, **kwargs):
+    refresh_company_stats([instance.company_id])
+
+
+@receiver(post_init, sender=Case)
+@receiver(post_init, sender=Meeting)
+def remember_stats_owner(sender, instance, **kwargs):
+    contact_field = 'customer_id' if sender is Case else 'contact_id'
+    if instance.pk is None or {'company_id', contact_field} & instance.get_deferred_fields():
+        instance._stats_owner = None
+    else:
+        instance._stats_owner = (instance.company_id, getattr(instance, contact_field))
+
+
+@receiver(post_save, sender=Case)
+@receiver(post_save, sender=Meeting)
+@receiver(post_delete, sender=Case)
+@receiver(post_delete, sender=Meeting)
+def refresh_stats_on_activity(sender, instance, **kwargs):
+    """Case counts and last activity of the company the case or meeting belongs to"""
+    current = (instance.company_id, instance.customer_id if sender is Case else instance.contact_id)
+    owners = {current}
+    if getattr(instance, '_stats_owner', None):
+        owners.add(instance._stats_owner)
+    instance._stats_owner = current
+    refresh_company_stats(owner_company_ids(owners))
+
+
+@receiver(post_delete, sender=Company)
+def promote_subsidiaries_on_delete(sender, instance, **kwargs):
+    """Subsidiaries of a deleted company become the tops of their own groups"""
+    if instance.path:
+        Company.objects.filter(path__startswith=instance.path).update(
+            path=Substr('path', len(instance.path) + 1),
+            depth=F('depth') - (instance.depth + 1),
+        )
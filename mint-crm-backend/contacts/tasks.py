@@ -0,0 +1,40 @@
+from celery import shared_task
+import logging
+
+from django.utils.dateparse import parse_datetime
+
+from .dedupe import find_duplicates
+from .importer import run_job
+from .models import CompanyStats, Contact, ImportJob
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def run_import_job(job_id):
+    """Stream an uploaded file through the importer of its kind"""
+    job = ImportJob.objects.get(id=job_id)
+    stats = run_job(job)
+    logger.info(f"Import job {job_id} finished: {stats}")
+    if job.kind == 'contacts':
+        find_duplicate_contacts.delay(updated_since=job.created_at.isoformat())
+    return stats
+
+
+@shared_task
+def find_duplicate_contacts(updated_since=None):
+    """Refresh duplicate suggestions, optionally only around recently changed contacts"""
+    contacts = None
+    if updated_since:
+        contacts = Contact.objects.filter(updated_at__gte=parse_datetime(updated_since))
+    stats = find_duplicates(contacts)
+    logger.info(f"Duplicate contact scan finished: {stats}")
+    return stats
+
+
+@shared_task
+def reconcile_company_stats():
+    """Rebuild the per-company rollups, catching writes that bypassed save()"""
+    reconciled = CompanyStats.reconcile()
+    logger.info(f"Company stats reconciled for {reconciled} companies")
+    return reconciled
@@ -0,0 +1,154 @@
+"""Customer 360 activity feed for a contact.
+
+Cases, emails (through the contact's cases), SMS messages, meetings and tasks
+(through the contact's cases) are projected onto the same slim columns and
+combined with ``UNION ALL``, ordered newest first. Pages are keyset-paginated
+on ``(occurred_at, type, id)`` so deep pages cost the same as the first one,
+and the per-type totals come from a single query of scalar subqueries.
+"""
+import base64
+import json
+
+from django.db import connection
+from django.db.models import CharField, Exists, F, Func, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Substr
+from django.utils.dateparse import parse_datetime
+
+from cases.models import Case
+from emails.models import SMS, Email
+from meetings.models import Meeting
+from tasks.models import Task
+
+from .models import Contact
+
+COLUMNS = ['item_type', 'item_id', 'item_at', 'item_title', 'item_status', 'item_detail', 'item_case']
+
+# type -> (model, contact lookup, time field, title expression, detail field)
+SOURCES = {
+    'case': (Case, 'customer', 'created_at', F('title'), 'priority'),
+    'email': (Email, 'case__customer', 'created_at', F('subject'), 'email_type'),
+    'sms': (SMS, 'contact', 'created_at', Substr('message', 1, 200), 'sms_type'),
+    'meeting': (Meeting, 'contact', 'start_time', F('title'), 'meeting_type'),
+    'task': (Task, 'case__customer', 'created_at', F('title'), 'priority'),
+}
+
+
+class InvalidCursor(ValueError):
+    """The pagination cursor could not be decoded"""
+
+
+def encode_cursor(item):
+    position = [item['occurred_at'].isoformat(), item['type'], item['id']]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        occurred_at, item_type, item_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        occurred_at = parse_datetime(occurred_at)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    if occurred_at is None or item_type not in SOURCES or not isinstance(item_id, int):
+        raise InvalidCursor('Invalid cursor')
+    return occurred_at, item_type, item_id
+
+
+def visible(item_type, queryset, user):
+    """Apply the visibility rules of each type's own endpoint"""
+    if item_type in ('email', 'sms'):
+        # Users only see the emails and messages they sent or received themselves
+        return queryset.filter(user=user)
+
+    if item_type == 'meeting':
+        if user.is_staff:
+            return queryset
+        attending = Meeting.attendees.through.objects.filter(meeting=OuterRef('pk'), user=user)
+        return queryset.filter(Q(is_private=False) | Q(organizer=user) | Exists(attending))
+
+    # Cases, and tasks through their case, follow CaseViewSet's role rules
+    if user.is_manager:
+        return queryset
+    prefix = '' if item_type == 'case' else 'case__'
+    if user.role == 'agent':
+        return queryset.filter(Q(**{f'{prefix}assigned_to': user}) | Q(**{f'{prefix}assigned_to__isnull': True}))
+    if user.role == 'customer':
+        return queryset.filter(**{f'{prefix}customer__user': user})
+    return queryset.none()
+
+
+def source_queryset(item_type, contact, user):
+    model, lookup, _, _, _ = SOURCES[item_type]
+    return visible(item_type, model.objects.filter(**{lookup: contact}), user)
+
+
+def branch(item_type, contact, user, after=None):
+    """Slim projection of one source, starting after the ``after`` cursor position"""
+    _, _, time_field, title, detail = SOURCES[item_type]
+    queryset = source_queryset(item_type, contact, user)
+
+    if after is not None:
+        occurred_at, after_type, after_id = after
+        # Rows sort by (occurred_at, type, id) descending and the type is fixed per branch
+        if item_type < after_type:
+            queryset = queryset.filter(**{f'{time_field}__lte': occurred_at})
+        elif item_type == after_type:
+            queryset = queryset.filter(
+                Q(**{f'{time_field}__lt': occurred_at}) | Q(**{time_field: occurred_at, 'id__lt': after_id})
+            )
+        else:
+            queryset = queryset.filter(**{f'{time_field}__lt': occurred_at})
+
+    case = F('id') if item_type == 'case' else F('case_id')
+    return queryset.order_by().annotate(
+        item_type=Value(item_type, output_field=CharField()),
+        item_id=F('id'),
+        item_at=F(time_field),
+        item_title=title,
+        item_status=F('status'),
+        item_detail=F(detail),
+        item_case=case,
+    ).values(*COLUMNS)
+
+
+def contact_timeline(contact, user, limit, cursor=None):
+    """One page of the feed and the cursor of the next page (None on the last page)"""
+    after = decode_cursor(cursor) if cursor else None
+    branches = [branch(item_type, contact, user, after) for item_type in SOURCES]
+    if connection.features.supports_slicing_ordering_in_compound:
+        # Each branch stops after one page on its (contact, time) index
+        branches = [queryset.order_by('-item_at', '-item_id')[:limit + 1] for queryset in branches]
+    first, *rest = branches
+    rows = first.union(*rest, all=True).order_by('-item_at', '-item_type', '-item_id')[:limit + 1]
+
+    items = [
+        {
+            'type': row['item_type'],
+            'id': row['item_id'],
+            'occurred_at': row['item_at'],
+            'title': row['item_title'],
+            'status': row['item_status'],
+            'detail': row['item_detail'],
+            'case_id': row['item_case'],
+        }
+        for row in rows
+    ]
+    next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else None
+    return items[:limit], next_cursor
+
+
+def timeline_counts(contact, user):
+    """Number of items of each type, as one query"""
+    counts = {
+        f'{item_type}_count': Coalesce(
+            Subquery(
+                # COUNT() as a plain function so the subquery is not grouped per row
+                source_queryset(item_type, contact, user).order_by()
+                .annotate(total=Func(F('id'), function='COUNT')).values('total'),
+                output_field=IntegerField()
+            ),
+            0
+        )
+        for item_type in SOURCES
+    }
+    row = Contact.objects.filter(pk=contact.pk).values(**counts).get()
+    return {item_type: row[f'{item_type}_count'] for item_type in SOURCES}
@@ -3,23 +3,45 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-from django.db.models import Count, Q
-from .models import Contact, Company
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+from .models import Contact, Company, CompanyStats, DuplicateSuggestion, ImportJob
 from .serializers import (
     ContactSerializer, ContactCreateSerializer, ContactUpdateSerializer, ContactListSerializer,
-    CompanySerializer, CompanyCreateSerializer
+    CompanySerializer, CompanyCreateSerializer, ContactPhoneLookupSerializer, ImportJobSerializer,
+    DuplicateSuggestionSerializer, ContactMergeSerializer
 )
+from .search import ContactSearchFilter, phone_filter, rank_contacts
+from .dedupe import merge_contacts
+from .hierarchy import CompanyGroupFilter
+from .timeline import InvalidCursor, contact_timeline, timeline_counts
+from api.exports import ExportMixin
+from django.conf import settings
+from django.db import transaction
+from rest_framework.parsers import MultiPartParser, FormParser
 
-class CompanyViewSet(viewsets.ModelViewSet):
+class CompanyViewSet(ExportMixin, viewsets.ModelViewSet):
     """ViewSet for Company model"""
-    queryset = Company.objects.all()
+    queryset = Company.objects.select_related('stats')
     serializer_class = CompanySerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['industry', 'is_active', 'is_customer', 'is_prospect']
+    filter_backends = [DjangoFilterBackend, CompanyGroupFilter, SearchFilter, OrderingFilter]
+    filterset_fields = ['industry', 'is_active', 'is_customer', 'is_prospect', 'parent', 'depth']
+    company_group_lookups = ['']
     search_fields = ['name', 'website', 'phone', 'address']
-    ordering_fields = ['name', 'created_at', 'annual_revenue']
+    ordering_fields = [
+        'name', 'created_at', 'annual_revenue', 'stats__contact_count', 'stats__open_cases',
+        'stats__closed_cases', 'stats__last_activity_at', 'stats__avg_resolution_time'
+    ]
     ordering = ['name']
+    export_name = 'companies'
+    export_fields = [
+        ('id', 'id'), ('name', 'name'), ('industry', 'industry'), ('website', 'website'),
+        ('phone', 'phone'), ('city', 'city'), ('country', 'country'),
+        ('annual_revenue', 'annual_revenue'), ('employee_count', 'employee_count'),
+        ('is_active', 'is_active'), ('is_customer', 'is_customer'),
+        ('is_prospect', 'is_prospect'), ('created_at', 'created_at'),
+    ]
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -29,17 +51,45 @@ class CompanyViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def customers(self, request):
         """Get all customer companies"""
-        customers = self.get_queryset().filter(is_customer=True)
+        customers = self.filter_queryset(self.get_queryset()).filter(is_customer=True)
+        page = self.paginate_queryset(customers)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
         serializer = self.get_serializer(customers, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def prospects(self, request):
         """Get all prospect companies"""
-        prospects = self.get_queryset().filter(is_prospect=True)
+        prospects = self.filter_queryset(self.get_queryset()).filter(is_prospect=True)
+        page = self.paginate_queryset(prospects)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
         serializer = self.get_serializer(prospects, many=True)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get'])
+    def subsidiaries(self, request, pk=None):
+        """All companies below this one in its group, at any depth"""
+        company = self.get_object()
+        subsidiaries = self.filter_queryset(self.get_queryset()).filter(
+            path__startswith=company.path
+        ).exclude(pk=company.pk)
+        page = self.paginate_queryset(subsidiaries)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        serializer = self.get_serializer(subsidiaries, many=True)
+        return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def group_stats(self, request, pk=None):
+        """Rollup across this company and all its subsidiaries"""
+        company = self.get_object()
+        return Response({
+            'company': company.id,
+            **CompanyStats.group_rollup(company),
+        })
+    
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get company statistics"""
@@ -50,20 +100,36 @@ class CompanyViewSet(viewsets.ModelViewSet):
             'customers': queryset.filter(is_customer=True).count(),
             'prospects': queryset.filter(is_prospect=True).count(),
             'by_industry': queryset.values('industry').annotate(count=Count('id')),
+            **CompanyStats.objects.aggregate(
+                contacts=Coalesce(Sum('contact_count'), 0),
+                open_cases=Coalesce(Sum('open_cases'), 0),
+                closed_cases=Coalesce(Sum('closed_cases'), 0),
+            ),
         }
         
         return Response(stats)
 
-class ContactViewSet(viewsets.ModelViewSet):
+class ContactViewSet(ExportMixin, viewsets.ModelViewSet):
     """ViewSet for Contact model"""
-    queryset = Contact.objects.select_related('company', 'user')
+    queryset = Contact.objects.select_related('company__stats', 'user')
     serializer_class = ContactSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, CompanyGroupFilter, ContactSearchFilter, OrderingFilter]
     filterset_fields = ['company', 'is_customer', 'is_prospect', 'is_active']
-    search_fields = ['first_name', 'last_name', 'email', 'phone']
+    company_group_lookups = ['company']
+    search_fields = ['first_name', 'last_name', 'email', 'phone', 'company__name']
     ordering_fields = ['first_name', 'last_name', 'created_at']
     ordering = ['first_name', 'last_name']
+    export_name = 'contacts'
+    export_fields = [
+        ('id', 'id'), ('first_name', 'first_name'), ('last_name', 'last_name'),
+        ('email', 'email'), ('phone', 'phone'), ('mobile', 'mobile'),
+        ('company', 'company__name'), ('job_title', 'job_title'), ('department', 'department'),
+        ('city', 'city'), ('country', 'country'), ('is_active', 'is_active'),
+        ('is_customer', 'is_customer'), ('is_prospect', 'is_prospect'),
+        ('email_opt_out', 'email_opt_out'), ('phone_opt_out', 'phone_opt_out'),
+        ('created_at', 'created_at'),
+    ]
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -74,47 +140,23 @@ class ContactViewSet(viewsets.ModelViewSet):
             return ContactListSerializer
         return ContactSerializer
     
-    def get_queryset(self):
-        """Filter queryset with custom search"""
-        queryset = super().get_queryset()
-        
-        # Apply search filter if search parameter is provided
-        search = self.request.query_params.get('search', None)
-        if search:
-            queryset = self.filter_queryset_by_search(queryset, search)
-        
-        return queryset
-    
-    def filter_queryset_by_search(self, queryset, search_term):
-        """Custom search method to handle related field searches"""
-        if not search_term:
-            return queryset
-        
-        # Create Q objects for different search fields
-        search_filters = Q()
-        
-        # Direct field searches
-        search_filters |= Q(first_name__icontains=search_term)
-        search_filters |= Q(last_name__icontains=search_term)
-        search_filters |= Q(email__icontains=search_term)
-        search_filters |= Q(phone__icontains=search_term)
-        
-        # Related field searches
-        search_filters |= Q(company__name__icontains=search_term)
-        
-        return queryset.filter(search_filters)
-    
     @action(detail=False, methods=['get'])
     def customers(self, request):
         """Get all customer contacts"""
-        customers = self.get_queryset().filter(is_customer=True)
+        customers = self.filter_queryset(self.get_queryset()).filter(is_customer=True)
+        page = self.paginate_queryset(customers)
+        if page is not None:
+            return self.get_paginated_response(ContactListSerializer(page, many=True).data)
         serializer = ContactListSerializer(customers, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def prospects(self, request):
         """Get all prospect contacts"""
-        prospects = self.get_queryset().filter(is_prospect=True)
+        prospects = self.filter_queryset(self.get_queryset()).filter(is_prospect=True)
+        page = self.paginate_queryset(prospects)
+        if page is not None:
+            return self.get_paginated_response(ContactListSerializer(page, many=True).data)
         serializer = ContactListSerializer(prospects, many=True)
         return Response(serializer.data)
     
@@ -125,6 +167,12 @@ class ContactViewSet(viewsets.ModelViewSet):
         if not query:
             return Response({'error': 'Search query required'}, status=status.HTTP_400_BAD_REQUEST)
         
+        by_phone = phone_filter(query)
+        if by_phone is not None:
+            contacts = self.get_queryset().filter(by_phone)
+            serializer = ContactListSerializer(contacts, many=True)
+            return Response(serializer.data)
+        
         contacts = self.get_queryset().filter(
             Q(first_name__icontains=query) |
             Q(last_name__icontains=query) |
@@ -136,6 +184,50 @@ class ContactViewSet(viewsets.ModelViewSet):
         serializer = ContactListSerializer(contacts, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def typeahead(self, request):
+        """Autocomplete over name, email and company; returns at most ``limit`` ranked matches"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response([])
+        
+        try:
+            limit = int(request.query_params.get('limit', settings.CONTACT_TYPEAHEAD_LIMIT))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        include_inactive = request.query_params.get('include_inactive') == 'true'
+        queryset = Contact.objects.all() if include_inactive else Contact.objects.filter(is_active=True)
+        matches = rank_contacts(queryset, query, limit=max(limit, 1)).values(
+            'id', 'first_name', 'last_name', 'email', 'company__name', 'rank'
+        )
+        
+        return Response([
+            {
+                'id': match['id'],
+                'full_name': f"{match['first_name']} {match['last_name']}".strip(),
+                'email': match['email'],
+                'company': match['company__name'],
+                'rank': round(match['rank'], 3),
+            }
+            for match in matches
+        ])
+    
+    @action(detail=False, methods=['post'])
+    def resolve_phones(self, request):
+        """Resolve a batch of phone numbers to contacts by exact E.164 match"""
+        serializer = ContactPhoneLookupSerializer(data=request.data)
+        
+        if serializer.is_valid():
+            numbers = serializer.validated_data['numbers']
+            contacts = Contact.resolve_phone_numbers(numbers)
+            return Response({
+                number: ContactListSerializer(contacts[number]).data if number in contacts else None
+                for number in numbers
+            })
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get contact statistics"""
@@ -145,7 +237,9 @@ class ContactViewSet(viewsets.ModelViewSet):
             'total_contacts': queryset.count(),
             'customers': queryset.filter(is_customer=True).count(),
             'prospects': queryset.filter(is_prospect=True).count(),
-            'by_company': queryset.values('company__name').annotate(count=Count('id')),
+            # Largest companies from the materialized rollups, not a GROUP BY over all contacts
+            'by_company': CompanyStats.objects.filter(contact_count__gt=0).order_by('-contact_count')
+                .values('company__name', count=F('contact_count'))[:settings.CONTACT_STATS_TOP_COMPANIES],
         }
         
         return Response(stats)
@@ -168,4 +262,118 @@ class ContactViewSet(viewsets.ModelViewSet):
         return Response({
             'message': f'{contact.get_full_name()} converted to customer',
             'contact': ContactSerializer(contact).data
-        }) 
\ No newline at end of file
+        })
+
+    @action(detail=True, methods=['get'])
+    def timeline(self, request, pk=None):
+        """Contact, per-type activity counts and a page of cases, emails, SMS, meetings and tasks"""
+        contact = self.get_object()
+        
+        try:
+            limit = int(request.query_params.get('limit', settings.CONTACT_TIMELINE_PAGE_SIZE))
+            items, next_cursor = contact_timeline(
+                contact, request.user,
+                limit=min(max(limit, 1), settings.CONTACT_TIMELINE_MAX_PAGE_SIZE),
+                cursor=request.query_params.get('cursor')
+            )
+        except (ValueError, InvalidCursor) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'contact': ContactSerializer(contact).data,
+            'counts': timeline_counts(contact, request.user),
+            'next_cursor': next_cursor,
+            'results': items,
+        })
+    
+    @action(detail=True, methods=['post'])
+    def merge(self, request, pk=None):
+        """Merge duplicate contacts into this one"""
+        contact = self.get_object()
+        serializer = ContactMergeSerializer(data=request.data)
+        
+        if serializer.is_valid():
+            moved = merge_contacts(contact, serializer.validated_data['duplicates'])
+            contact.refresh_from_db()
+            return Response({
+                'message': f'Merged {len(serializer.validated_data["duplicates"])} contacts into {contact.get_full_name()}',
+                'moved': moved,
+                'contact': ContactSerializer(contact).data
+            })
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class DuplicateSuggestionViewSet(viewsets.ReadOnlyModelViewSet):
+    """Likely duplicate contact pairs found by the dedupe scan"""
+    queryset = DuplicateSuggestion.objects.select_related('contact__company', 'duplicate__company')
+    serializer_class = DuplicateSuggestionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['status', 'contact', 'duplicate']
+    ordering_fields = ['score', 'created_at']
+    ordering = ['-score', 'id']
+    
+    def get_queryset(self):
+        queryset = self.queryset
+        if self.action == 'list' and 'status' not in self.request.query_params:
+            queryset = queryset.filter(status='pending')
+        min_score = self.request.query_params.get('min_score')
+        if min_score:
+            try:
+                queryset = queryset.filter(score__gte=float(min_score))
+            except ValueError:
+                pass
+        return queryset
+    
+    @action(detail=True, methods=['post'])
+    def merge(self, request, pk=None):
+        """Merge the pair, keeping ``keep`` (the older contact by default)"""
+        suggestion = self.get_object()
+        keep = str(request.data.get('keep', suggestion.contact_id))
+        if keep not in (str(suggestion.contact_id), str(suggestion.duplicate_id)):
+            return Response(
+                {'error': 'keep must be one of the two contacts in the suggestion'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if keep == str(suggestion.contact_id):
+            primary, duplicate = suggestion.contact, suggestion.duplicate
+        else:
+            primary, duplicate = suggestion.duplicate, suggestion.contact
+        moved = merge_contacts(primary, [duplicate])
+        primary.refresh_from_db()
+        
+        return Response({
+            'message': f'Merged into {primary.get_full_name()}',
+            'moved': moved,
+            'contact': ContactSerializer(primary).data
+        })
+    
+    @action(detail=True, methods=['post'])
+    def dismiss(self, request, pk=None):
+        """Mark the pair as not duplicates so it is not suggested again"""
+        suggestion = self.get_object()
+        suggestion.status = 'dismissed'
+        suggestion.save(update_fields=['status', 'updated_at'])
+        return Response(self.get_serializer(suggestion).data)
+
+class ImportJobViewSet(viewsets.ModelViewSet):
+    """Upload files for bulk import by the importer of their kind and follow their progress"""
+    queryset = ImportJob.objects.select_related('created_by')
+    serializer_class = ImportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+    http_method_names = ['get', 'post', 'head', 'options']
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['kind', 'status']
+    ordering = ['-created_at']
+    
+    def get_queryset(self):
+        """Users can only see their own import jobs"""
+        return self.queryset.filter(created_by=self.request.user)
+    
+    def perform_create(self, serializer):
+        from .tasks import run_import_job
+        
+        job = serializer.save(created_by=self.request.user)
+        transaction.on_commit(lambda: run_import_job.delay(job.id))
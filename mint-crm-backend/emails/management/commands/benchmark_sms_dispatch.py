@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from emails.models import SMS
+from emails.sms_dispatch import SMSDispatcher, StubProvider
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent SMS dispatch against the local stub provider (no database writes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=5000, help='Number of messages to send')
+        parser.add_argument('--workers', type=int, default=16, help='Dispatcher thread pool size')
+        parser.add_argument('--latency-ms', type=int, default=50, help='Simulated provider latency per message')
+        parser.add_argument('--rate', type=float, default=None, help='Messages per second per sender number')
+        parser.add_argument('--senders', type=int, default=1, help='Number of distinct sender numbers')
+
+    def handle(self, *args, **options):
+        if options['rate']:
+            # Rate limiters are created lazily, so this applies to the whole run
+            settings.SMS_RATE_LIMITS = {**settings.SMS_RATE_LIMITS, 'stub': options['rate']}
+
+        dispatcher = SMSDispatcher(max_workers=options['workers'])
+        dispatcher.provider = StubProvider({'provider': 'stub', 'latency_ms': options['latency_ms']})
+
+        senders = [f"+1555000{i:04d}" for i in range(options['senders'])]
+
+        messages = (
+            SMS(message='Benchmark message', from_number=senders[i % len(senders)], to_number=f"+1555{i:07d}")
+            for i in range(options['count'])
+        )
+
+        started = time.monotonic()
+        failed = sum(1 for _, _, error in dispatcher.send(messages) if error)
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Sent {options['count'] - failed}/{options['count']} messages in {elapsed:.2f}s "
+                f"({options['count'] / elapsed * 60:,.0f} messages/minute, {failed} failed)"
+            )
+        )
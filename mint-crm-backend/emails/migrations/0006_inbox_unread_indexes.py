@@ -0,0 +1,25 @@
+# Generated by Django 5.0.2 on 2026-10-19 01:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0002_initial'),
+        ('contacts', '0002_initial'),
+        ('emails', '0005_sms_smslog_smstemplate_usersmsconfig_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='email',
+            index=models.Index(condition=models.Q(('read', False)), fields=['user', 'archived', 'read', 'created_at'], name='email_user_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sms',
+            index=models.Index(condition=models.Q(('read', False)), fields=['user', 'archived', 'read', 'created_at'], name='sms_user_unread_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.2 on 2026-10-19 01:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0006_inbox_unread_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboxCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(choices=[('email', 'Email'), ('sms', 'SMS')], max_length=10)),
+                ('total', models.IntegerField(default=0)),
+                ('unread', models.IntegerField(default=0, help_text='Unread messages that are not archived')),
+                ('starred', models.IntegerField(default=0)),
+                ('archived', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Inbox Counter',
+                'verbose_name_plural': 'Inbox Counters',
+                'unique_together': {('user', 'channel')},
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.2 on 2026-10-19 01:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+from contacts.phone import normalize_phone
+
+
+def assign_conversations(apps, schema_editor):
+    SMS = apps.get_model('emails', 'SMS')
+    pending = SMS.objects.filter(conversation_id='').only('id', 'sms_type', 'from_number', 'to_number')
+    batch = []
+    for sms in pending.iterator(chunk_size=2000):
+        if sms.sms_type == 'inbound':
+            contact_number, sender_number = sms.from_number, sms.to_number
+        else:
+            contact_number, sender_number = sms.to_number, sms.from_number
+        sms.conversation_id = f"{normalize_phone(sender_number)}:{normalize_phone(contact_number)}"
+        batch.append(sms)
+        if len(batch) >= 2000:
+            SMS.objects.bulk_update(batch, ['conversation_id'])
+            batch = []
+    if batch:
+        SMS.objects.bulk_update(batch, ['conversation_id'])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0002_initial'),
+        ('contacts', '0002_initial'),
+        ('emails', '0008_smscampaign'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sms',
+            index=models.Index(fields=['user', 'conversation_id', 'created_at'], name='sms_user_conversation_idx'),
+        ),
+        migrations.RunPython(assign_conversations, migrations.RunPython.noop),
+    ]
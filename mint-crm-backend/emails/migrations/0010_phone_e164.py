@@ -0,0 +1,35 @@
+# Generated by Django 5.0.2 on 2026-10-19 01:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0002_initial'),
+        ('contacts', '0003_phone_e164'),
+        ('emails', '0009_sms_conversations'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sms',
+            name='from_number_e164',
+            field=models.CharField(blank=True, editable=False, max_length=16),
+        ),
+        migrations.AddField(
+            model_name='sms',
+            name='to_number_e164',
+            field=models.CharField(blank=True, editable=False, max_length=16),
+        ),
+        migrations.AddIndex(
+            model_name='sms',
+            index=models.Index(fields=['from_number_e164'], name='sms_from_e164_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sms',
+            index=models.Index(fields=['to_number_e164'], name='sms_to_e164_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-19 03:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0010_phone_e164'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sms',
+            name='status',
+            field=models.CharField(choices=[('draft', 'Draft'), ('queued', 'Queued'), ('sending', 'Sending'), ('sent', 'Sent'), ('delivered', 'Delivered'), ('failed', 'Failed'), ('undelivered', 'Undelivered')], default='draft', max_length=15),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from contacts.phone import normalize_phone, to_e164
 
 User = get_user_model()
 
@@ -120,6 +122,11 @@ class Email(models.Model):
             models.Index(fields=['user', 'created_at']),
             models.Index(fields=['message_id']),
             models.Index(fields=['thread_id']),
+            models.Index(
+                fields=['user', 'archived', 'read', 'created_at'],
+                name='email_user_unread_idx',
+                condition=models.Q(read=False),
+            ),
         ]
     
     def __str__(self):
@@ -291,6 +298,7 @@ class SMS(models.Model):
     STATUS_CHOICES = [
         ('draft', 'Draft'),
         ('queued', 'Queued'),
+        ('sending', 'Sending'),
         ('sent', 'Sent'),
         ('delivered', 'Delivered'),
         ('failed', 'Failed'),
@@ -303,11 +311,14 @@ class SMS(models.Model):
     message = models.TextField(max_length=1600)  # SMS character limit
     from_number = models.CharField(max_length=20)
     to_number = models.CharField(max_length=20)
+    from_number_e164 = models.CharField(max_length=16, blank=True, editable=False)
+    to_number_e164 = models.CharField(max_length=16, blank=True, editable=False)
     
     # Relationships
     case = models.ForeignKey('cases.Case', on_delete=models.CASCADE, null=True, blank=True, related_name='sms_messages')
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='sms_messages')
     contact = models.ForeignKey('contacts.Contact', on_delete=models.CASCADE, null=True, blank=True, related_name='sms_messages')
+    campaign = models.ForeignKey('SMSCampaign', on_delete=models.SET_NULL, null=True, blank=True, related_name='messages')
     
     # SMS Headers
     message_id = models.CharField(max_length=255, blank=True, help_text="SMS message ID from provider")
@@ -341,6 +352,14 @@ class SMS(models.Model):
             models.Index(fields=['contact', 'created_at']),
             models.Index(fields=['message_id']),
             models.Index(fields=['conversation_id']),
+            models.Index(fields=['user', 'conversation_id', 'created_at'], name='sms_user_conversation_idx'),
+            models.Index(fields=['from_number_e164'], name='sms_from_e164_idx'),
+            models.Index(fields=['to_number_e164'], name='sms_to_e164_idx'),
+            models.Index(
+                fields=['user', 'archived', 'read', 'created_at'],
+                name='sms_user_unread_idx',
+                condition=models.Q(read=False),
+            ),
         ]
     
     def __str__(self):
@@ -358,6 +377,50 @@ class SMS(models.Model):
     def can_retry(self):
         return self.status == 'failed' and self.retry_count < self.max_retries
     
+    @property
+    def contact_number(self):
+        """The other party's number: the sender for inbound messages, the recipient otherwise"""
+        return self.from_number if self.sms_type == 'inbound' else self.to_number
+    
+    @property
+    def sender_number(self):
+        """Our number in the exchange"""
+        return self.to_number if self.sms_type == 'inbound' else self.from_number
+    
+    @staticmethod
+    def build_conversation_id(contact_number, sender_number):
+        """Conversation key for a (contact number, sender number) pair"""
+        sender = to_e164(sender_number) or normalize_phone(sender_number)
+        contact = to_e164(contact_number) or normalize_phone(contact_number)
+        return f"{sender}:{contact}"
+    
+    def normalize_numbers(self):
+        """Refresh the E.164 columns from ``from_number`` and ``to_number``"""
+        self.from_number_e164 = to_e164(self.from_number)
+        self.to_number_e164 = to_e164(self.to_number)
+    
+    def assign_conversation(self):
+        """Set ``conversation_id`` from the message's numbers if it is not set yet"""
+        if not self.conversation_id:
+            self.conversation_id = self.build_conversation_id(self.contact_number, self.sender_number)
+        return self.conversation_id
+    
+    def prepare_for_write(self):
+        """Fill the derived columns; bulk_create callers must call this themselves"""
+        self.normalize_numbers()
+        self.assign_conversation()
+    
+    def save(self, *args, **kwargs):
+        # Normalize and thread messages at write time
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.prepare_for_write()
+        elif not self.conversation_id or {'from_number', 'to_number'} & set(update_fields):
+            self.prepare_for_write()
+            kwargs['update_fields'] = {*update_fields, 'from_number_e164', 'to_number_e164', 'conversation_id'}
+        
+        super().save(*args, **kwargs)
+    
     def mark_as_sent(self):
         """Mark SMS as sent"""
         from django.utils import timezone
@@ -419,6 +482,54 @@ class SMSTemplate(models.Model):
             'message': template.render(template_context),
         }
 
+class SMSCampaign(models.Model):
+    """Bulk SMS send of one template to a filtered set of contacts"""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('rendering', 'Rendering'),
+        ('sending', 'Sending'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    name = models.CharField(max_length=200)
+    template = models.ForeignKey(SMSTemplate, on_delete=models.PROTECT, related_name='campaigns')
+    contact_filter = models.JSONField(default=dict, blank=True, help_text="Contact filters selecting the recipients")
+    context = models.JSONField(default=dict, blank=True, help_text="Extra template variables shared by all messages")
+    status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='pending')
+    
+    # Progress
+    total_recipients = models.PositiveIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    error_message = models.TextField(blank=True)
+    
+    # Relationships
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sms_campaigns')
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
+    
+    @property
+    def processed_count(self):
+        return self.sent_count + self.failed_count
+    
+    @property
+    def progress(self):
+        """Percentage of recipients processed so far"""
+        if not self.total_recipients:
+            return 100 if self.status == 'completed' else 0
+        return round(100 * self.processed_count / self.total_recipients, 1)
+
 class SMSLog(models.Model):
     """Log model for SMS events and tracking"""
     
@@ -486,4 +597,137 @@ class UserSMSConfig(models.Model):
             'api_secret': self.api_secret,
             'from_number': self.from_number,
             'webhook_url': self.webhook_url,
-        } 
\ No newline at end of file
+        } 
+
+class InboxCounter(models.Model):
+    """Precomputed per-user inbox counters for the email and SMS inboxes.
+
+    Kept in step with ``Email``/``SMS`` by the signal handlers in
+    ``emails.signals``; code paths that bypass ``save()`` (``update()``,
+    ``bulk_create()``) must call ``refresh()`` for the affected users.
+    ``reconcile()`` rebuilds every counter and runs periodically.
+    """
+    
+    CHANNEL_CHOICES = [
+        ('email', 'Email'),
+        ('sms', 'SMS'),
+    ]
+    
+    MODELS = {
+        'email': Email,
+        'sms': SMS,
+    }
+    
+    FAILED_STATUSES = {
+        'email': ['failed', 'bounced'],
+        'sms': ['failed', 'undelivered'],
+    }
+    
+    COUNTED_FIELDS = ['total', 'unread', 'starred', 'archived', 'failed']
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='inbox_counters')
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    
+    # Counters (plain integers so a transient drift never trips a CHECK constraint)
+    total = models.IntegerField(default=0)
+    unread = models.IntegerField(default=0, help_text="Unread messages that are not archived")
+    starred = models.IntegerField(default=0)
+    archived = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    
+    # Timestamps
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['user', 'channel']
+        verbose_name = "Inbox Counter"
+        verbose_name_plural = "Inbox Counters"
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.channel}: {self.unread} unread"
+    
+    @classmethod
+    def channel_for(cls, message):
+        """Get the counter channel for an Email or SMS instance"""
+        return 'email' if isinstance(message, Email) else 'sms'
+    
+    @classmethod
+    def contribution(cls, message):
+        """Get how much a single message adds to each counter"""
+        return {
+            'total': 1,
+            'unread': int(not message.read and not message.archived),
+            'starred': int(message.starred),
+            'archived': int(message.archived),
+            'failed': int(message.status in cls.FAILED_STATUSES[cls.channel_for(message)]),
+        }
+    
+    @classmethod
+    def aggregates(cls, channel):
+        """Get aggregate expressions computing every counter in one query"""
+        return {
+            'total': models.Count('id'),
+            'unread': models.Count('id', filter=models.Q(read=False, archived=False)),
+            'starred': models.Count('id', filter=models.Q(starred=True)),
+            'archived': models.Count('id', filter=models.Q(archived=True)),
+            'failed': models.Count('id', filter=models.Q(status__in=cls.FAILED_STATUSES[channel])),
+        }
+    
+    @classmethod
+    def refresh(cls, user_id, channel):
+        """Recompute a user's counters for one channel from the message table"""
+        counts = cls.MODELS[channel].objects.filter(user_id=user_id).aggregate(**cls.aggregates(channel))
+        counter, _ = cls.objects.update_or_create(user_id=user_id, channel=channel, defaults=counts)
+        return counter
+    
+    @classmethod
+    def apply_delta(cls, user_id, channel, delta, create_missing=True):
+        """Atomically add a delta to a user's counters, creating them if missing"""
+        delta = {field: value for field, value in delta.items() if value}
+        if not delta:
+            return
+        
+        updated = cls.objects.filter(user_id=user_id, channel=channel).update(
+            updated_at=timezone.now(),
+            **{field: models.F(field) + value for field, value in delta.items()}
+        )
+        if not updated and create_missing:
+            cls.refresh(user_id, channel)
+    
+    @classmethod
+    def reconcile(cls, channel, batch_size=1000):
+        """Rebuild all counters for a channel with one grouped aggregate"""
+        rows = (
+            cls.MODELS[channel].objects
+            .filter(user__isnull=False)
+            .order_by()
+            .values('user_id')
+            .annotate(**cls.aggregates(channel))
+        )
+        
+        started_at = timezone.now()
+        reconciled = 0
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            reconciled += 1
+            batch.append(cls(channel=channel, **row))
+            if len(batch) >= batch_size:
+                cls._upsert(batch)
+                batch = []
+        if batch:
+            cls._upsert(batch)
+        
+        # Counters not touched above belong to users whose messages were all deleted
+        stale = cls.objects.filter(channel=channel, updated_at__lt=started_at)
+        stale.update(updated_at=timezone.now(), **{field: 0 for field in cls.COUNTED_FIELDS})
+        
+        return reconciled
+    
+    @classmethod
+    def _upsert(cls, counters):
+        cls.objects.bulk_create(
+            counters,
+            update_conflicts=True,
+            unique_fields=['user', 'channel'],
+            update_fields=cls.COUNTED_FIELDS + ['updated_at'],
+        )
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Email, EmailTemplate, EmailAttachment, EmailLog, UserEmailConfig, SMS, SMSTemplate, SMSLog, UserSMSConfig
+from .models import Email, EmailTemplate, EmailAttachment, EmailLog, UserEmailConfig, SMS, SMSTemplate, SMSLog, UserSMSConfig, InboxCounter, SMSCampaign
 
 User = get_user_model()
 
@@ -124,6 +124,37 @@ class EmailRetrySerializer(serializers.Serializer):
     """Serializer for retrying failed emails"""
     pass
 
+class InboxBulkActionSerializer(serializers.Serializer):
+    """Serializer for bulk inbox flag operations on emails and SMS messages"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        allow_empty=False
+    )
+    all = serializers.BooleanField(
+        required=False,
+        default=False,
+        help_text="Apply to every message matching the list filters instead of ids"
+    )
+    value = serializers.BooleanField(required=False, default=True)
+
+    def validate(self, data):
+        if not data.get('ids') and not data.get('all'):
+            raise serializers.ValidationError("Either 'ids' or 'all' must be provided")
+        return data
+
+class InboxMoveSerializer(InboxBulkActionSerializer):
+    """Serializer for moving emails and SMS messages between inbox folders"""
+    folder = serializers.ChoiceField(choices=['inbox', 'archive'])
+
+class InboxCounterSerializer(serializers.ModelSerializer):
+    """Serializer for precomputed inbox counters"""
+    
+    class Meta:
+        model = InboxCounter
+        fields = ['channel', 'total', 'unread', 'starred', 'archived', 'failed', 'updated_at']
+        read_only_fields = fields
+
 class EmailTemplateRenderSerializer(serializers.Serializer):
     """Serializer for rendering email templates"""
     template_id = serializers.PrimaryKeyRelatedField(
@@ -247,6 +278,24 @@ class SMSSerializer(serializers.ModelSerializer):
             'retry_count', 'created_at', 'updated_at'
         ]
 
+class SMSConversationSerializer(serializers.ModelSerializer):
+    """Serializer for a conversation: its latest message plus thread counters"""
+    
+    contact = serializers.StringRelatedField()
+    contact_number = serializers.CharField(read_only=True)
+    sender_number = serializers.CharField(read_only=True)
+    unread_count = serializers.IntegerField(read_only=True)
+    message_count = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = SMS
+        fields = [
+            'conversation_id', 'contact', 'contact_number', 'sender_number',
+            'id', 'sms_type', 'status', 'message', 'read', 'starred', 'archived',
+            'created_at', 'unread_count', 'message_count'
+        ]
+        read_only_fields = fields
+
 class SMSCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating SMS messages"""
     
@@ -287,6 +336,48 @@ class SMSTemplateRenderSerializer(serializers.Serializer):
     )
     context = serializers.JSONField(default=dict)
 
+class SMSCampaignContactFilterSerializer(serializers.Serializer):
+    """Serializer for the contact filter selecting campaign recipients"""
+    company = serializers.IntegerField(required=False)
+    is_customer = serializers.BooleanField(required=False)
+    is_prospect = serializers.BooleanField(required=False)
+    city = serializers.CharField(required=False)
+    country = serializers.CharField(required=False)
+    contact_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+class SMSCampaignSerializer(serializers.ModelSerializer):
+    """Serializer for SMS campaigns with job progress"""
+    
+    template = SMSTemplateSerializer(read_only=True)
+    created_by = UserMinimalSerializer(read_only=True)
+    processed_count = serializers.IntegerField(read_only=True)
+    progress = serializers.FloatField(read_only=True)
+    
+    class Meta:
+        model = SMSCampaign
+        fields = [
+            'id', 'name', 'template', 'contact_filter', 'context', 'status',
+            'total_recipients', 'sent_count', 'failed_count', 'processed_count',
+            'progress', 'error_message', 'created_by', 'created_at', 'started_at',
+            'completed_at'
+        ]
+        read_only_fields = fields
+
+class SMSCampaignCreateSerializer(serializers.ModelSerializer):
+    """Serializer for creating SMS campaigns"""
+    
+    template = serializers.PrimaryKeyRelatedField(queryset=SMSTemplate.objects.filter(is_active=True))
+    contact_filter = SMSCampaignContactFilterSerializer(required=False, default=dict)
+    
+    class Meta:
+        model = SMSCampaign
+        fields = ['id', 'name', 'template', 'contact_filter', 'context']
+        read_only_fields = ['id']
+    
+    def create(self, validated_data):
+        validated_data['created_by'] = self.context['request'].user
+        return super().create(validated_data)
+
 class UserSMSConfigSerializer(serializers.ModelSerializer):
     """Serializer for user SMS configuration"""
     
@@ -2,7 +2,10 @@ from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.utils import timezone
-from .models import Email, EmailTemplate, EmailLog, UserEmailConfig, SMS, SMSTemplate, SMSLog, UserSMSConfig
+from django.db import transaction
+from django.db.models import F
+from .models import Email, EmailTemplate, EmailLog, UserEmailConfig, SMS, SMSTemplate, SMSLog, UserSMSConfig, SMSCampaign, InboxCounter
+from .sms_dispatch import get_provider, get_bucket
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -504,11 +507,8 @@ class SMSService:
     def send_sms(sms, user_config=None):
         """Send an SMS and update its status"""
         try:
-            # Use user-specific config if provided, otherwise fall back to default
-            if user_config and user_config.is_verified:
-                SMSService._send_with_user_config(sms, user_config)
-            else:
-                SMSService._send_with_default_config(sms)
+            # Uses the user-specific provider if verified, otherwise the default provider
+            SMSService._send_with_provider(sms, user_config)
             
             # Update SMS status
             sms.mark_as_sent()
@@ -536,98 +536,15 @@ class SMSService:
             raise e
     
     @staticmethod
-    def _send_with_user_config(sms, user_config):
-        """Send SMS using user-specific configuration"""
-        config = user_config.get_provider_config()
-        
-        if config['provider'] == 'twilio':
-            SMSService._send_with_twilio(sms, config)
-        elif config['provider'] == 'aws_sns':
-            SMSService._send_with_aws_sns(sms, config)
-        elif config['provider'] == 'nexmo':
-            SMSService._send_with_nexmo(sms, config)
-        else:
-            raise ValueError(f"Unsupported SMS provider: {config['provider']}")
-    
-    @staticmethod
-    def _send_with_twilio(sms, config):
-        """Send SMS using Twilio"""
-        try:
-            from twilio.rest import Client
-            
-            client = Client(config['account_sid'], config['auth_token'])
-            message = client.messages.create(
-                body=sms.message,
-                from_=config['from_number'],
-                to=sms.to_number
-            )
-            
-            # Update SMS with Twilio message ID
-            sms.message_id = message.sid
-            sms.save(update_fields=['message_id'])
-            
-        except ImportError:
-            raise ImportError("Twilio library not installed. Run: pip install twilio")
-    
-    @staticmethod
-    def _send_with_aws_sns(sms, config):
-        """Send SMS using AWS SNS"""
-        try:
-            import boto3
-            
-            sns = boto3.client(
-                'sns',
-                aws_access_key_id=config['api_key'],
-                aws_secret_access_key=config['api_secret'],
-                region_name='us-east-1'  # Default region
-            )
-            
-            response = sns.publish(
-                PhoneNumber=sms.to_number,
-                Message=sms.message,
-                MessageAttributes={
-                    'AWS.SNS.SMS.SMSType': {
-                        'DataType': 'String',
-                        'StringValue': 'Transactional'
-                    }
-                }
-            )
-            
-            # Update SMS with AWS message ID
-            sms.message_id = response['MessageId']
-            sms.save(update_fields=['message_id'])
-            
-        except ImportError:
-            raise ImportError("Boto3 library not installed. Run: pip install boto3")
-    
-    @staticmethod
-    def _send_with_nexmo(sms, config):
-        """Send SMS using Nexmo/Vonage"""
-        url = "https://rest.nexmo.com/sms/json"
-        data = {
-            'api_key': config['api_key'],
-            'api_secret': config['api_secret'],
-            'to': sms.to_number,
-            'from': config['from_number'],
-            'text': sms.message
-        }
-        
-        response = requests.post(url, data=data)
-        result = response.json()
+    def _send_with_provider(sms, user_config):
+        """Send SMS through the cached provider client for the configuration"""
+        provider = get_provider(user_config)
+        from_number = sms.from_number or provider.from_number
+        get_bucket(provider.name, from_number).acquire()
         
-        if result['messages'][0]['status'] == '0':
-            # Update SMS with Nexmo message ID
-            sms.message_id = result['messages'][0]['message-id']
-            sms.save(update_fields=['message_id'])
-        else:
-            raise Exception(f"Nexmo error: {result['messages'][0]['error-text']}")
-    
-    @staticmethod
-    def _send_with_default_config(sms):
-        """Send SMS using default configuration (placeholder for demo)"""
-        # This would typically use a default SMS provider
-        # For demo purposes, we'll just mark it as sent
-        print(f"DEMO: SMS would be sent to {sms.to_number}: {sms.message}")
+        # Update SMS with the provider message ID
+        sms.message_id = provider.send(sms.to_number, sms.message, from_number)
+        sms.save(update_fields=['message_id'])
     
     @staticmethod
     def get_user_sms_config(user):
@@ -637,6 +554,26 @@ class SMSService:
         except UserSMSConfig.DoesNotExist:
             return None
     
+    @staticmethod
+    def link_contacts(messages):
+        """Attach contacts to SMS rows without one, resolving all numbers in one lookup.
+        
+        Updates the given instances in memory and returns those that were linked;
+        the caller decides how to persist them.
+        """
+        from contacts.models import Contact
+        
+        unlinked = [sms for sms in messages if sms.contact_id is None and sms.contact_number]
+        contacts = Contact.resolve_phone_numbers({sms.contact_number for sms in unlinked})
+        
+        linked = []
+        for sms in unlinked:
+            contact = contacts.get(sms.contact_number)
+            if contact is not None:
+                sms.contact = contact
+                linked.append(sms)
+        return linked
+    
     @staticmethod
     def send_template_sms(template_name, context, to_number, **kwargs):
         """Send SMS using a template"""
@@ -776,4 +713,117 @@ class SMSService:
                     'variables': {},
                     'is_active': True,
                 }
-            ) 
\ No newline at end of file
+            )
+
+class SMSCampaignService:
+    """Service class for bulk SMS campaigns"""
+    
+    BATCH_SIZE = 1000
+    
+    # contact_filter keys and the Contact lookups they map to
+    CONTACT_FILTER_LOOKUPS = {
+        'company': 'company_id',
+        'is_customer': 'is_customer',
+        'is_prospect': 'is_prospect',
+        'city': 'city__iexact',
+        'country': 'country__iexact',
+        'contact_ids': 'id__in',
+    }
+    
+    @staticmethod
+    def get_recipients(contact_filter):
+        """Get active, opted-in contacts with a phone number matching the filter"""
+        from contacts.models import Contact
+        
+        lookups = {
+            SMSCampaignService.CONTACT_FILTER_LOOKUPS[key]: value
+            for key, value in contact_filter.items()
+            if key in SMSCampaignService.CONTACT_FILTER_LOOKUPS
+        }
+        
+        return (
+            Contact.objects.filter(is_active=True, phone_opt_out=False, **lookups)
+            .exclude(mobile='', phone='')
+            .select_related('company')
+            .order_by('id')
+        )
+    
+    @staticmethod
+    def start_campaign(campaign):
+        """Queue a campaign for rendering once the current transaction commits"""
+        from .tasks import run_sms_campaign
+        transaction.on_commit(lambda: run_sms_campaign.delay(campaign.id))
+    
+    @staticmethod
+    def run_campaign(campaign):
+        """Render and queue every recipient's SMS in batches, handing each batch to the dispatcher"""
+        from django.template import Template, Context
+        from .tasks import dispatch_sms
+        
+        campaigns = SMSCampaign.objects.filter(id=campaign.id)
+        campaigns.update(status='rendering', started_at=timezone.now())
+        
+        try:
+            user_config = SMSService.get_user_sms_config(campaign.created_by)
+            from_number = user_config.from_number if user_config else ''
+            
+            # Compile once instead of per recipient
+            template = Template(campaign.template.message)
+            
+            batch = []
+            recipients = SMSCampaignService.get_recipients(campaign.contact_filter)
+            for contact in recipients.iterator(chunk_size=SMSCampaignService.BATCH_SIZE):
+                context = Context({**campaign.context, 'contact': contact, 'customer': contact}, autoescape=False)
+                sms = SMS(
+                    sms_type='outbound',
+                    status='queued',
+                    message=template.render(context)[:1600],
+                    from_number=from_number,
+                    to_number=contact.primary_phone,
+                    contact=contact,
+                    user_id=campaign.created_by_id,
+                    campaign_id=campaign.id
+                )
+                sms.prepare_for_write()
+                batch.append(sms)
+                
+                if len(batch) >= SMSCampaignService.BATCH_SIZE:
+                    SMSCampaignService._queue_batch(campaign, batch, dispatch_sms)
+                    batch = []
+            
+            if batch:
+                SMSCampaignService._queue_batch(campaign, batch, dispatch_sms)
+        
+        except Exception as e:
+            campaigns.update(status='failed', error_message=str(e), completed_at=timezone.now())
+            raise
+        
+        campaigns.update(status='sending')
+        
+        # bulk_create bypasses the counter signals
+        InboxCounter.refresh(campaign.created_by_id, 'sms')
+        SMSCampaignService.check_completed(campaign.id)
+    
+    @staticmethod
+    def _queue_batch(campaign, batch, dispatch_sms):
+        created = SMS.objects.bulk_create(batch)
+        SMSCampaign.objects.filter(id=campaign.id).update(total_recipients=F('total_recipients') + len(created))
+        dispatch_sms.delay([sms.id for sms in created], campaign.id)
+    
+    @staticmethod
+    def record_progress(campaign_id, sent, failed):
+        """Add dispatched message outcomes to a campaign's progress"""
+        SMSCampaign.objects.filter(id=campaign_id).update(
+            sent_count=F('sent_count') + sent,
+            failed_count=F('failed_count') + failed
+        )
+        SMSCampaignService.check_completed(campaign_id)
+    
+    @staticmethod
+    def check_completed(campaign_id):
+        """Mark a fully rendered campaign completed once every message is processed"""
+        SMSCampaign.objects.filter(
+            id=campaign_id,
+            status='sending',
+            total_recipients__lte=F('sent_count') + F('failed_count')
+        ).update(status='completed', completed_at=timezone.now())
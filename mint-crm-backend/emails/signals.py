@@ -0,0 +1,65 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from .models import Email, SMS, InboxCounter
+
+COUNTER_SOURCE_FIELDS = {'user', 'read', 'starred', 'archived', 'status'}
+
+
+def _snapshot(instance):
+    """Remember which user and counters a loaded message contributes to"""
+    if instance.pk is None or COUNTER_SOURCE_FIELDS & instance.get_deferred_fields():
+        # Reading deferred fields here would cost a query per row
+        return None
+    return instance.user_id, InboxCounter.contribution(instance)
+
+
+@receiver(post_init, sender=Email)
+@receiver(post_init, sender=SMS)
+def remember_inbox_flags(sender, instance, **kwargs):
+    instance._inbox_snapshot = _snapshot(instance)
+
+
+@receiver(post_save, sender=Email)
+@receiver(post_save, sender=SMS)
+def update_inbox_counters_on_save(sender, instance, created, update_fields=None, **kwargs):
+    channel = InboxCounter.channel_for(instance)
+    previous = None if created else instance._inbox_snapshot
+    
+    if update_fields is not None and not COUNTER_SOURCE_FIELDS & set(update_fields):
+        return
+    
+    if not created and previous is None:
+        # Unknown prior state (e.g. loaded with .only()); recount this user
+        if instance.user_id:
+            InboxCounter.refresh(instance.user_id, channel)
+    else:
+        current = InboxCounter.contribution(instance)
+        previous_user_id, previous_counts = previous or (None, {})
+        
+        if previous_user_id is not None and previous_user_id != instance.user_id:
+            InboxCounter.apply_delta(previous_user_id, channel, {k: -v for k, v in previous_counts.items()})
+            previous_counts = {}
+        
+        if instance.user_id:
+            InboxCounter.apply_delta(instance.user_id, channel, {
+                field: current[field] - previous_counts.get(field, 0) for field in current
+            })
+    
+    instance._inbox_snapshot = _snapshot(instance)
+
+
+@receiver(post_delete, sender=Email)
+@receiver(post_delete, sender=SMS)
+def update_inbox_counters_on_delete(sender, instance, **kwargs):
+    # Deletion collects full rows when listeners exist, so the snapshot is
+    # normally present; otherwise leave it to the periodic reconciliation
+    if instance._inbox_snapshot is None:
+        return
+    
+    user_id, counts = instance._inbox_snapshot
+    if user_id:
+        # Never (re)create counters here: the user may be the row being deleted
+        InboxCounter.apply_delta(
+            user_id, InboxCounter.channel_for(instance),
+            {k: -v for k, v in counts.items()}, create_missing=False
+        )
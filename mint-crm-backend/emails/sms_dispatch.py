@@ -0,0 +1,319 @@
+"""Concurrent SMS dispatch.
+
+Provider clients are built once per ``UserSMSConfig`` (and rebuilt when the
+config changes) so HTTP connections are pooled across messages. Messages are
+sent from a bounded thread pool, throttled by a token bucket per
+(provider, sender number), and their outcomes are written back in bulk.
+
+Workers first claim queued rows by moving them to ``sending`` under
+``SKIP LOCKED``, so a message queued to two workers is only sent by one.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import SMS, SMSLog, InboxCounter
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Thread-safe token bucket; ``rate`` tokens per second up to ``capacity``"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class SMSProvider:
+    """Base class for SMS provider clients; ``send`` returns the provider message ID"""
+
+    name = None
+
+    def __init__(self, config):
+        self.config = config
+
+    @property
+    def from_number(self):
+        return self.config.get('from_number', '')
+
+    def send(self, to_number, message, from_number=None):
+        raise NotImplementedError
+
+
+class TwilioProvider(SMSProvider):
+    """Twilio client; the REST client keeps its own pooled HTTP session"""
+
+    name = 'twilio'
+
+    def __init__(self, config):
+        super().__init__(config)
+        try:
+            from twilio.rest import Client
+        except ImportError:
+            raise ImportError("Twilio library not installed. Run: pip install twilio")
+
+        self.client = Client(config['account_sid'], config['auth_token'])
+
+    def send(self, to_number, message, from_number=None):
+        result = self.client.messages.create(
+            body=message,
+            from_=from_number or self.from_number,
+            to=to_number
+        )
+        return result.sid
+
+
+class AwsSnsProvider(SMSProvider):
+    """AWS SNS client; boto3 clients are thread-safe and pool connections"""
+
+    name = 'aws_sns'
+
+    def __init__(self, config):
+        super().__init__(config)
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError:
+            raise ImportError("Boto3 library not installed. Run: pip install boto3")
+
+        self.client = boto3.client(
+            'sns',
+            aws_access_key_id=config['api_key'],
+            aws_secret_access_key=config['api_secret'],
+            region_name=getattr(settings, 'AWS_SNS_REGION', 'us-east-1'),
+            config=Config(max_pool_connections=settings.SMS_DISPATCH_MAX_WORKERS)
+        )
+
+    def send(self, to_number, message, from_number=None):
+        response = self.client.publish(
+            PhoneNumber=to_number,
+            Message=message,
+            MessageAttributes={
+                'AWS.SNS.SMS.SMSType': {
+                    'DataType': 'String',
+                    'StringValue': 'Transactional'
+                }
+            }
+        )
+        return response['MessageId']
+
+
+class NexmoProvider(SMSProvider):
+    """Nexmo/Vonage REST API over a pooled requests session"""
+
+    name = 'nexmo'
+    url = "https://rest.nexmo.com/sms/json"
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=settings.SMS_DISPATCH_MAX_WORKERS
+        ))
+
+    def send(self, to_number, message, from_number=None):
+        response = self.session.post(self.url, data={
+            'api_key': self.config['api_key'],
+            'api_secret': self.config['api_secret'],
+            'to': to_number,
+            'from': from_number or self.from_number,
+            'text': message
+        }, timeout=settings.SMS_PROVIDER_TIMEOUT)
+        result = response.json()
+
+        if result['messages'][0]['status'] != '0':
+            raise Exception(f"Nexmo error: {result['messages'][0]['error-text']}")
+        return result['messages'][0]['message-id']
+
+
+class StubProvider(SMSProvider):
+    """Local provider that never leaves the process; used by default and for benchmarks"""
+
+    name = 'stub'
+
+    def send(self, to_number, message, from_number=None):
+        latency_ms = self.config.get('latency_ms', settings.SMS_STUB_LATENCY_MS)
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+        logger.debug(f"Stub SMS to {to_number}: {message[:50]}")
+        return f"stub-{uuid.uuid4().hex}"
+
+
+PROVIDERS = {
+    'twilio': TwilioProvider,
+    'aws_sns': AwsSnsProvider,
+    'nexmo': NexmoProvider,
+    'stub': StubProvider,
+}
+
+_providers = {}
+_buckets = {}
+_lock = threading.Lock()
+
+
+def get_provider(user_config=None):
+    """Get the cached provider client for a verified UserSMSConfig (or the default provider)"""
+    if not (user_config and user_config.is_verified):
+        key, version, config = 'default', None, {'provider': settings.SMS_DEFAULT_PROVIDER}
+    else:
+        key, version, config = user_config.pk, user_config.updated_at, user_config.get_provider_config()
+
+    with _lock:
+        cached = _providers.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+
+    provider_class = PROVIDERS.get(config['provider'])
+    if provider_class is None:
+        raise ValueError(f"Unsupported SMS provider: {config['provider']}")
+    provider = provider_class(config)
+
+    with _lock:
+        _providers[key] = (version, provider)
+    return provider
+
+
+def get_bucket(provider_name, from_number):
+    """Get the per-process rate limiter for a provider and sender number"""
+    key = (provider_name, from_number)
+    with _lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            rate = settings.SMS_RATE_LIMITS.get(provider_name, settings.SMS_RATE_LIMITS['default'])
+            bucket = _buckets[key] = TokenBucket(rate)
+        return bucket
+
+
+def claim_queued(sms_ids):
+    """Move the queued rows among ``sms_ids`` to ``sending``; returns the ids this worker claimed"""
+    with transaction.atomic():
+        claimed = list(
+            SMS.objects.select_for_update(skip_locked=True)
+            .filter(id__in=sms_ids, status='queued')
+            .values_list('id', flat=True)
+        )
+        SMS.objects.filter(id__in=claimed).update(status='sending', updated_at=timezone.now())
+    return claimed
+
+
+def fail_stalled(timeout):
+    """Fail rows left in ``sending`` by a worker that died; they may or may not have gone out.
+
+    Returns the number of rows failed per campaign id (None for messages outside campaigns),
+    which the dead worker never added to its campaign's progress.
+    """
+    stalled = SMS.objects.filter(status='sending', updated_at__lt=timezone.now() - timeout)
+    with transaction.atomic():
+        rows = list(stalled.select_for_update(skip_locked=True).values_list('id', 'user_id', 'campaign_id'))
+        SMS.objects.filter(id__in=[sms_id for sms_id, _, _ in rows]).update(
+            status='failed', error_message='Dispatch interrupted', updated_at=timezone.now()
+        )
+        SMSLog.objects.bulk_create(
+            [SMSLog(sms_id=sms_id, event='failed', data={'error': 'Dispatch interrupted'}) for sms_id, _, _ in rows]
+        )
+    for user_id in {user_id for _, user_id, _ in rows if user_id}:
+        InboxCounter.refresh(user_id, 'sms')
+    return Counter(campaign_id for _, _, campaign_id in rows)
+
+
+class SMSDispatcher:
+    """Send batches of SMS rows through one provider concurrently"""
+
+    def __init__(self, user_config=None, max_workers=None, batch_size=500):
+        self.user_config = user_config
+        self.provider = get_provider(user_config)
+        self.max_workers = max_workers or settings.SMS_DISPATCH_MAX_WORKERS
+        self.batch_size = batch_size
+
+    def _send_one(self, sms):
+        from_number = sms.from_number or self.provider.from_number
+        get_bucket(self.provider.name, from_number).acquire()
+        try:
+            return sms, self.provider.send(sms.to_number, sms.message, from_number), None
+        except Exception as e:
+            return sms, None, str(e)
+
+    def send(self, messages):
+        """Send messages without touching the database; yields (sms, message_id, error)"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            batch = []
+            for sms in messages:
+                batch.append(sms)
+                if len(batch) >= self.batch_size:
+                    yield from pool.map(self._send_one, batch)
+                    batch = []
+            if batch:
+                yield from pool.map(self._send_one, batch)
+
+    def dispatch(self, messages):
+        """Send claimed SMS rows (see ``claim_queued``) and record statuses and logs in bulk per batch"""
+        totals = {'sent': 0, 'failed': 0}
+        user_ids = set()
+        results = []
+        for result in self.send(messages):
+            results.append(result)
+            if len(results) >= self.batch_size:
+                self._record(results, totals, user_ids)
+                results = []
+        if results:
+            self._record(results, totals, user_ids)
+
+        # bulk_update bypasses the counter signals; recount once per sender
+        for user_id in user_ids:
+            InboxCounter.refresh(user_id, 'sms')
+
+        return totals
+
+    def _record(self, results, totals, user_ids):
+        now = timezone.now()
+        method = 'user_config' if self.user_config else 'default_config'
+        logs = []
+
+        for sms, message_id, error in results:
+            sms.updated_at = now
+            if error is None:
+                sms.status = 'sent'
+                sms.sent_at = now
+                sms.message_id = message_id
+                logs.append(SMSLog(sms=sms, event='sent', data={'method': method}))
+                totals['sent'] += 1
+            else:
+                sms.status = 'failed'
+                sms.error_message = error
+                sms.retry_count += 1
+                logs.append(SMSLog(sms=sms, event='failed', data={'error': error, 'method': method}))
+                totals['failed'] += 1
+
+        SMS.objects.bulk_update(
+            [sms for sms, _, _ in results],
+            ['status', 'sent_at', 'message_id', 'error_message', 'retry_count', 'updated_at']
+        )
+        SMSLog.objects.bulk_create(logs)
+        user_ids.update(sms.user_id for sms, _, _ in results if sms.user_id)
@@ -0,0 +1,325 @@
+"""SMS delivery-receipt ingestion.
+
+Provider callbacks are parsed into plain receipt dicts and pushed onto a Redis
+list at request time; ``process_receipts`` drains the list in batches, resolves
+``message_id`` through its index and applies status transitions with one
+``bulk_update`` per batch. Receipts that beat the dispatcher's write of their
+``message_id`` are requeued until ``SMS_RECEIPT_RETRY_WINDOW`` has passed.
+
+Callbacks are only accepted with the webhook token, and Twilio and SNS
+callbacks must also carry a valid provider signature.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import threading
+from datetime import timedelta
+from urllib.parse import urlparse
+
+import requests
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_datetime
+
+from .models import SMS, SMSLog, InboxCounter, UserSMSConfig
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = 'sms:receipts'
+
+# Later states win; a late "sent" callback never downgrades a delivered message
+STATUS_RANK = {
+    'queued': 0,
+    'sending': 0,
+    'sent': 1,
+    'delivered': 2,
+    'undelivered': 2,
+    'failed': 2,
+}
+
+TWILIO_STATUSES = {
+    'sent': 'sent',
+    'delivered': 'delivered',
+    'read': 'delivered',
+    'undelivered': 'undelivered',
+    'failed': 'failed',
+}
+
+NEXMO_STATUSES = {
+    'accepted': 'sent',
+    'buffered': 'sent',
+    'delivered': 'delivered',
+    'expired': 'undelivered',
+    'rejected': 'failed',
+    'failed': 'failed',
+}
+
+SNS_STATUSES = {
+    'SUCCESS': 'delivered',
+    'FAILURE': 'failed',
+}
+
+# Fields of an SNS message covered by its signature, in signing order
+SNS_SIGNED_FIELDS = {
+    'Notification': ['Message', 'MessageId', 'Subject', 'Timestamp', 'TopicArn', 'Type'],
+    'SubscriptionConfirmation': ['Message', 'MessageId', 'SubscribeURL', 'Timestamp', 'Token', 'TopicArn', 'Type'],
+    'UnsubscribeConfirmation': ['Message', 'MessageId', 'SubscribeURL', 'Timestamp', 'Token', 'TopicArn', 'Type'],
+}
+
+SNS_SIGNATURE_HASHES = {
+    '1': hashes.SHA1,
+    '2': hashes.SHA256,
+}
+
+# Signing certificates by URL; AWS rotates them rarely
+_sns_certificates = {}
+
+
+def receipt(message_id, status, error='', timestamp=None, provider=''):
+    """Build a receipt dict; returns None for statuses we do not track"""
+    if not message_id or not status:
+        return None
+    return {
+        'message_id': message_id,
+        'status': status,
+        'error': error or '',
+        'timestamp': timestamp or timezone.now().isoformat(),
+        'provider': provider,
+        'received_at': timezone.now().isoformat(),
+        'attempts': 0,
+    }
+
+
+def parse_twilio(data):
+    """Parse a Twilio status callback (form-encoded)"""
+    status = TWILIO_STATUSES.get(data.get('MessageStatus') or data.get('SmsStatus'))
+    error = data.get('ErrorCode', '')
+    if error:
+        error = f"Twilio error {error}"
+    return [r for r in [receipt(data.get('MessageSid'), status, error, provider='twilio')] if r]
+
+
+def parse_nexmo(data):
+    """Parse a Nexmo/Vonage delivery receipt (query string, form or JSON)"""
+    status = NEXMO_STATUSES.get(data.get('status'))
+    error = data.get('err-code', '')
+    if error in ('', '0'):
+        error = ''
+    else:
+        error = f"Nexmo error {error}"
+    timestamp = data.get('message-timestamp')
+    if timestamp:
+        parsed = parse_datetime(timestamp)
+        timestamp = parsed.isoformat() if parsed else None
+    return [r for r in [receipt(data.get('messageId'), status, error, timestamp, provider='nexmo')] if r]
+
+
+def parse_sns(payload):
+    """Parse an SNS notification carrying an SMS delivery-status log entry"""
+    try:
+        message = json.loads(payload.get('Message') or '{}')
+    except (TypeError, ValueError):
+        return []
+
+    notification = message.get('notification', {})
+    delivery = message.get('delivery', {})
+    status = SNS_STATUSES.get(message.get('status'))
+    error = '' if status == 'delivered' else delivery.get('providerResponse', '')
+    timestamp = notification.get('timestamp')
+    if timestamp:
+        parsed = parse_datetime(timestamp.replace(' ', 'T'))
+        timestamp = parsed.isoformat() if parsed else None
+    return [r for r in [receipt(notification.get('messageId'), status, error, timestamp, provider='aws_sns')] if r]
+
+
+def is_sns_subscribe_url(url):
+    """Only confirm subscriptions against AWS SNS endpoints"""
+    parsed = urlparse(url or '')
+    return parsed.scheme == 'https' and parsed.hostname is not None and (
+        parsed.hostname.startswith('sns.') and parsed.hostname.endswith('.amazonaws.com')
+    )
+
+
+def twilio_signature(url, params, auth_token):
+    """Expected ``X-Twilio-Signature``: HMAC-SHA1 of the URL followed by the sorted form fields"""
+    payload = url
+    for name in sorted(set(params)):
+        values = params.getlist(name) if hasattr(params, 'getlist') else [params[name]]
+        payload += ''.join(f"{name}{value}" for value in sorted(set(values)))
+    digest = hmac.new(auth_token.encode(), payload.encode(), hashlib.sha1).digest()
+    return base64.b64encode(digest).decode()
+
+
+def verify_twilio(url, params, signature):
+    """Check a Twilio callback against the auth tokens configured for its account"""
+    account_sid = params.get('AccountSid')
+    if not signature or not account_sid:
+        return False
+    auth_tokens = (
+        UserSMSConfig.objects.filter(provider='twilio', account_sid=account_sid)
+        .exclude(auth_token='')
+        .values_list('auth_token', flat=True)
+    )
+    return any(constant_time_compare(twilio_signature(url, params, token), signature) for token in auth_tokens)
+
+
+def sns_certificate(url):
+    certificate = _sns_certificates.get(url)
+    if certificate is None:
+        response = requests.get(url, timeout=settings.SMS_PROVIDER_TIMEOUT)
+        response.raise_for_status()
+        certificate = x509.load_pem_x509_certificate(response.content)
+        _sns_certificates[url] = certificate
+    return certificate
+
+
+def verify_sns(payload):
+    """Check an SNS message's signature against its AWS signing certificate"""
+    fields = SNS_SIGNED_FIELDS.get(payload.get('Type'))
+    algorithm = SNS_SIGNATURE_HASHES.get(payload.get('SignatureVersion'))
+    cert_url = payload.get('SigningCertURL')
+    if not fields or not algorithm or not is_sns_subscribe_url(cert_url) or not urlparse(cert_url).path.endswith('.pem'):
+        return False
+
+    text = ''.join(f"{name}\n{payload[name]}\n" for name in fields if name in payload)
+    try:
+        signature = base64.b64decode(payload.get('Signature') or '', validate=True)
+        sns_certificate(cert_url).public_key().verify(signature, text.encode(), padding.PKCS1v15(), algorithm())
+    except (InvalidSignature, ValueError, requests.RequestException) as e:
+        logger.warning(f"Rejected SNS message {payload.get('MessageId')}: {str(e) or 'invalid signature'}")
+        return False
+    return True
+
+
+class ReceiptQueue:
+    """Redis list used as a write buffer between the webhooks and the worker"""
+
+    _client = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def client(cls):
+        with cls._lock:
+            if cls._client is None:
+                import redis
+                cls._client = redis.Redis.from_url(settings.SMS_RECEIPT_QUEUE_URL)
+            return cls._client
+
+    @classmethod
+    def push(cls, receipts):
+        """Append receipts; returns the queue length afterwards"""
+        if not receipts:
+            return 0
+        return cls.client().rpush(QUEUE_KEY, *[json.dumps(r) for r in receipts])
+
+    @classmethod
+    def pop(cls, count):
+        """Atomically take up to ``count`` receipts from the head of the queue"""
+        pipe = cls.client().pipeline()
+        pipe.lrange(QUEUE_KEY, 0, count - 1)
+        pipe.ltrim(QUEUE_KEY, count, -1)
+        items, _ = pipe.execute()
+        return [json.loads(item) for item in items]
+
+
+def enqueue(receipts, countdown=None):
+    """Buffer receipts and make sure a flush is scheduled, after ``countdown`` seconds if given"""
+    length = ReceiptQueue.push(receipts)
+    if length and length == len(receipts):
+        # First receipts into an empty queue: let a batch accumulate, then flush
+        from .tasks import process_sms_receipts
+        process_sms_receipts.apply_async(countdown=countdown or settings.SMS_RECEIPT_FLUSH_DELAY)
+    return length
+
+
+def apply_receipts(receipts):
+    """Apply a batch of receipts; returns the receipts whose message_id is not known yet"""
+    latest = {}
+    for r in receipts:
+        current = latest.get(r['message_id'])
+        if current is None or STATUS_RANK[r['status']] >= STATUS_RANK[current['status']]:
+            latest[r['message_id']] = r
+
+    messages = SMS.objects.filter(message_id__in=list(latest)).only(
+        'id', 'message_id', 'status', 'user_id', 'delivered_at', 'error_message'
+    )
+
+    now = timezone.now()
+    updated, logs, user_ids, found = [], [], set(), set()
+    for sms in messages:
+        r = latest[sms.message_id]
+        found.add(sms.message_id)
+        if STATUS_RANK.get(sms.status, 0) >= STATUS_RANK[r['status']]:
+            continue
+
+        was_failed = sms.is_failed
+        sms.status = r['status']
+        if sms.user_id and sms.is_failed != was_failed:
+            user_ids.add(sms.user_id)
+        sms.updated_at = now
+        if r['status'] == 'delivered':
+            sms.delivered_at = parse_datetime(r['timestamp']) or now
+        elif r['error']:
+            sms.error_message = r['error']
+        updated.append(sms)
+        logs.append(SMSLog(sms=sms, event=r['status'], data={
+            'provider': r['provider'],
+            'error': r['error'],
+            'timestamp': r['timestamp'],
+        }))
+
+    if updated:
+        SMS.objects.bulk_update(updated, ['status', 'delivered_at', 'error_message', 'updated_at'])
+        SMSLog.objects.bulk_create(logs)
+
+    # bulk_update bypasses the counter signals; only failures move a counter
+    for user_id in user_ids:
+        InboxCounter.refresh(user_id, 'sms')
+
+    return [r for message_id, r in latest.items() if message_id not in found]
+
+
+def process_receipts(batch_size=None, max_batches=None):
+    """Drain the receipt queue in batches; returns processed/applied counts"""
+    batch_size = batch_size or settings.SMS_RECEIPT_BATCH_SIZE
+    now = timezone.now()
+    expired = now - timedelta(seconds=settings.SMS_RECEIPT_RETRY_WINDOW)
+    totals = {'processed': 0, 'unmatched': 0, 'dropped': 0}
+    retry = []
+
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        receipts = ReceiptQueue.pop(batch_size)
+        if not receipts:
+            break
+        batches += 1
+
+        unmatched = apply_receipts(receipts)
+        totals['processed'] += len(receipts)
+        for r in unmatched:
+            # The callback can beat the dispatcher's bulk_update of message_id, which
+            # only happens once the message's whole batch has been sent
+            r['attempts'] += 1
+            received_at = parse_datetime(r.get('received_at') or '') or now
+            r['received_at'] = received_at.isoformat()
+            if received_at > expired:
+                retry.append(r)
+            else:
+                totals['dropped'] += 1
+                logger.warning(
+                    f"Dropping SMS receipt for unknown message {r['message_id']} after {r['attempts']} attempts"
+                )
+        totals['unmatched'] += len(unmatched)
+
+    if retry:
+        # Requeued after the drain, and flushed again after a pause rather than right away
+        enqueue(retry, countdown=settings.SMS_RECEIPT_RETRY_DELAY)
+
+    return totals
@@ -0,0 +1,87 @@
+from celery import shared_task
+from django.conf import settings
+from datetime import timedelta
+from itertools import groupby
+import logging
+
+from .models import SMS, SMSCampaign, InboxCounter
+from .services import SMSService, SMSCampaignService
+from .sms_dispatch import SMSDispatcher, claim_queued, fail_stalled
+from . import sms_receipts
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def reconcile_inbox_counters():
+    """Rebuild the per-user inbox counters from the email and SMS tables"""
+    results = {}
+    for channel, _ in InboxCounter.CHANNEL_CHOICES:
+        results[channel] = InboxCounter.reconcile(channel)
+    logger.info(f"Inbox counters reconciled: {results}")
+    return results
+
+
+@shared_task
+def dispatch_sms(sms_ids, campaign_id=None):
+    """Claim queued SMS rows and send them concurrently, grouped by the sending user's provider"""
+    # Rows claimed by another worker, or already sent, are skipped
+    claimed = claim_queued(sms_ids)
+    queued = (
+        SMS.objects.filter(id__in=claimed)
+        .order_by('user_id', 'id')
+        .iterator(chunk_size=1000)
+    )
+    
+    totals = {'sent': 0, 'failed': 0}
+    for user_id, messages in groupby(queued, key=lambda sms: sms.user_id):
+        user_config = SMSService.get_user_sms_config(user_id) if user_id else None
+        result = SMSDispatcher(user_config).dispatch(messages)
+        totals['sent'] += result['sent']
+        totals['failed'] += result['failed']
+    
+    if campaign_id:
+        SMSCampaignService.record_progress(campaign_id, totals['sent'], totals['failed'])
+    
+    logger.info(f"SMS dispatch finished: {totals}")
+    return totals
+
+
+@shared_task
+def fail_stalled_sms():
+    """Fail SMS rows stuck in sending after their worker died"""
+    failed_by_campaign = fail_stalled(timedelta(seconds=settings.SMS_SENDING_TIMEOUT))
+    for campaign_id, count in failed_by_campaign.items():
+        if campaign_id:
+            SMSCampaignService.record_progress(campaign_id, 0, count)
+    
+    failed = sum(failed_by_campaign.values())
+    if failed:
+        logger.warning(f"Failed {failed} SMS messages left sending by an interrupted dispatch")
+    return failed
+
+
+@shared_task
+def run_sms_campaign(campaign_id):
+    """Render a campaign's messages in batches and queue them for dispatch"""
+    campaign = SMSCampaign.objects.select_related('template', 'created_by').get(id=campaign_id)
+    SMSCampaignService.run_campaign(campaign)
+
+
+@shared_task
+def process_sms_receipts():
+    """Apply buffered SMS delivery receipts in batches"""
+    totals = sms_receipts.process_receipts()
+    if totals['processed']:
+        logger.info(f"SMS receipts processed: {totals}")
+    return totals
+
+
+@shared_task
+def confirm_sns_subscription(subscribe_url):
+    """Confirm an SNS topic subscription for the delivery-status webhook"""
+    import requests
+    
+    response = requests.get(subscribe_url, timeout=settings.SMS_PROVIDER_TIMEOUT)
+    response.raise_for_status()
+    logger.info("SNS delivery-status subscription confirmed")
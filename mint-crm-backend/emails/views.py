@@ -1,4 +1,4 @@
-from rest_framework import viewsets, status, permissions
+from rest_framework import viewsets, status, permissions, exceptions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
@@ -7,7 +7,8 @@ from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.utils import timezone
-from .models import Email, EmailTemplate, EmailAttachment, EmailLog, UserEmailConfig, SMS, SMSTemplate, SMSLog, UserSMSConfig
+from django.utils.crypto import constant_time_compare
+from .models import Email, EmailTemplate, EmailAttachment, EmailLog, UserEmailConfig, SMS, SMSTemplate, SMSLog, UserSMSConfig, InboxCounter, SMSCampaign
 from .serializers import (
     EmailSerializer, EmailCreateSerializer, EmailTemplateSerializer,
     EmailTemplateCreateSerializer, EmailSendSerializer, EmailRetrySerializer,
@@ -16,29 +17,123 @@ from .serializers import (
     SMSSerializer, SMSCreateSerializer, SMSSendSerializer, SMSRetrySerializer,
     SMSTemplateSerializer, SMSTemplateCreateSerializer, SMSTemplateRenderSerializer,
     SMSLogSerializer, UserSMSConfigSerializer, UserSMSConfigCreateSerializer, UserSMSConfigTestSerializer,
-    EmailAttachmentSerializer
+    EmailAttachmentSerializer, InboxBulkActionSerializer, InboxMoveSerializer, InboxCounterSerializer,
+    SMSCampaignSerializer, SMSCampaignCreateSerializer, SMSCampaignContactFilterSerializer,
+    SMSConversationSerializer
 )
-from .services import EmailService, SMSService
-from django.db.models import Count
+from .services import EmailService, SMSService, SMSCampaignService
+from .tasks import confirm_sns_subscription
+from . import sms_receipts
+from api.exports import ExportMixin
+from django.db.models import Count, Value, Q, F, Window
+from django.db.models.functions import Coalesce, RowNumber
+import json
 import smtplib
 import imaplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework import serializers
 import logging
 logger = logging.getLogger(__name__)
 
-class EmailViewSet(viewsets.ModelViewSet):
+class InboxBulkActionsMixin:
+    """Bulk read/starred/archived operations shared by the email and SMS inboxes.
+
+    Each action resolves its target rows from ``ids`` or, with ``all``, from the
+    list filters in the query string, and applies the change as a single UPDATE.
+    """
+
+    def get_bulk_queryset(self, data):
+        queryset = self.filter_queryset(self.get_queryset())
+        if data.get('ids'):
+            queryset = queryset.filter(id__in=data['ids'])
+        return queryset
+
+    def get_read_update_fields(self, value):
+        return {'read': value}
+
+    def bulk_update_flags(self, request, serializer_class, get_fields):
+        serializer = serializer_class(data=request.data)
+
+        if serializer.is_valid():
+            data = serializer.validated_data
+            fields = get_fields(data)
+            queryset = self.get_bulk_queryset(data)
+
+            # Skip rows that already carry the target values so the UPDATE only
+            # touches (and the partial indexes only churn for) real changes
+            updated = queryset.exclude(**{
+                name: value for name, value in fields.items() if name in ('read', 'starred', 'archived')
+            }).update(updated_at=timezone.now(), **fields)
+
+            # update() bypasses the counter signals; recount once for the whole batch
+            if updated:
+                InboxCounter.refresh(request.user.id, self.inbox_channel)
+
+            return Response({'updated': updated})
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['get'])
+    def counts(self, request):
+        """Get precomputed unread/starred/archived counters for inbox badges"""
+        counter = InboxCounter.objects.filter(user=request.user, channel=self.inbox_channel).first()
+        if counter is None:
+            counter = InboxCounter.refresh(request.user.id, self.inbox_channel)
+        return Response(InboxCounterSerializer(counter).data)
+
+    @action(detail=False, methods=['post'])
+    def mark_read(self, request):
+        """Mark messages as read (or unread with value=false)"""
+        return self.bulk_update_flags(
+            request, InboxBulkActionSerializer,
+            lambda data: self.get_read_update_fields(data['value'])
+        )
+
+    @action(detail=False, methods=['post'])
+    def star(self, request):
+        """Star (or unstar with value=false) messages"""
+        return self.bulk_update_flags(
+            request, InboxBulkActionSerializer,
+            lambda data: {'starred': data['value']}
+        )
+
+    @action(detail=False, methods=['post'])
+    def archive(self, request):
+        """Archive (or unarchive with value=false) messages"""
+        return self.bulk_update_flags(
+            request, InboxBulkActionSerializer,
+            lambda data: {'archived': data['value']}
+        )
+
+    @action(detail=False, methods=['post'])
+    def move(self, request):
+        """Move messages to the inbox or archive folder"""
+        return self.bulk_update_flags(
+            request, InboxMoveSerializer,
+            lambda data: {'archived': data['folder'] == 'archive'}
+        )
+
+class EmailViewSet(InboxBulkActionsMixin, ExportMixin, viewsets.ModelViewSet):
     """ViewSet for Email model"""
     queryset = Email.objects.select_related('template', 'case', 'user')
     serializer_class = EmailSerializer
+    inbox_channel = 'email'
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_fields = ['email_type', 'status', 'template', 'case', 'user']
     search_fields = ['subject', 'to_email', 'from_email']
     ordering_fields = ['created_at', 'sent_at', 'subject']
     ordering = ['-created_at']
+    export_name = 'emails'
+    export_fields = [
+        ('id', 'id'), ('email_type', 'email_type'), ('status', 'status'),
+        ('subject', 'subject'), ('from_email', 'from_email'), ('to_email', 'to_email'),
+        ('cc_emails', 'cc_emails'), ('case_number', 'case__case_number'),
+        ('read', 'read'), ('starred', 'starred'), ('archived', 'archived'),
+        ('created_at', 'created_at'), ('sent_at', 'sent_at'), ('delivered_at', 'delivered_at'),
+    ]
 
     def get_queryset(self):
         # Only allow users to see/update their own emails
@@ -576,17 +671,28 @@ class UserEmailConfigViewSet(viewsets.ModelViewSet):
         }
         return ports.get(provider, 993) 
 
-class SMSViewSet(viewsets.ModelViewSet):
+class SMSViewSet(InboxBulkActionsMixin, viewsets.ModelViewSet):
     """ViewSet for SMS model"""
-    queryset = SMS.objects.select_related('template', 'case', 'user', 'contact')
+    queryset = SMS.objects.select_related('case', 'user', 'contact')
     serializer_class = SMSSerializer
+    inbox_channel = 'sms'
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['sms_type', 'status', 'template', 'case', 'user', 'contact']
+    filterset_fields = ['sms_type', 'status', 'case', 'user', 'contact', 'conversation_id']
     search_fields = ['message', 'to_number', 'from_number']
     ordering_fields = ['created_at', 'sent_at', 'message']
     ordering = ['-created_at']
     
+    def get_queryset(self):
+        # Only allow users to see/update their own SMS messages
+        return SMS.objects.filter(user=self.request.user).select_related('case', 'user', 'contact')
+    
+    def get_read_update_fields(self, value):
+        # Keep the first read timestamp when re-marking read messages
+        if value:
+            return {'read': True, 'read_at': Coalesce('read_at', Value(timezone.now()))}
+        return {'read': False, 'read_at': None}
+    
     def get_serializer_class(self):
         if self.action == 'create':
             return SMSCreateSerializer
@@ -654,6 +760,29 @@ class SMSViewSet(viewsets.ModelViewSet):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['get'])
+    def conversations(self, request):
+        """List conversations with their latest message and unread count.
+        
+        One query: window functions rank each thread's messages and count its
+        unread ones, and only the newest row per thread is returned. The list
+        filters (e.g. ``archived``, ``contact``) apply to the messages first.
+        """
+        thread = [F('conversation_id')]
+        queryset = self.filter_queryset(self.get_queryset()).exclude(conversation_id='').annotate(
+            position=Window(RowNumber(), partition_by=thread, order_by=[F('created_at').desc(), F('id').desc()]),
+            unread_count=Window(Count('id', filter=Q(read=False)), partition_by=thread),
+            message_count=Window(Count('id'), partition_by=thread),
+        ).filter(position=1).order_by('-created_at', '-id')
+        
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = SMSConversationSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        
+        serializer = SMSConversationSerializer(queryset, many=True)
+        return Response(serializer.data)
+    
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get SMS statistics"""
@@ -765,6 +894,102 @@ class SMSTemplateViewSet(viewsets.ModelViewSet):
         )
         return Response(templates)
 
+class SMSCampaignViewSet(viewsets.ModelViewSet):
+    """ViewSet for bulk SMS campaigns; sending runs in Celery workers"""
+    queryset = SMSCampaign.objects.select_related('template', 'created_by')
+    serializer_class = SMSCampaignSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    http_method_names = ['get', 'post', 'head', 'options']
+    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filterset_fields = ['status', 'template']
+    search_fields = ['name']
+    ordering_fields = ['created_at', 'completed_at', 'name']
+    ordering = ['-created_at']
+    
+    def get_queryset(self):
+        """Users can only see their own campaigns"""
+        return self.queryset.filter(created_by=self.request.user)
+    
+    def get_serializer_class(self):
+        if self.action == 'create':
+            return SMSCampaignCreateSerializer
+        return SMSCampaignSerializer
+    
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        campaign = serializer.save()
+        SMSCampaignService.start_campaign(campaign)
+        
+        logger.info(f"SMS campaign queued: id={campaign.id}, user={request.user.email}")
+        return Response(SMSCampaignSerializer(campaign).data, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=False, methods=['post'])
+    def preview(self, request):
+        """Count the recipients a contact filter would reach"""
+        serializer = SMSCampaignContactFilterSerializer(data=request.data)
+        
+        if serializer.is_valid():
+            recipients = SMSCampaignService.get_recipients(serializer.validated_data)
+            return Response({'recipients': recipients.count()})
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class SMSWebhookViewSet(viewsets.ViewSet):
+    """Delivery-receipt callbacks from SMS providers.
+    
+    Receipts are only parsed and buffered here; the status updates are applied
+    in batches by ``emails.tasks.process_sms_receipts``. Every callback needs the
+    ``SMS_WEBHOOK_TOKEN``, and none are accepted until it is configured.
+    """
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+    parser_classes = [FormParser, JSONParser]
+    
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        token = settings.SMS_WEBHOOK_TOKEN
+        if not token or not constant_time_compare(request.query_params.get('token', ''), token):
+            raise exceptions.PermissionDenied('Invalid webhook token')
+    
+    def _accept(self, receipts):
+        if receipts:
+            sms_receipts.enqueue(receipts)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    @action(detail=False, methods=['post'])
+    def twilio(self, request):
+        """Twilio message status callback"""
+        signature = request.headers.get('X-Twilio-Signature', '')
+        if not sms_receipts.verify_twilio(request.build_absolute_uri(), request.data, signature):
+            raise exceptions.PermissionDenied('Invalid Twilio signature')
+        return self._accept(sms_receipts.parse_twilio(request.data))
+    
+    @action(detail=False, methods=['get', 'post'])
+    def nexmo(self, request):
+        """Nexmo/Vonage delivery receipt"""
+        data = request.data if request.method == 'POST' else request.query_params
+        return self._accept(sms_receipts.parse_nexmo(data))
+    
+    @action(detail=False, methods=['post'])
+    def sns(self, request):
+        """AWS SNS delivery-status notification (sent as text/plain JSON)"""
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            return Response({'error': 'Invalid SNS payload'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(payload, dict) or not sms_receipts.verify_sns(payload):
+            raise exceptions.PermissionDenied('Invalid SNS signature')
+        
+        if payload.get('Type') == 'SubscriptionConfirmation':
+            subscribe_url = payload.get('SubscribeURL')
+            if not sms_receipts.is_sns_subscribe_url(subscribe_url):
+                return Response({'error': 'Invalid SubscribeURL'}, status=status.HTTP_400_BAD_REQUEST)
+            confirm_sns_subscription.delay(subscribe_url)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        
+        return self._accept(sms_receipts.parse_sns(payload))
+
 class UserSMSConfigViewSet(viewsets.ModelViewSet):
     """ViewSet for UserSMSConfig model"""
     serializer_class = UserSMSConfigSerializer
@@ -0,0 +1,208 @@
+"""Per-user, per-week rollups of meeting attendance.
+
+``MeetingWeeklyStats`` holds one row per user, week, meeting type and category
+with the user's invitations, attendances, no-shows and minutes spent in
+meetings. A week runs Monday to Sunday in the server time zone and a meeting
+counts in the week it starts; attendance of a recurring series is recorded on
+the series, so it counts in the series' first week. Cancelled and inactive
+meetings are left out.
+
+Rows are recomputed per ``(user, week)`` key, never incremented, so a refresh
+is idempotent. A refresh replaces the rows with the user rows locked, so two
+refreshes of the same user run one after the other instead of both inserting
+(a unique key backs this up). A changed attendance refreshes its user's week, and a meeting
+that moves, changes type or category, or is cancelled refreshes the weeks it
+left and entered for all its attendees (see ``signals``). Bulk writes, which
+skip the signals, call ``refresh_meetings`` themselves, and
+``reconcile_rollups`` rebuilds every row daily. Dashboards sum the rows and
+never read meetings or attendances.
+"""
+from datetime import datetime, timedelta
+from datetime import time as dt_time
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, Count, DateField, DurationField, F, Q, Sum, When
+from django.db.models.functions import TruncWeek
+
+from .models import Meeting, MeetingAttendance, MeetingWeeklyStats
+
+User = get_user_model()
+
+ATTENDED = Q(status='attended')
+
+# Time in an attended meeting: from joining to leaving, or to the meeting's end when the
+# user never left (or rejoined after leaving); the whole meeting when attendance was set by hand
+TIME_SPENT = Case(
+    When(ATTENDED & Q(joined_at__isnull=False, left_at__gt=F('joined_at')), then=F('left_at') - F('joined_at')),
+    When(
+        ATTENDED & Q(joined_at__isnull=False, meeting__end_time__gt=F('joined_at')),
+        then=F('meeting__end_time') - F('joined_at'),
+    ),
+    When(ATTENDED & Q(joined_at__isnull=True), then=F('meeting__end_time') - F('meeting__start_time')),
+    output_field=DurationField(),
+)
+
+
+def week_start(value):
+    """Monday of the week ``value`` falls in, in the server time zone"""
+    day = value.astimezone(ZoneInfo(settings.TIME_ZONE)).date()
+    return day - timedelta(days=day.weekday())
+
+
+def week_bounds(week):
+    zone = ZoneInfo(settings.TIME_ZONE)
+    return (
+        datetime.combine(week, dt_time.min, tzinfo=zone),
+        datetime.combine(week + timedelta(days=7), dt_time.min, tzinfo=zone),
+    )
+
+
+def compute_rollups(user_ids, start=None, end=None):
+    """Unsaved rollup rows of the users for meetings starting between ``start`` and ``end``"""
+    attendances = MeetingAttendance.objects.filter(user_id__in=user_ids, meeting__is_active=True).exclude(
+        meeting__status='cancelled'
+    )
+    if start is not None:
+        attendances = attendances.filter(meeting__start_time__gte=start, meeting__start_time__lt=end)
+
+    rows = (
+        attendances
+        .annotate(week=TruncWeek('meeting__start_time', output_field=DateField(), tzinfo=ZoneInfo(settings.TIME_ZONE)))
+        .order_by()
+        .values('user_id', 'week', 'meeting__meeting_type', 'meeting__category_id')
+        .annotate(
+            invited=Count('id', filter=~Q(status='declined')),
+            attended=Count('id', filter=ATTENDED),
+            no_shows=Count('id', filter=Q(status='no_show')),
+            time_spent=Sum(TIME_SPENT),
+        )
+    )
+    return [
+        MeetingWeeklyStats(
+            user_id=row['user_id'],
+            week_start=row['week'],
+            meeting_type=row['meeting__meeting_type'],
+            category_id=row['meeting__category_id'],
+            invited=row['invited'],
+            attended=row['attended'],
+            no_shows=row['no_shows'],
+            minutes=round(row['time_spent'].total_seconds() / 60) if row['time_spent'] else 0,
+        )
+        for row in rows
+    ]
+
+
+def lock_users(user_ids):
+    """Lock the users' rows until the end of the transaction, in id order so refreshes never deadlock"""
+    list(User.objects.select_for_update().filter(id__in=user_ids).order_by('id').values_list('id', flat=True))
+
+
+def refresh_rollups(keys, batch_size=1000):
+    """Recompute the rows of the given ``(user_id, week_start)`` keys"""
+    weeks = {}
+    for user_id, week in keys:
+        if user_id and week:
+            weeks.setdefault(week, set()).add(user_id)
+
+    for week, user_ids in weeks.items():
+        start, end = week_bounds(week)
+        user_ids = sorted(user_ids)
+        for offset in range(0, len(user_ids), batch_size):
+            batch = user_ids[offset:offset + batch_size]
+            with transaction.atomic():
+                lock_users(batch)
+                MeetingWeeklyStats.objects.filter(user_id__in=batch, week_start=week).delete()
+                MeetingWeeklyStats.objects.bulk_create(compute_rollups(batch, start, end))
+
+
+def attendance_keys(meeting_ids, weeks=()):
+    """Keys of the attendees of the meetings, in the meetings' week and in ``weeks``"""
+    keys = set()
+    rows = MeetingAttendance.objects.filter(meeting_id__in=meeting_ids).values_list('user_id', 'meeting__start_time')
+    for user_id, start in rows:
+        keys.add((user_id, week_start(start)))
+        keys.update((user_id, week) for week in weeks)
+    return keys
+
+
+def refresh_attendances(pairs):
+    """Refresh the weeks of ``(user_id, meeting_id)`` attendances"""
+    pairs = {(user_id, meeting_id) for user_id, meeting_id in pairs if user_id and meeting_id}
+    if not pairs:
+        return
+    starts = dict(
+        Meeting.objects.filter(id__in={meeting_id for _, meeting_id in pairs}).values_list('id', 'start_time')
+    )
+    # Deleted meetings were refreshed when they were deleted
+    refresh_rollups({(user_id, week_start(starts[meeting_id])) for user_id, meeting_id in pairs if meeting_id in starts})
+
+
+def refresh_meetings(meeting_ids, weeks=()):
+    """Refresh the rollups of every attendee of the meetings; ``weeks`` are weeks they moved out of"""
+    refresh_rollups(attendance_keys(meeting_ids, weeks))
+
+
+def rebuild_rollups(user_ids, batch_size=200):
+    """Recompute every week of the given users"""
+    user_ids = sorted(set(user_ids))
+    for offset in range(0, len(user_ids), batch_size):
+        batch = user_ids[offset:offset + batch_size]
+        with transaction.atomic():
+            lock_users(batch)
+            MeetingWeeklyStats.objects.filter(user_id__in=batch).delete()
+            MeetingWeeklyStats.objects.bulk_create(compute_rollups(batch), batch_size=1000)
+
+
+def reconcile_rollups(batch_size=200):
+    """Rebuild every user's rollups, walking users by primary key; returns the number of users"""
+    reconciled = 0
+    last_id = 0
+    while True:
+        batch = list(User.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1]
+        rebuild_rollups(batch, batch_size)
+        reconciled += len(batch)
+    return reconciled
+
+
+def weekly_summary(queryset):
+    """Totals per week of a ``MeetingWeeklyStats`` queryset, broken down by meeting type and category"""
+    rows = (
+        queryset.order_by()
+        .values('week_start', 'meeting_type', 'category_id', 'category__name')
+        .annotate(invited=Sum('invited'), attended=Sum('attended'), no_shows=Sum('no_shows'), minutes=Sum('minutes'))
+    )
+    measures = ['invited', 'attended', 'no_shows', 'minutes']
+
+    weeks = {}
+    for row in rows:
+        week = weeks.setdefault(row['week_start'], {
+            'week_start': row['week_start'], **dict.fromkeys(measures, 0), 'no_show_rate': None,
+            'by_type': {}, 'by_category': {},
+        })
+        by_type = week['by_type'].setdefault(row['meeting_type'], {
+            'meeting_type': row['meeting_type'], **dict.fromkeys(measures, 0),
+        })
+        by_category = week['by_category'].setdefault(row['category_id'], {
+            'category': row['category_id'], 'category_name': row['category__name'], **dict.fromkeys(measures, 0),
+        })
+        for measure in measures:
+            week[measure] += row[measure]
+            by_type[measure] += row[measure]
+            by_category[measure] += row[measure]
+
+    summary = []
+    for week in sorted(weeks.values(), key=lambda week: week['week_start']):
+        # Of the meetings with a known outcome
+        outcomes = week['attended'] + week['no_shows']
+        if outcomes:
+            week['no_show_rate'] = round(week['no_shows'] / outcomes, 3)
+        week['by_type'] = sorted(week['by_type'].values(), key=lambda item: item['meeting_type'])
+        week['by_category'] = sorted(week['by_category'].values(), key=lambda item: item['category_name'] or '')
+        summary.append(week)
+    return summary
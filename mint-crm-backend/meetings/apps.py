@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class MeetingsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'meetings'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from contacts.importer import register_importer
+        from .ics_import import MeetingImporter
+        
+        # .ics uploads run as import jobs of kind 'meetings'
+        register_importer(MeetingImporter)
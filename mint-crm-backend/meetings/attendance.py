@@ -0,0 +1,94 @@
+"""Attendance rows of meetings, written in batches.
+
+Every attendee of a meeting has a ``MeetingAttendance`` row, created as
+``invited`` in one insert when attendees are added (see ``signals``) and
+removed with them unless it already records attendance. RSVPs and check-ins
+of many attendees are one UPDATE each, so an all-hands meeting costs the same
+number of queries as a one-on-one.
+
+Bulk writes skip the model signals, so every function here refreshes the
+weekly rollups of the attendances it changed itself.
+"""
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .analytics import refresh_attendances
+from .models import Meeting, MeetingAttendance
+
+RESPONSE_STATUSES = ['accepted', 'declined', 'tentative']
+
+# Rows recording what happened at a meeting, kept when the attendee is removed
+OUTCOME_STATUSES = ['attended', 'no_show']
+
+
+def refresh_after_commit(pairs):
+    pairs = list(pairs)
+    if pairs:
+        transaction.on_commit(lambda: refresh_attendances(pairs))
+
+
+def invite(pairs, refresh=True):
+    """Create the missing ``invited`` rows of ``(meeting_id, user_id)`` pairs.
+
+    Without ``refresh`` the caller refreshes the rollups, as imports do once at the end.
+    """
+    pairs = set(pairs)
+    MeetingAttendance.objects.bulk_create(
+        [MeetingAttendance(meeting_id=meeting_id, user_id=user_id, status='invited') for meeting_id, user_id in pairs],
+        batch_size=1000, ignore_conflicts=True
+    )
+    if refresh:
+        refresh_after_commit((user_id, meeting_id) for meeting_id, user_id in pairs)
+
+
+def uninvite(attendances):
+    """Delete the rows of removed attendees from an attendance queryset, keeping recorded outcomes"""
+    pairs = list(attendances.exclude(status__in=OUTCOME_STATUSES).values_list('user_id', 'meeting_id'))
+    if pairs:
+        attendances.exclude(status__in=OUTCOME_STATUSES).delete()
+        refresh_after_commit(pairs)
+
+
+def respond(user, meeting_ids, status, notes=''):
+    """Record the user's response to several invitations.
+
+    Returns the ids of the meetings answered and of those the user is not invited to.
+    Invitations of meetings already attended or missed keep their outcome.
+    """
+    now = timezone.now()
+    attendances = MeetingAttendance.objects.filter(user=user, meeting_id__in=meeting_ids)
+    found = dict(attendances.values_list('meeting_id', 'status'))
+    answered = sorted(meeting_id for meeting_id, current in found.items() if current not in OUTCOME_STATUSES)
+    attendances.filter(meeting_id__in=answered).update(
+        status=status, response_notes=notes, responded_at=now, updated_at=now
+    )
+    refresh_after_commit((user.id, meeting_id) for meeting_id in answered)
+    return answered, sorted(set(meeting_ids) - set(found))
+
+
+def check_in(meeting, user_ids):
+    """Mark attendees of the meeting as attended; returns the ids of users who are not attendees.
+
+    Attendees checked in before keep their first joining time.
+    """
+    now = timezone.now()
+    attendees = set(
+        Meeting.attendees.through.objects.filter(meeting_id=meeting.id, user_id__in=user_ids)
+        .values_list('user_id', flat=True)
+    )
+    with transaction.atomic():
+        attendances = MeetingAttendance.objects.filter(meeting=meeting, user_id__in=attendees)
+        existing = set(attendances.values_list('user_id', flat=True))
+        attendances.update(status='attended', joined_at=Coalesce('joined_at', Value(now)), updated_at=now)
+        # Attendees without a row, added to the attendee table directly
+        MeetingAttendance.objects.bulk_create(
+            [
+                MeetingAttendance(meeting=meeting, user_id=user_id, status='attended', joined_at=now)
+                for user_id in attendees - existing
+            ],
+            batch_size=1000, ignore_conflicts=True
+        )
+    refresh_after_commit((user_id, meeting.id) for user_id in attendees)
+    return sorted(set(user_ids) - attendees)
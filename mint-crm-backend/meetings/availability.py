@@ -0,0 +1,113 @@
+"""Free/busy lookup and common free slots for a set of users.
+
+Busy time is every meeting the users organize or attend, recurring
+occurrences included, fetched with the one calendar query. The intervals are
+sorted and merged in a single sweep; free time is what is left of the working
+hours, and slots of the requested duration are laid on it.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+
+from .calendar import calendar_events, involving
+from .models import Meeting
+
+
+def busy_intervals(user_ids, window_start, window_end):
+    """Merged ``(start, end)`` intervals in which any of the users is in a meeting"""
+    events = calendar_events(involving(Meeting.objects.all(), user_ids), window_start, window_end)
+    # Cancelled occurrences are dropped by the expansion; cancelled meetings here
+    return merge_intervals(
+        (max(event.start, window_start), min(event.end, window_end))
+        for event in events
+        if event.meeting.status != 'cancelled' and event.meeting.is_active
+    )
+
+
+def merge_intervals(intervals):
+    """Sweep sorted intervals, joining the ones that overlap or touch"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [tuple(interval) for interval in merged]
+
+
+def working_intervals(window_start, window_end, tz, day_start, day_end, weekdays):
+    """Working hours in ``tz`` on ``weekdays`` (0 is Monday), clipped to the window"""
+    intervals = []
+    day = window_start.astimezone(tz).date()
+    last_day = window_end.astimezone(tz).date()
+    while day <= last_day:
+        if day.weekday() in weekdays:
+            start = datetime.combine(day, day_start, tzinfo=tz)
+            end = datetime.combine(day, day_end, tzinfo=tz)
+            start, end = max(start, window_start), min(end, window_end)
+            if start < end:
+                intervals.append((start, end))
+        day += timedelta(days=1)
+    return intervals
+
+
+def free_intervals(working, busy):
+    """Parts of the sorted ``working`` intervals not covered by the merged ``busy`` ones"""
+    free = []
+    index = 0
+    for start, end in working:
+        # Busy intervals ending before this working interval are never needed again
+        while index < len(busy) and busy[index][1] <= start:
+            index += 1
+        cursor = start
+        position = index
+        while position < len(busy) and busy[position][0] < end:
+            if busy[position][0] > cursor:
+                free.append((cursor, busy[position][0]))
+            cursor = max(cursor, busy[position][1])
+            position += 1
+        if cursor < end:
+            free.append((cursor, end))
+    return free
+
+
+def slots(free, duration, step, limit):
+    """Up to ``limit`` slots of ``duration`` starting on ``step`` boundaries"""
+    found = []
+    for start, end in free:
+        # Slots start on the hour or a multiple of the step after it
+        offset = (start - start.replace(minute=0, second=0, microsecond=0)) % step
+        slot_start = start + (step - offset) % step
+        while slot_start + duration <= end:
+            found.append((slot_start, slot_start + duration))
+            if len(found) >= limit:
+                return found
+            slot_start += step
+    return found
+
+
+def find_availability(user_ids, window_start, window_end, duration, tz, day_start=None, day_end=None,
+                      weekdays=None, limit=None):
+    """Merged busy time, free working time and candidate slots for the users"""
+    busy = busy_intervals(user_ids, window_start, window_end)
+    working = working_intervals(
+        window_start, window_end, tz,
+        day_start or time.fromisoformat(settings.MEETING_WORKING_HOURS_START),
+        day_end or time.fromisoformat(settings.MEETING_WORKING_HOURS_END),
+        settings.MEETING_WORKING_DAYS if weekdays is None else weekdays,
+    )
+    # In ``tz`` so slots line up with the users' clock
+    free = [
+        (start.astimezone(tz), end.astimezone(tz))
+        for start, end in free_intervals(working, busy)
+        if end - start >= duration
+    ]
+    return {
+        'busy': busy,
+        'free': free,
+        'slots': slots(
+            free, duration, timedelta(minutes=settings.MEETING_SLOT_STEP_MINUTES),
+            limit or settings.MEETING_FREEBUSY_SLOT_LIMIT
+        ),
+    }
@@ -0,0 +1,105 @@
+"""Calendar views of meetings over a time window.
+
+Plain meetings, recurring series and the overrides of their occurrences are
+fetched with one query of three overlap predicates. On PostgreSQL plain
+meetings are matched with ``&&`` on the GiST-indexed ``tstzrange`` of their
+start and end; other databases compare the start/end pair. Series are then
+expanded for the window only (see ``recurrence``), with every override of
+theirs fetched by series in a second query, and every event is returned as
+the same slim projection. Search and field filters apply to the expanded
+events, so an override is matched on its own title and status rather than
+falling back to the occurrence it replaces.
+"""
+from django.db import connection
+from django.db.models import Exists, OuterRef, Q
+
+from .models import Meeting, time_range
+from .recurrence import Occurrence, expand, is_series, overlapping_overrides, series_in_window
+
+# Columns the calendar projection and the expansion read
+CALENDAR_FIELDS = [
+    'id', 'title', 'status', 'meeting_type', 'priority', 'start_time', 'end_time',
+    'timezone', 'all_day', 'location', 'location_type', 'organizer', 'category',
+    'is_private', 'is_active', 'is_recurring', 'recurrence_rule', 'parent_meeting',
+    'recurrence_id', 'recurrence_end', 'updated_at',
+]
+
+
+def use_time_range():
+    return connection.vendor == 'postgresql'
+
+
+def with_time_range(queryset):
+    """Alias the indexed range ``overlaps`` filters on"""
+    return queryset.alias(time_range=time_range()) if use_time_range() else queryset
+
+
+def overlaps(window_start, window_end):
+    """Meetings overlapping [window_start, window_end); needs ``with_time_range``"""
+    if use_time_range():
+        return Q(time_range__overlap=(window_start, window_end))
+    return Q(start_time__lt=window_end, end_time__gt=window_start)
+
+
+def visible_to(queryset, user):
+    """Meetings the user organizes or attends, and public ones"""
+    if user.is_staff:
+        return queryset
+    attending = Meeting.attendees.through.objects.filter(meeting=OuterRef('pk'), user=user)
+    return queryset.filter(Q(organizer=user) | Q(is_private=False) | Exists(attending))
+
+
+def involving(queryset, user_ids):
+    """Meetings organized or attended by any of the users"""
+    attending = Meeting.attendees.through.objects.filter(meeting=OuterRef('pk'), user_id__in=user_ids)
+    return queryset.filter(Q(organizer_id__in=user_ids) | Exists(attending))
+
+
+def calendar_events(queryset, window_start, window_end, matching=None):
+    """Occurrences of the meetings of ``queryset`` in the window, ordered by start.
+
+    ``matching``, a filtered queryset of meetings, keeps only the events whose
+    meeting (the series for plain occurrences) is in it.
+    """
+    rows = with_time_range(queryset).filter(
+        (overlaps(window_start, window_end) & Q(recurrence_id__isnull=True)) |
+        series_in_window(window_start, window_end) |
+        overlapping_overrides(window_start, window_end)
+    ).only(*CALENDAR_FIELDS).order_by()
+
+    events, series, overrides = [], [], []
+    for meeting in rows:
+        if is_series(meeting):
+            series.append(meeting)
+        elif meeting.recurrence_id is not None:
+            overrides.append(meeting)
+        elif meeting.start_time < window_end and meeting.end_time > window_start:
+            events.append(Occurrence(meeting, meeting.start_time, meeting.end_time))
+
+    series_ids = {meeting.id for meeting in series}
+    if series_ids:
+        # Every override replaces its occurrence, including those ``queryset`` leaves out
+        series_overrides = Meeting.objects.filter(
+            overlapping_overrides(window_start, window_end), parent_meeting_id__in=series_ids
+        ).only(*CALENDAR_FIELDS)
+        events.extend(expand(series, window_start, window_end, overrides=series_overrides))
+
+    # Overrides of series outside ``queryset`` still show on their own
+    for override in overrides:
+        if (
+            override.parent_meeting_id not in series_ids and override.status != 'cancelled'
+            and override.is_active and override.start_time < window_end and override.end_time > window_start
+        ):
+            events.append(
+                Occurrence(override, override.start_time, override.end_time,
+                           override.parent_meeting_id, override.recurrence_id)
+            )
+
+    if matching is not None and events:
+        matched = set(
+            matching.filter(id__in={event.meeting.id for event in events}).order_by().values_list('id', flat=True)
+        )
+        events = [event for event in events if event.meeting.id in matched]
+
+    events.sort(key=lambda event: (event.start, event.meeting.id))
+    return events
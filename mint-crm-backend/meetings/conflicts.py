@@ -0,0 +1,113 @@
+"""Double-booking checks for meetings being created or changed.
+
+The meetings of every user involved are found with the one calendar overlap
+query over the span of the new meeting (all its occurrences up to
+``MEETING_CONFLICT_HORIZON_DAYS`` when it recurs), then matched to users with
+one query on the attendee table. The cost does not grow with the number of
+attendees.
+"""
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .calendar import calendar_events, involving
+from .models import Meeting
+from .recurrence import is_series, occurrence_starts
+
+POLICIES = ['reject', 'warn', 'allow']
+
+
+class MeetingConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The meeting conflicts with other meetings of its organizer or attendees'
+    default_code = 'conflict'
+
+    def __init__(self, conflicts):
+        super().__init__()
+        # Set after __init__, which would turn the ids and times into strings
+        self.detail = {'error': str(self.default_detail), 'conflicts': conflicts}
+
+
+def candidate_intervals(meeting):
+    """Sorted ``(start, end)`` times a saved or unsaved meeting takes up"""
+    if meeting.end_time <= meeting.start_time:
+        return []
+    if not is_series(meeting):
+        return [(meeting.start_time, meeting.end_time)]
+
+    horizon = meeting.start_time + timedelta(days=settings.MEETING_CONFLICT_HORIZON_DAYS)
+    duration = meeting.end_time - meeting.start_time
+    return [(start, start + duration) for start in occurrence_starts(meeting, meeting.start_time, horizon)]
+
+
+def _overlaps_any(intervals, starts, start, end):
+    # Intervals of one meeting do not overlap each other, so only the last one starting before ``end`` can match
+    index = bisect_left(starts, end)
+    return index > 0 and intervals[index - 1][1] > start
+
+
+def find_conflicts(meeting, user_ids):
+    """``{user id: [occurrence, ...]}`` of other meetings overlapping ``meeting`` for each user"""
+    intervals = candidate_intervals(meeting)
+    user_ids = set(user_ids)
+    if not intervals or not user_ids or meeting.status == 'cancelled':
+        return {}
+
+    queryset = Meeting.objects.all()
+    if meeting.pk:
+        # The meeting itself, and the overrides of its occurrences
+        queryset = queryset.exclude(id=meeting.pk).exclude(parent_meeting_id=meeting.pk)
+    if meeting.parent_meeting_id:
+        # The series occurrence this override replaces is not a conflict
+        queryset = queryset.exclude(id=meeting.parent_meeting_id)
+
+    starts = [start for start, _ in intervals]
+    events = [
+        event
+        for event in calendar_events(
+            involving(queryset, user_ids), intervals[0][0], max(end for _, end in intervals)
+        )
+        if event.meeting.status != 'cancelled' and event.meeting.is_active
+        and _overlaps_any(intervals, starts, event.start, event.end)
+    ]
+    if not events:
+        return {}
+
+    attending = {}
+    rows = Meeting.attendees.through.objects.filter(
+        meeting_id__in={event.meeting.id for event in events}, user_id__in=user_ids
+    ).values_list('meeting_id', 'user_id')
+    for meeting_id, user_id in rows:
+        attending.setdefault(meeting_id, set()).add(user_id)
+
+    conflicts = {}
+    for event in events:
+        users = set(attending.get(event.meeting.id, ()))
+        if event.meeting.organizer_id in user_ids:
+            users.add(event.meeting.organizer_id)
+        for user_id in users:
+            conflicts.setdefault(user_id, []).append(event)
+    return conflicts
+
+
+def describe_conflicts(conflicts):
+    """JSON-ready conflicts; titles of private meetings are left out"""
+    return [
+        {
+            'user_id': user_id,
+            'meetings': [
+                {
+                    'id': event.meeting.id,
+                    'series_id': event.series_id,
+                    'title': '' if event.meeting.is_private else event.meeting.title,
+                    'start_time': event.start.isoformat(),
+                    'end_time': event.end.isoformat(),
+                }
+                for event in events
+            ],
+        }
+        for user_id, events in sorted(conflicts.items())
+    ]
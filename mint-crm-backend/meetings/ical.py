@@ -0,0 +1,292 @@
+"""iCalendar (RFC 5545) feeds of a user's meetings.
+
+Each user with an ``ical`` calendar integration gets a feed at a secret URL
+holding the meetings they organize or attend: plain meetings ending in the last
+``MEETING_FEED_PAST_DAYS``, every series still running (as one VEVENT with its
+RRULE) and the overrides of its occurrences (VEVENTs with RECURRENCE-ID).
+Series and overrides keep the wall clock of their zone with TZID times, and
+every zone used gets a VTIMEZONE with its transitions over the feed's years.
+
+The feed's version is one aggregate query (count and latest ``updated_at`` of
+its meetings), so calendar clients polling with If-None-Match are answered 304
+without rendering. A deleted meeting or a removed attendee changes the count
+but not the latest ``updated_at``, so the feed has no Last-Modified and
+If-Modified-Since is not honoured. Rendering streams the meetings in chunks and
+stores the result under the version, so it is reused until a meeting in the
+feed changes.
+"""
+import hashlib
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Min, Q
+from django.utils import timezone
+
+from .calendar import involving
+from .models import Meeting
+from .recurrence import (
+    InvalidRule, build_rule, is_series, meeting_zone, overlapping_overrides, series_in_window, zone_named,
+)
+
+PRODID = '-//MINT CRM//Meetings//EN'
+UID_DOMAIN = 'mint-crm'
+
+# Years after the current one whose time zone transitions are written, for series still running
+TIMEZONE_YEARS_AHEAD = 10
+
+FEED_FIELDS = [
+    'id', 'title', 'description', 'status', 'start_time', 'end_time', 'timezone', 'all_day',
+    'location', 'meeting_url', 'organizer__email', 'organizer__first_name', 'organizer__last_name',
+    'is_recurring', 'recurrence_rule', 'parent_meeting', 'recurrence_id', 'recurrence_end',
+    'is_private', 'ical_uid', 'created_at', 'updated_at',
+]
+
+def feed_meetings(user, now=None):
+    """Meetings in the feed of ``user``"""
+    since = (now or timezone.now()) - timedelta(days=settings.MEETING_FEED_PAST_DAYS)
+    # Series and overrides end far in the future; the windows are open-ended
+    until = since + timedelta(days=365 * 100)
+    return involving(Meeting.objects.filter(is_active=True), [user.id]).filter(
+        Q(recurrence_id__isnull=True, is_recurring=False, end_time__gte=since) |
+        series_in_window(since, until) |
+        overlapping_overrides(since, until)
+    )
+
+
+def feed_version(queryset):
+    """ETag of a feed; None for an empty one"""
+    version = queryset.order_by().aggregate(count=Count('id'), last_modified=Max('updated_at'))
+    if not version['count']:
+        return None
+    key = f"{version['count']}:{version['last_modified'].isoformat()}"
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def feed_cache_key(user, etag):
+    return f"meetings:ical:{user.id}:{etag}"
+
+
+def escape_text(value):
+    return (
+        str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def fold(line):
+    """Content line folded to 75 octets, ending in CRLF"""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts, start = [], 0
+    while start < len(encoded):
+        end = start + (75 if not parts else 74)
+        # Never split a multi-byte character
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode())
+        start = end
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def utc_stamp(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def local_stamp(value, tz):
+    """``;TZID=...:<local time>`` value"""
+    return f";TZID={getattr(tz, 'key', 'UTC')}:{value.astimezone(tz):%Y%m%dT%H%M%S}"
+
+
+def utc_offset(offset):
+    """``+HHMM`` (``+HHMMSS`` with seconds) value of a UTC offset"""
+    seconds = int(offset.total_seconds())
+    sign = '-' if seconds < 0 else '+'
+    hours, rest = divmod(abs(seconds), 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{sign}{hours:02}{minutes:02}" + (f"{seconds:02}" if seconds else '')
+
+
+def zone_transitions(tz, start, end):
+    """UTC instants between ``start`` and ``end`` at which the offset of ``tz`` changes"""
+    transitions = []
+    day = timedelta(days=1)
+    current = start
+    while current < end:
+        following = min(current + day, end)
+        if current.astimezone(tz).utcoffset() != following.astimezone(tz).utcoffset():
+            # Offsets change at most once a day: bisect to the second
+            low, high = current, following
+            while high - low > timedelta(seconds=1):
+                middle = low + (high - low) / 2
+                if middle.astimezone(tz).utcoffset() == low.astimezone(tz).utcoffset():
+                    low = middle
+                else:
+                    high = middle
+            transitions.append(high.replace(microsecond=0))
+        current = following
+    return transitions
+
+
+def observance_lines(tz, onset, offset_from):
+    """STANDARD or DAYLIGHT block of the offset in effect from ``onset``"""
+    local = onset.astimezone(tz)
+    kind = 'DAYLIGHT' if local.dst() else 'STANDARD'
+    lines = [
+        f"BEGIN:{kind}",
+        # Onsets are local times in the offset they end
+        f"DTSTART:{(onset + offset_from).replace(tzinfo=None):%Y%m%dT%H%M%S}",
+        f"TZOFFSETFROM:{utc_offset(offset_from)}",
+        f"TZOFFSETTO:{utc_offset(local.utcoffset())}",
+    ]
+    if local.tzname():
+        lines.append(f"TZNAME:{escape_text(local.tzname())}")
+    lines.append(f"END:{kind}")
+    return lines
+
+
+def vtimezone_lines(tz, start_year, end_year):
+    """VTIMEZONE of ``tz`` with the offset at the start of ``start_year`` and every later transition"""
+    start = datetime(start_year, 1, 1, tzinfo=dt_timezone.utc)
+    end = datetime(end_year + 1, 1, 1, tzinfo=dt_timezone.utc)
+    lines = ['BEGIN:VTIMEZONE', f"TZID:{getattr(tz, 'key', 'UTC')}"]
+    lines.extend(observance_lines(tz, start, start.astimezone(tz).utcoffset()))
+    for onset in zone_transitions(tz, start, end):
+        lines.extend(observance_lines(tz, onset, (onset - timedelta(seconds=1)).astimezone(tz).utcoffset()))
+    lines.append('END:VTIMEZONE')
+    return lines
+
+
+def timezone_lines(queryset, now=None):
+    """VTIMEZONEs of the zones the TZID times of the feed refer to"""
+    zones = (
+        queryset.filter(Q(is_recurring=True) | Q(parent_meeting__isnull=False), all_day=False)
+        .order_by().values('timezone').annotate(first_start=Min('start_time'), first_occurrence=Min('recurrence_id'))
+    )
+    end_year = (now or timezone.now()).year + TIMEZONE_YEARS_AHEAD
+    first_years = {}
+    for row in zones:
+        tz = zone_named(row['timezone'])
+        # Overrides can be moved before the start of their series
+        first = min(filter(None, [row['first_start'], row['first_occurrence']]))
+        key = getattr(tz, 'key', 'UTC')
+        first_years[key] = (tz, min(first.year, first_years.get(key, (tz, first.year))[1]))
+
+    lines = []
+    for key in sorted(first_years):
+        tz, start_year = first_years[key]
+        lines.extend(vtimezone_lines(tz, start_year, max(start_year, end_year)))
+    return lines
+
+
+def event_uid(meeting):
+    """UID shared by a series and the overrides of its occurrences; imported meetings keep theirs"""
+    return meeting.ical_uid or f"meeting-{meeting.parent_meeting_id or meeting.id}@{UID_DOMAIN}"
+
+
+def rrule_line(series):
+    """RRULE of a series; UNTIL is written in UTC as RFC 5545 requires with a TZID start"""
+    rule = build_rule(series)
+    text = next(line for line in str(rule).splitlines() if line.startswith('RRULE:'))
+    if rule._until:
+        parts = [
+            f"UNTIL={utc_stamp(rule._until)}" if part.startswith('UNTIL=') else part
+            for part in text[len('RRULE:'):].split(';')
+        ]
+        text = 'RRULE:' + ';'.join(parts)
+    return text
+
+
+def event_lines(meeting, attendee_emails):
+    """Content lines of one VEVENT"""
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:{event_uid(meeting)}",
+        f"DTSTAMP:{utc_stamp(meeting.updated_at)}",
+        f"CREATED:{utc_stamp(meeting.created_at)}",
+        f"LAST-MODIFIED:{utc_stamp(meeting.updated_at)}",
+    ]
+
+    tz = meeting_zone(meeting)
+    if meeting.all_day:
+        end = max(meeting.end_time.astimezone(tz).date(), meeting.start_time.astimezone(tz).date() + timedelta(days=1))
+        lines.append(f"DTSTART;VALUE=DATE:{meeting.start_time.astimezone(tz):%Y%m%d}")
+        lines.append(f"DTEND;VALUE=DATE:{end:%Y%m%d}")
+    elif is_series(meeting) or meeting.parent_meeting_id:
+        # Series repeat on the wall clock of their zone, which overrides copy
+        lines.append(f"DTSTART{local_stamp(meeting.start_time, tz)}")
+        lines.append(f"DTEND{local_stamp(meeting.end_time, tz)}")
+    else:
+        lines.append(f"DTSTART:{utc_stamp(meeting.start_time)}")
+        lines.append(f"DTEND:{utc_stamp(meeting.end_time)}")
+
+    if is_series(meeting):
+        lines.append(rrule_line(meeting))
+    if meeting.recurrence_id is not None:
+        lines.append(f"RECURRENCE-ID{local_stamp(meeting.recurrence_id, tz)}")
+
+    lines.append(f"SUMMARY:{escape_text(meeting.title)}")
+    if meeting.description:
+        lines.append(f"DESCRIPTION:{escape_text(meeting.description)}")
+    if meeting.location:
+        lines.append(f"LOCATION:{escape_text(meeting.location)}")
+    if meeting.meeting_url:
+        lines.append(f"URL:{meeting.meeting_url}")
+    lines.append(f"STATUS:{'CANCELLED' if meeting.status == 'cancelled' else 'CONFIRMED'}")
+    if meeting.is_private:
+        lines.append('CLASS:PRIVATE')
+
+    organizer = meeting.organizer
+    name = f"{organizer.first_name} {organizer.last_name}".strip()
+    cn = f";CN={escape_text(name)}" if name else ''
+    lines.append(f"ORGANIZER{cn}:mailto:{organizer.email}")
+    for email in attendee_emails:
+        lines.append(f"ATTENDEE;ROLE=REQ-PARTICIPANT:mailto:{email}")
+
+    lines.append('END:VEVENT')
+    return lines
+
+
+def render_feed(queryset, chunk_size=None):
+    """Yield the calendar in chunks of meetings, with their attendees read per chunk"""
+    chunk_size = chunk_size or settings.MEETING_FEED_CHUNK_SIZE
+    yield ''.join(fold(line) for line in [
+        'BEGIN:VCALENDAR', 'VERSION:2.0', f"PRODID:{PRODID}", 'CALSCALE:GREGORIAN', 'METHOD:PUBLISH',
+        *timezone_lines(queryset),
+    ])
+
+    meetings = queryset.select_related('organizer').only(*FEED_FIELDS).order_by('id')
+    last_id = 0
+    while True:
+        # Keyset pagination: constant memory and no OFFSET scans
+        chunk = list(meetings.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+
+        attendees = {}
+        rows = Meeting.attendees.through.objects.filter(meeting_id__in=[meeting.id for meeting in chunk])
+        for meeting_id, email in rows.order_by('id').values_list('meeting_id', 'user__email'):
+            attendees.setdefault(meeting_id, []).append(email)
+
+        lines = []
+        for meeting in chunk:
+            try:
+                lines.extend(event_lines(meeting, attendees.get(meeting.id, [])))
+            except InvalidRule:
+                # Stored before rules were validated; left out rather than breaking the feed
+                continue
+        yield ''.join(fold(line) for line in lines)
+
+    yield fold('END:VCALENDAR')
+
+
+def cached_render(queryset, cache_key):
+    """Stream the feed, storing it under ``cache_key`` once it has been rendered in full"""
+    parts = []
+    for part in render_feed(queryset):
+        parts.append(part)
+        yield part
+    cache.set(cache_key, ''.join(parts), settings.MEETING_FEED_CACHE_TIMEOUT)
@@ -0,0 +1,542 @@
+"""Streaming bulk import of meetings from iCalendar (.ics) files.
+
+The file is read line by line (RFC 5545 unfolding) and VEVENTs are written in
+chunks, so memory use does not grow with the file. Organizers and attendees
+are resolved to users by email with one query per chunk. Meetings are matched
+on their organizer and iCalendar UID (``Meeting.ical_uid``), so importing the
+same file again updates instead of duplicating, and a file never touches
+another user's meetings.
+
+Mapping:
+
+* Imports through the API organize every meeting for the importer; an
+  ORGANIZER who is another user attends the meeting instead. Command-line
+  imports give meetings to the users named as ORGANIZER.
+* RRULE becomes ``recurrence_rule`` (``{"rrule": ...}``); UNTIL is stored in UTC.
+* A VEVENT with RECURRENCE-ID overrides one occurrence of the series with the
+  same UID, and EXDATEs become cancelled overrides, as everywhere else in
+  ``recurrence``.
+* ``bulk_create`` skips ``Meeting.save`` and the signals, so ``recurrence_end``
+  is computed here, reminders are planned explicitly per chunk, and attendance
+  rows are created with the attendees and rolled up once at the end.
+"""
+import io
+import re
+import time
+from datetime import datetime, timedelta
+from datetime import time as dt_time
+from datetime import timezone as dt_timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from contacts.importer import BaseImporter, ImportFileError
+
+from .analytics import rebuild_rollups
+from .attendance import invite
+from .models import Meeting
+from .recurrence import InvalidRule, recurrence_end, validate_rule
+from .reminders import plan_reminders
+
+User = get_user_model()
+
+# Fields an import writes, on creation and on re-import
+IMPORT_FIELDS = [
+    'title', 'description', 'status', 'start_time', 'end_time', 'timezone', 'all_day', 'location',
+    'meeting_url', 'organizer', 'is_recurring', 'recurrence_rule', 'recurrence_end', 'is_private',
+]
+# Their column names, read back to leave rows the file did not change untouched
+STORED_FIELDS = [Meeting._meta.get_field(name).attname for name in IMPORT_FIELDS]
+
+# VEVENT STATUS -> Meeting.status
+STATUS_MAP = {'CANCELLED': 'cancelled', 'CONFIRMED': 'confirmed', 'TENTATIVE': 'scheduled'}
+
+DURATION_RE = re.compile(
+    r'^(?P<sign>[+-])?P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?'
+    r'(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?$'
+)
+
+TEXT_ESCAPES = {'n': '\n', 'N': '\n', '\\': '\\', ',': ',', ';': ';'}
+
+is_url = URLValidator()
+
+
+class InvalidEvent(ValueError):
+    """A VEVENT that cannot be turned into a meeting"""
+
+
+def unfold(fileobj):
+    """Yield ``(line number, content line)`` with folded continuation lines joined"""
+    text = fileobj if isinstance(fileobj, io.TextIOBase) else io.TextIOWrapper(
+        fileobj, encoding='utf-8-sig', errors='replace', newline=''
+    )
+    current, start = None, 0
+    for number, raw in enumerate(text, start=1):
+        raw = raw.rstrip('\r\n')
+        if raw[:1] in (' ', '\t') and current is not None:
+            current += raw[1:]
+            continue
+        if current:
+            yield start, current
+        current, start = raw, number
+    if current:
+        yield start, current
+
+
+def parse_line(line):
+    """``(NAME, {PARAM: value}, value)`` of a content line; quoted parameter values may hold ``:`` and ``;``"""
+    parts, quoted, start = [], False, 0
+    for index, char in enumerate(line):
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char in ';:':
+            parts.append(line[start:index])
+            start = index + 1
+            if char == ':':
+                break
+    else:
+        raise InvalidEvent(f"Malformed line '{line[:50]}'")
+
+    params = {}
+    for part in parts[1:]:
+        key, _, value = part.partition('=')
+        params[key.upper()] = value.strip('"')
+    return parts[0].upper(), params, line[start:]
+
+
+def iter_events(fileobj):
+    """Yield ``(line number, {NAME: [(params, value), ...]})`` for each VEVENT; VALARMs are skipped"""
+    event, nested, seen_calendar = None, 0, False
+    for number, line in unfold(fileobj):
+        try:
+            name, params, value = parse_line(line)
+        except InvalidEvent:
+            # Stray text between properties, as some exporters write
+            continue
+        if name == 'BEGIN':
+            seen_calendar = seen_calendar or value.upper() == 'VCALENDAR'
+            if event is None and value.upper() == 'VEVENT':
+                event = (number, {})
+            elif event is not None:
+                nested += 1
+        elif name == 'END':
+            if event is not None and nested:
+                nested -= 1
+            elif event is not None and value.upper() == 'VEVENT':
+                yield event
+                event = None
+        elif event is not None and not nested:
+            event[1].setdefault(name, []).append((params, value))
+    if not seen_calendar:
+        raise ImportFileError('The file is not an iCalendar file (no BEGIN:VCALENDAR)')
+
+
+def unescape_text(value):
+    return re.sub(r'\\(.)', lambda match: TEXT_ESCAPES.get(match.group(1), match.group(1)), value)
+
+
+@lru_cache(maxsize=256)
+def zone_for(tzid):
+    """IANA zone for a TZID; other names (e.g. Windows ones) fall back to the server zone"""
+    try:
+        return ZoneInfo(tzid.strip().removeprefix('/'))
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(settings.TIME_ZONE)
+
+
+def parse_when(params, value, default_zone):
+    """``(aware datetime, zone, is_date)`` of a DTSTART/DTEND/RECURRENCE-ID/EXDATE value"""
+    value = value.strip()
+    try:
+        if params.get('VALUE', '').upper() == 'DATE' or len(value) == 8:
+            day = datetime.strptime(value[:8], '%Y%m%d').date()
+            return datetime.combine(day, dt_time.min, tzinfo=default_zone), default_zone, True
+        if value.endswith('Z'):
+            return datetime.strptime(value, '%Y%m%dT%H%M%SZ').replace(tzinfo=dt_timezone.utc), None, False
+        zone = zone_for(params['TZID']) if params.get('TZID') else default_zone
+        return datetime.strptime(value, '%Y%m%dT%H%M%S').replace(tzinfo=zone), zone, False
+    except ValueError:
+        raise InvalidEvent(f"'{value}' is not an iCalendar date or date-time")
+
+
+def parse_duration(value):
+    match = DURATION_RE.match(value.strip().upper())
+    if not match:
+        raise InvalidEvent(f"'{value}' is not an iCalendar duration")
+    parts = {name: int(number or 0) for name, number in match.groupdict().items() if name != 'sign'}
+    duration = timedelta(**parts)
+    return -duration if match.group('sign') == '-' else duration
+
+
+def normalize_rrule(value, zone):
+    """RRULE text with UNTIL in UTC, as dateutil needs with a zoned start"""
+    parts = []
+    for part in value.removeprefix('RRULE:').split(';'):
+        name, _, until = part.partition('=')
+        if name.upper() == 'UNTIL' and not until.endswith('Z'):
+            if len(until) == 8:
+                local = datetime.combine(datetime.strptime(until, '%Y%m%d').date(), dt_time.max, tzinfo=zone)
+            else:
+                local = datetime.strptime(until, '%Y%m%dT%H%M%S').replace(tzinfo=zone)
+            part = f"UNTIL={local.astimezone(dt_timezone.utc):%Y%m%dT%H%M%SZ}"
+        parts.append(part)
+    return ';'.join(parts)
+
+
+def mailto(value):
+    value = value.strip()
+    if value.lower().startswith('mailto:'):
+        value = value[len('mailto:'):]
+    return value.lower() if '@' in value else None
+
+
+def parse_event(props, default_zone):
+    """Meeting fields and links of one VEVENT"""
+    def first(name, default=''):
+        return props[name][0][1] if name in props else default
+
+    uid = first('UID').strip()
+    if not uid:
+        raise InvalidEvent('UID is required')
+    if 'DTSTART' not in props:
+        raise InvalidEvent('DTSTART is required')
+
+    start, zone, is_date = parse_when(*props['DTSTART'][0], default_zone)
+    if 'DTEND' in props:
+        end = parse_when(*props['DTEND'][0], zone or default_zone)[0]
+    elif 'DURATION' in props:
+        end = start + parse_duration(first('DURATION'))
+    else:
+        end = start + timedelta(days=1) if is_date else start
+    if end < start:
+        raise InvalidEvent('DTEND is before DTSTART')
+    zone = zone or dt_timezone.utc
+
+    url = first('URL').strip()
+    try:
+        is_url(url)
+    except ValidationError:
+        url = ''
+
+    fields = {
+        'title': unescape_text(first('SUMMARY')).strip()[:200] or '(No title)',
+        'description': unescape_text(first('DESCRIPTION')),
+        'status': STATUS_MAP.get(first('STATUS').upper(), 'scheduled'),
+        'start_time': start,
+        'end_time': end,
+        'timezone': getattr(zone, 'key', 'UTC'),
+        'all_day': is_date,
+        'location': unescape_text(first('LOCATION')).strip()[:200],
+        'meeting_url': url if len(url) <= 200 else '',
+        'is_private': first('CLASS').upper() in ('PRIVATE', 'CONFIDENTIAL'),
+        'is_recurring': False,
+        'recurrence_rule': {},
+    }
+
+    recurrence_id = None
+    if 'RECURRENCE-ID' in props:
+        recurrence_id = parse_when(*props['RECURRENCE-ID'][0], zone)[0]
+    elif 'RRULE' in props:
+        try:
+            rule = {'rrule': normalize_rrule(first('RRULE'), zone)}
+            validate_rule(rule, start.astimezone(zone))
+        except ValueError as e:
+            # InvalidRule, or an UNTIL that is not a date
+            raise InvalidEvent(str(e))
+        fields.update(is_recurring=True, recurrence_rule=rule)
+
+    exdates = [
+        parse_when(params, value, zone)[0]
+        for params, values in props.get('EXDATE', [])
+        for value in values.split(',') if value.strip()
+    ]
+
+    return {
+        'uid': uid[:255],
+        'recurrence_id': recurrence_id,
+        'fields': fields,
+        'organizer': mailto(first('ORGANIZER')),
+        'attendees': {email for _, value in props.get('ATTENDEE', []) if (email := mailto(value))},
+        'exdates': exdates,
+    }
+
+
+class MeetingImporter(BaseImporter):
+    """Create or update meetings matched on their organizer and iCalendar UID"""
+
+    kind = 'meetings'
+    label = 'Meetings'
+    extensions = ('.ics',)
+    model = Meeting
+
+    def __init__(self, job=None, chunk_size=1000, organizer=None):
+        super().__init__(job, chunk_size)
+        # Meetings whose organizer is not a user are organized by whoever imports the file
+        self.organizer = organizer or (job.created_by if job else None)
+        # Only command-line imports may organize meetings for the users named in the file
+        self.assign_organizers = job is None
+        # Organizers of the series imported so far, for overrides in later chunks
+        self.series_organizers = {}
+        self.default_zone = ZoneInfo(settings.TIME_ZONE)
+        # Overrides read before their series, retried after the last chunk
+        self.pending = []
+        # Attendees whose weekly rollups are rebuilt once the file is in
+        self.invited_users = set()
+
+    def run(self, fileobj, filename):
+        """Import every VEVENT of the file; returns the run statistics"""
+        self.started_at = timezone.now()
+        started = time.monotonic()
+
+        chunk = []
+        for number, props in iter_events(fileobj):
+            self.stats['processed'] += 1
+            try:
+                chunk.append((number, parse_event(props, self.default_zone)))
+            except InvalidEvent as e:
+                self.add_error(number, str(e))
+            if len(chunk) >= self.chunk_size:
+                self.process_chunk(chunk)
+                self.report(started)
+                chunk = []
+        if chunk:
+            self.process_chunk(chunk)
+
+        self.finish()
+        self.report(started)
+        return self.stats
+
+    def resolve_users(self, events):
+        emails = set()
+        for _, event in events:
+            emails.update(event['attendees'])
+            if event['organizer']:
+                emails.add(event['organizer'])
+        if not emails:
+            return {}
+        return dict(
+            User.objects.annotate(key=Lower('email')).filter(key__in=emails).values_list('key', 'id')
+        )
+
+    def organizer_for(self, event, users, default=None):
+        """User id organizing an event's meeting; ``default`` applies when ORGANIZER is not a user"""
+        organizer_id = (users.get(event['organizer']) or default) if self.assign_organizers else None
+        organizer_id = organizer_id or (self.organizer.id if self.organizer else None)
+        if organizer_id is None:
+            raise InvalidEvent(f"Organizer {event['organizer'] or '(none)'} is not a user")
+        return organizer_id
+
+    def series_organizer(self, event, users):
+        """Organizer of the series an override belongs to, or None when it cannot be told"""
+        if event['uid'] in self.series_organizers:
+            return self.series_organizers[event['uid']]
+        try:
+            return self.organizer_for(event, users)
+        except InvalidEvent:
+            return None
+
+    @staticmethod
+    def with_organizer(user_ids, event, users, organizer_id):
+        # An ORGANIZER who does not organize the meeting here attends it
+        named = users.get(event['organizer'])
+        return user_ids | {named} if named and named != organizer_id else user_ids
+
+    def build(self, meeting, event, organizer_id):
+        for name, value in event['fields'].items():
+            setattr(meeting, name, value)
+        meeting.organizer_id = organizer_id
+        meeting.ical_uid = event['uid']
+        meeting.updated_at = timezone.now()
+        return meeting
+
+    @staticmethod
+    def unchanged(meeting, stored):
+        # bulk_update writes a CASE per field and row, so re-imports only rewrite what changed
+        return stored is not None and all(getattr(meeting, name) == stored[name] for name in STORED_FIELDS)
+
+    def process_chunk(self, chunk):
+        users = self.resolve_users(chunk)
+        # Later VEVENTs win when a UID repeats
+        masters = {event['uid']: (number, event) for number, event in chunk if event['recurrence_id'] is None}
+        overrides = [(number, event) for number, event in chunk if event['recurrence_id'] is not None]
+
+        organizers = {}
+        for uid, (number, event) in list(masters.items()):
+            try:
+                organizers[uid] = self.organizer_for(event, users)
+            except InvalidEvent as e:
+                self.add_error(number, str(e))
+                del masters[uid]
+
+        with transaction.atomic():
+            existing = {
+                (row['organizer_id'], row['ical_uid']): row
+                for row in Meeting.objects.filter(
+                    ical_uid__in=list(masters), organizer_id__in=set(organizers.values()), recurrence_id__isnull=True
+                ).values('id', 'ical_uid', *STORED_FIELDS)
+            }
+            created, updated, unchanged, attendees = [], [], [], {}
+            for uid, (number, event) in masters.items():
+                stored = existing.get((organizers[uid], uid))
+                try:
+                    meeting = self.build(Meeting(id=stored and stored['id']), event, organizers[uid])
+                    meeting.recurrence_end = recurrence_end(meeting)
+                except InvalidEvent as e:
+                    self.add_error(number, str(e))
+                    continue
+                if not meeting.id:
+                    created.append(meeting)
+                elif self.unchanged(meeting, stored):
+                    unchanged.append(meeting)
+                else:
+                    updated.append(meeting)
+                if meeting.is_recurring:
+                    self.series_organizers[uid] = meeting.organizer_id
+                invited = {users[email] for email in event['attendees'] if email in users}
+                attendees[uid] = self.with_organizer(invited, event, users, meeting.organizer_id)
+
+            Meeting.objects.bulk_create(created, batch_size=500)
+            Meeting.objects.bulk_update(updated, [*IMPORT_FIELDS, 'ical_uid', 'updated_at'], batch_size=500)
+            meetings = {meeting.ical_uid: meeting for meeting in created + updated + unchanged}
+            self.add_attendees([(meetings[uid].id, user_ids) for uid, user_ids in attendees.items() if uid in meetings])
+
+            # EXDATEs cancel single occurrences of the series read in this chunk
+            for uid, (number, event) in masters.items():
+                if uid in meetings and meetings[uid].is_recurring:
+                    overrides.extend(
+                        (number, {**event, 'recurrence_id': exdate, 'exdate': True}) for exdate in event['exdates']
+                    )
+            self.write_overrides(overrides, users, meetings, attendees)
+
+        self.stats['created'] += len(created)
+        self.stats['updated'] += len(updated)
+        # Attendees may have been added to unchanged meetings, so those are planned too
+        self.plan(meetings.values())
+
+    def add_attendees(self, pairs):
+        pairs = [(meeting_id, user_id) for meeting_id, user_ids in pairs for user_id in user_ids]
+        Attendee = Meeting.attendees.through
+        Attendee.objects.bulk_create(
+            [Attendee(meeting_id=meeting_id, user_id=user_id) for meeting_id, user_id in pairs],
+            batch_size=2000, ignore_conflicts=True
+        )
+        # What the attendees signal does for each meeting, with one rollup rebuild at the end
+        invite(pairs, refresh=False)
+        self.invited_users.update(user_id for _, user_id in pairs)
+
+    def write_overrides(self, overrides, users, series=None, series_attendees=None, final=False):
+        """Create or update the rows replacing occurrences; overrides of unknown series wait for ``finish``"""
+        if not overrides:
+            return
+        series = dict(series or {})
+        # Series from earlier chunks or imports, looked up under their organizer
+        keys = {
+            index: (self.series_organizer(event, users), event['uid'])
+            for index, (_, event) in enumerate(overrides) if event['uid'] not in series
+        }
+        missing = {key for key in keys.values() if key[0] is not None}
+        stored_series = {}
+        if missing:
+            for meeting in Meeting.objects.filter(
+                ical_uid__in={uid for _, uid in missing}, organizer_id__in={organizer_id for organizer_id, _ in missing},
+                recurrence_id__isnull=True, is_recurring=True,
+            ):
+                stored_series[(meeting.organizer_id, meeting.ical_uid)] = meeting
+
+        resolved = []
+        for index, (number, event) in enumerate(overrides):
+            parent = series.get(event['uid']) or stored_series.get(keys.get(index))
+            if parent is None or not parent.is_recurring:
+                if final:
+                    self.add_error(number, f"No recurring meeting with UID {event['uid']} for RECURRENCE-ID")
+                else:
+                    self.pending.append((number, event))
+                continue
+            resolved.append((number, event, parent))
+        if not resolved:
+            return
+
+        existing = {
+            (row['parent_meeting_id'], row['recurrence_id']): row
+            for row in Meeting.objects.filter(
+                parent_meeting_id__in={parent.id for _, _, parent in resolved},
+                recurrence_id__in={event['recurrence_id'] for _, event, _ in resolved},
+            ).values('id', 'parent_meeting_id', 'recurrence_id', *STORED_FIELDS)
+        }
+
+        created, updated, unchanged, attendee_pairs, copy_attendees = [], [], [], [], []
+        for number, event, parent in resolved:
+            stored = existing.get((parent.id, event['recurrence_id']))
+            meeting = Meeting(id=stored and stored['id'])
+            # Overrides without an ORGANIZER keep the one of their series
+            self.build(meeting, event, self.organizer_for(event, users, default=parent.organizer_id))
+            meeting.parent_meeting_id = parent.id
+            meeting.recurrence_id = event['recurrence_id']
+            meeting.is_recurring = False
+            meeting.recurrence_rule = {}
+            # Not from Meeting.save: the parent is known here without a query
+            meeting.recurrence_end = meeting.recurrence_id + (parent.end_time - parent.start_time)
+            if event.get('exdate'):
+                meeting.start_time = meeting.recurrence_id
+                meeting.end_time = meeting.recurrence_end
+                meeting.status = 'cancelled'
+            if not meeting.id:
+                created.append(meeting)
+            elif self.unchanged(meeting, stored):
+                unchanged.append(meeting)
+            else:
+                updated.append(meeting)
+
+            invited = {users[email] for email in event['attendees'] if email in users}
+            if event.get('exdate') or not invited:
+                # Overrides must reach everyone the series does, or their calendars keep the occurrence
+                copy_attendees.append((meeting, parent))
+            else:
+                attendee_pairs.append((meeting, self.with_organizer(invited, event, users, meeting.organizer_id)))
+
+        Meeting.objects.bulk_create(created, batch_size=500)
+        Meeting.objects.bulk_update(
+            updated, [*IMPORT_FIELDS, 'ical_uid', 'parent_meeting', 'recurrence_id', 'updated_at'], batch_size=500
+        )
+
+        pairs = [(meeting.id, user_ids) for meeting, user_ids in attendee_pairs]
+        if copy_attendees:
+            known = {
+                parent.id: attendees
+                for parent in {parent for _, parent in copy_attendees}
+                if (attendees := (series_attendees or {}).get(parent.ical_uid)) is not None
+            }
+            unknown = {parent.id for _, parent in copy_attendees} - set(known)
+            for meeting_id, user_id in Meeting.attendees.through.objects.filter(
+                meeting_id__in=unknown
+            ).values_list('meeting_id', 'user_id'):
+                known.setdefault(meeting_id, set()).add(user_id)
+            pairs.extend((meeting.id, known.get(parent.id, set())) for meeting, parent in copy_attendees)
+        self.add_attendees(pairs)
+
+        self.stats['created'] += len(created)
+        self.stats['updated'] += len(updated)
+        self.plan(created + updated + unchanged)
+
+    def plan(self, meetings):
+        # Signals do not fire for bulk writes. Meetings already over get no reminders,
+        # so historical imports skip planning altogether
+        now = timezone.now()
+        meeting_ids = [meeting.id for meeting in meetings if meeting.is_recurring or meeting.end_time > now]
+        if meeting_ids:
+            plan_reminders(meeting_ids)
+
+    def finish(self):
+        pending, self.pending = self.pending, []
+        for offset in range(0, len(pending), self.chunk_size):
+            batch = pending[offset:offset + self.chunk_size]
+            with transaction.atomic():
+                self.write_overrides(batch, self.resolve_users(batch), final=True)
+        rebuild_rollups(self.invited_users)
@@ -0,0 +1,105 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Q
+from django.core.management.base import BaseCommand
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from meetings.models import Meeting, MeetingAttendance, MeetingReminder
+from meetings.serializers import MeetingSerializer
+from meetings.views import MeetingViewSet
+
+User = get_user_model()
+
+
+class LegacyMeetingViewSet(MeetingViewSet):
+    """The list as served before the slim serializer: full nesting, join plus DISTINCT"""
+
+    def get_queryset(self):
+        return Meeting.objects.select_related(
+            'organizer', 'category', 'case', 'contact', 'company'
+        ).prefetch_related(
+            'attendees', 'attendances__user', 'reminders__user'
+        ).filter(
+            Q(organizer=self.request.user) | Q(attendees=self.request.user) | Q(is_private=False)
+        ).distinct()
+
+    def get_serializer_class(self):
+        return MeetingSerializer
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the meeting list endpoint against generated meetings (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meetings', type=int, default=10000, help='Number of meetings to generate')
+        parser.add_argument('--users', type=int, default=200, help='Number of users to generate')
+        parser.add_argument('--attendees', type=int, default=8, help='Attendees per meeting')
+        parser.add_argument('--pages', type=int, default=20, help='List pages requested per variant')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            viewer = self.generate(options)
+            for name, viewset in (('legacy', LegacyMeetingViewSet), ('slim', MeetingViewSet)):
+                elapsed, queries, visible = self.measure(viewset, viewer, options['pages'])
+                self.stdout.write(
+                    f"{name:>6}: {elapsed / options['pages'] * 1000:.1f}ms per page, "
+                    f"{queries / options['pages']:.0f} queries per page, {visible} meetings visible"
+                )
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('Benchmark data rolled back'))
+
+    def generate(self, options):
+        password = make_password(None)
+        users = User.objects.bulk_create([
+            User(email=f"meeting-benchmark-{i}@example.com", password=password, role='agent')
+            for i in range(options['users'])
+        ])
+        now = timezone.now()
+        meetings = Meeting.objects.bulk_create([
+            Meeting(
+                title=f"Benchmark meeting {i}",
+                organizer=users[i % len(users)],
+                start_time=now + timedelta(hours=i - options['meetings'] // 2),
+                end_time=now + timedelta(hours=i - options['meetings'] // 2, minutes=30),
+                is_private=i % 3 == 0,
+            )
+            for i in range(options['meetings'])
+        ], batch_size=1000)
+        attending = [
+            (meeting, users[(i + offset) % len(users)])
+            for i, meeting in enumerate(meetings)
+            for offset in range(1, min(options['attendees'], len(users) - 1) + 1)
+        ]
+        Attendee = Meeting.attendees.through
+        Attendee.objects.bulk_create([Attendee(meeting=meeting, user=user) for meeting, user in attending], batch_size=5000)
+        # What planning and RSVPs leave behind for every attendee
+        MeetingAttendance.objects.bulk_create([
+            MeetingAttendance(meeting=meeting, user=user, status='invited') for meeting, user in attending
+        ], batch_size=5000)
+        MeetingReminder.objects.bulk_create([
+            MeetingReminder(
+                meeting=meeting, user=user, reminder_type='email',
+                scheduled_for=meeting.start_time - timedelta(minutes=15), occurrence_start=meeting.start_time,
+            )
+            for meeting, user in attending
+        ], batch_size=5000)
+        # Not staff, so the visibility filter applies
+        return users[0]
+
+    def measure(self, viewset, viewer, pages):
+        factory = APIRequestFactory()
+        view = viewset.as_view({'get': 'list'})
+        started = time.monotonic()
+        with CaptureQueriesContext(connection) as queries:
+            for page in range(1, pages + 1):
+                request = factory.get('/api/meetings/', {'page': page})
+                force_authenticate(request, user=viewer)
+                response = view(request)
+                response.render()
+        return time.monotonic() - started, len(queries), response.data['count']
@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from contacts.importer import ImportFileError
+from meetings.ics_import import MeetingImporter
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Import meetings from an iCalendar (.ics) file; re-importing updates meetings matched on UID'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to an .ics file')
+        parser.add_argument('--organizer', help='Email of the user organizing events whose organizer is not a user')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Events written per batch')
+
+    def handle(self, *args, **options):
+        organizer = None
+        if options['organizer']:
+            organizer = User.objects.filter(email__iexact=options['organizer']).first()
+            if organizer is None:
+                raise CommandError(f"No user with email {options['organizer']}")
+
+        importer = MeetingImporter(chunk_size=options['chunk_size'], organizer=organizer)
+
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                stats = importer.run(fileobj, options['path'])
+        except (OSError, ImportFileError) as e:
+            raise CommandError(str(e))
+
+        for error in importer.errors[:20]:
+            self.stdout.write(self.style.WARNING(f"Line {error['row']}: {error['error']}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {stats['processed']} events: {stats['created']} created, {stats['updated']} updated, "
+            f"{stats['errors']} errors ({stats['rows_per_second']} events/s)"
+        ))
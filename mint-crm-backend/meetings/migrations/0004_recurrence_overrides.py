@@ -0,0 +1,35 @@
+# Generated by Django 5.0.2 on 2026-10-19 02:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0002_initial'),
+        ('contacts', '0008_company_hierarchy'),
+        ('meetings', '0003_meetingreminder_meetingtemplate_meeting_agenda_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meeting',
+            name='recurrence_end',
+            field=models.DateTimeField(blank=True, editable=False, help_text='End of the last occurrence; empty for series without an end', null=True),
+        ),
+        migrations.AddField(
+            model_name='meeting',
+            name='recurrence_id',
+            field=models.DateTimeField(blank=True, help_text='Original start of the series occurrence this meeting replaces', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='meeting',
+            index=models.Index(fields=['is_recurring', 'start_time', 'recurrence_end'], name='meetings_me_is_recu_1070c0_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='meeting',
+            constraint=models.UniqueConstraint(condition=models.Q(('recurrence_id__isnull', False)), fields=('parent_meeting', 'recurrence_id'), name='meeting_unique_occurrence_override'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.2 on 2026-10-19 02:17
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+import meetings.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0002_initial'),
+        ('contacts', '0008_company_hierarchy'),
+        ('meetings', '0004_recurrence_overrides'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='meeting',
+            name='recurrence_end',
+            field=models.DateTimeField(blank=True, editable=False, help_text='End of the last occurrence of a series (empty when it never ends), or of the occurrence an override replaces', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='meeting',
+            index=models.Index(condition=models.Q(('recurrence_id__isnull', False)), fields=['recurrence_id', 'recurrence_end'], name='meeting_override_range'),
+        ),
+        migrations.AddIndex(
+            model_name='meeting',
+            index=django.contrib.postgres.indexes.GistIndex(meetings.models.TsTzRange('start_time', django.db.models.functions.comparison.Greatest('start_time', 'end_time')), name='meeting_time_range_gist'),
+        ),
+    ]
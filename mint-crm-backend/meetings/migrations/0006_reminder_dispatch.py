@@ -0,0 +1,28 @@
+# Generated by Django 5.0.2 on 2026-10-19 02:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meetings', '0005_calendar_range_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meetingreminder',
+            name='occurrence_start',
+            field=models.DateTimeField(blank=True, help_text='Start of the meeting or recurring occurrence the reminder is for', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='meetingreminder',
+            index=models.Index(fields=['is_sent', 'scheduled_for'], name='meetings_me_is_sent_7abd10_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='meetingreminder',
+            constraint=models.UniqueConstraint(fields=('meeting', 'user', 'reminder_type', 'occurrence_start'), name='meeting_reminder_unique_occurrence'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.2 on 2026-10-19 02:35
+
+import secrets
+
+from django.db import migrations, models
+
+
+def issue_feed_tokens(apps, schema_editor):
+    # Existing iCal integrations get their feed URL right away
+    CalendarIntegration = apps.get_model('meetings', 'CalendarIntegration')
+    for integration in CalendarIntegration.objects.filter(provider='ical', feed_token__isnull=True):
+        integration.feed_token = secrets.token_urlsafe(32)
+        integration.save(update_fields=['feed_token'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meetings', '0006_reminder_dispatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendarintegration',
+            name='feed_token',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(issue_feed_tokens, migrations.RunPython.noop),
+    ]
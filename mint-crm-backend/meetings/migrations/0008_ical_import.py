@@ -0,0 +1,22 @@
+# Generated by Django 5.0.2 on 2026-10-19 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meetings', '0007_calendar_feed_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meeting',
+            name='ical_uid',
+            field=models.CharField(blank=True, help_text='iCalendar UID of an imported meeting', max_length=255),
+        ),
+        migrations.AddConstraint(
+            model_name='meeting',
+            constraint=models.UniqueConstraint(condition=models.Q(('recurrence_id__isnull', True), models.Q(('ical_uid', ''), _negated=True)), fields=('ical_uid',), name='meeting_unique_ical_uid'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.2 on 2026-10-19 02:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meetings', '0008_ical_import'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MeetingWeeklyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_start', models.DateField(help_text='Monday of the week, in the server time zone')),
+                ('meeting_type', models.CharField(choices=[('internal', 'Internal Meeting'), ('client', 'Client Meeting'), ('sales', 'Sales Meeting'), ('support', 'Support Meeting'), ('training', 'Training'), ('review', 'Review Meeting'), ('other', 'Other')], max_length=20)),
+                ('invited', models.PositiveIntegerField(default=0, help_text='Attendances not declined')),
+                ('attended', models.PositiveIntegerField(default=0)),
+                ('no_shows', models.PositiveIntegerField(default=0)),
+                ('minutes', models.PositiveIntegerField(default=0, help_text='Minutes spent in attended meetings')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='meetings.meetingcategory')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meeting_weekly_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Meeting Weekly Stats',
+                'verbose_name_plural': 'Meeting Weekly Stats',
+                'indexes': [models.Index(fields=['user', 'week_start'], name='meetings_me_user_id_d37295_idx'), models.Index(fields=['week_start'], name='meetings_me_week_st_924f91_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.2 on 2026-10-19 03:05
+
+from django.db import migrations
+
+
+def invite_existing_attendees(apps, schema_editor):
+    # Attendees added before attendance rows were kept for every attendee get an invited row
+    Meeting = apps.get_model('meetings', 'Meeting')
+    MeetingAttendance = apps.get_model('meetings', 'MeetingAttendance')
+    Attendee = Meeting.attendees.through
+
+    last_id = 0
+    while True:
+        rows = list(
+            Attendee.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'meeting_id', 'user_id')[:5000]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        MeetingAttendance.objects.bulk_create(
+            [MeetingAttendance(meeting_id=meeting_id, user_id=user_id, status='invited') for _, meeting_id, user_id in rows],
+            ignore_conflicts=True
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meetings', '0009_meeting_weekly_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(invite_existing_attendees, migrations.RunPython.noop),
+    ]
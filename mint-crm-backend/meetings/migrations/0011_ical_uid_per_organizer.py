@@ -0,0 +1,21 @@
+# Generated by Django 5.0.2 on 2026-10-19 03:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meetings', '0010_attendance_backfill'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='meeting',
+            name='meeting_unique_ical_uid',
+        ),
+        migrations.AddConstraint(
+            model_name='meeting',
+            constraint=models.UniqueConstraint(condition=models.Q(('recurrence_id__isnull', True), models.Q(('ical_uid', ''), _negated=True)), fields=('organizer', 'ical_uid'), name='meeting_unique_organizer_ical_uid'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.2 on 2026-10-19 03:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meetings', '0011_ical_uid_per_organizer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meetingreminder',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Failed delivery attempts'),
+        ),
+        migrations.AddField(
+            model_name='meetingreminder',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.2 on 2026-10-19 03:46
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def drop_duplicate_rollups(apps, schema_editor):
+    # Concurrent refreshes could insert a key twice; both copies hold the same recomputed counts
+    MeetingWeeklyStats = apps.get_model('meetings', 'MeetingWeeklyStats')
+    duplicates = (
+        MeetingWeeklyStats.objects.order_by()
+        .values('user_id', 'week_start', 'meeting_type', 'category_id')
+        .annotate(rows=Count('id'), keep=Min('id'))
+        .filter(rows__gt=1)
+    )
+    for row in duplicates:
+        MeetingWeeklyStats.objects.filter(
+            user_id=row['user_id'], week_start=row['week_start'], meeting_type=row['meeting_type'],
+            category_id=row['category_id'],
+        ).exclude(id=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meetings', '0012_reminder_attempts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_rollups, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='meetingweeklystats',
+            constraint=models.UniqueConstraint(fields=('user', 'week_start', 'meeting_type', 'category'), name='meeting_weekly_stats_unique_key', nulls_distinct=False),
+        ),
+    ]
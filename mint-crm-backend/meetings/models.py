@@ -1,10 +1,28 @@
 from django.db import models
+from django.db.models.functions import Greatest
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.fields import DateTimeRangeField
+from django.contrib.postgres.indexes import GistIndex
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
+import secrets
 
 User = get_user_model()
 
+RECURRENCE_SOURCE_FIELDS = {
+    'start_time', 'end_time', 'timezone', 'is_recurring', 'recurrence_rule', 'parent_meeting', 'parent_meeting_id',
+    'recurrence_id',
+}
+
+class TsTzRange(models.Func):
+    function = 'TSTZRANGE'
+    output_field = DateTimeRangeField()
+
+def time_range():
+    """The meeting's [start, end) range; matches the GiST index expression"""
+    # Greatest() keeps rows saved with end before start from breaking the index
+    return TsTzRange('start_time', Greatest('start_time', 'end_time'))
+
 class MeetingCategory(models.Model):
     """Meeting categories for organization"""
     
@@ -87,6 +105,9 @@ class Meeting(models.Model):
     is_recurring = models.BooleanField(default=False)
     recurrence_rule = models.JSONField(default=dict, blank=True, help_text="RRULE format for recurring meetings")
     parent_meeting = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='recurring_instances')
+    recurrence_id = models.DateTimeField(null=True, blank=True, help_text="Original start of the series occurrence this meeting replaces")
+    recurrence_end = models.DateTimeField(null=True, blank=True, editable=False, help_text="End of the last occurrence of a series (empty when it never ends), or of the occurrence an override replaces")
+    ical_uid = models.CharField(max_length=255, blank=True, help_text="iCalendar UID of an imported meeting")
     
     # Reminders and Notifications
     reminder_minutes = models.PositiveIntegerField(default=15, help_text="Minutes before meeting to send reminder")
@@ -114,11 +135,49 @@ class Meeting(models.Model):
             models.Index(fields=['meeting_type', 'start_time']),
             models.Index(fields=['case', 'start_time']),
             models.Index(fields=['contact', 'start_time']),
+            models.Index(fields=['is_recurring', 'start_time', 'recurrence_end']),
+            models.Index(
+                fields=['recurrence_id', 'recurrence_end'],
+                condition=models.Q(recurrence_id__isnull=False),
+                name='meeting_override_range'
+            ),
+            GistIndex(time_range(), name='meeting_time_range_gist'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['parent_meeting', 'recurrence_id'],
+                condition=models.Q(recurrence_id__isnull=False),
+                name='meeting_unique_occurrence_override'
+            ),
+            # Re-importing a calendar updates its organizer's meetings; overrides share the UID of their series
+            models.UniqueConstraint(
+                fields=['organizer', 'ical_uid'],
+                condition=models.Q(recurrence_id__isnull=True) & ~models.Q(ical_uid=''),
+                name='meeting_unique_organizer_ical_uid'
+            ),
         ]
     
     def __str__(self):
         return f"{self.title} - {self.start_time.strftime('%Y-%m-%d %H:%M')}"
     
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        sync_recurrence = update_fields is None or bool(RECURRENCE_SOURCE_FIELDS & set(update_fields))
+        if sync_recurrence:
+            from .recurrence import recurrence_end
+            
+            # Stored so calendar queries can skip series that ended before the window
+            # and find the overrides whose original occurrence falls in it
+            self.recurrence_end = recurrence_end(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'recurrence_end'}
+        super().save(*args, **kwargs)
+        
+        if sync_recurrence and self.is_recurring and self.parent_meeting_id is None:
+            self.recurring_instances.filter(recurrence_id__isnull=False).update(
+                recurrence_end=models.F('recurrence_id') + (self.end_time - self.start_time)
+            )
+    
     @property
     def duration_minutes(self):
         """Calculate meeting duration in minutes"""
@@ -183,6 +242,44 @@ class MeetingAttendance(models.Model):
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.meeting.title} ({self.get_status_display()})"
 
+class MeetingWeeklyStats(models.Model):
+    """Materialized per-user, per-week rollup of meeting attendance.
+    
+    One row per user, week, meeting type and category, recomputed from the
+    attendances by ``meetings.analytics``; see there for what is counted.
+    """
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='meeting_weekly_stats')
+    week_start = models.DateField(help_text="Monday of the week, in the server time zone")
+    meeting_type = models.CharField(max_length=20, choices=Meeting.MEETING_TYPE_CHOICES)
+    category = models.ForeignKey(MeetingCategory, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    
+    invited = models.PositiveIntegerField(default=0, help_text="Attendances not declined")
+    attended = models.PositiveIntegerField(default=0)
+    no_shows = models.PositiveIntegerField(default=0)
+    minutes = models.PositiveIntegerField(default=0, help_text="Minutes spent in attended meetings")
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Meeting Weekly Stats"
+        verbose_name_plural = "Meeting Weekly Stats"
+        indexes = [
+            # A user's weeks, and everyone's weeks for team dashboards
+            models.Index(fields=['user', 'week_start']),
+            models.Index(fields=['week_start']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'week_start', 'meeting_type', 'category'],
+                nulls_distinct=False,
+                name='meeting_weekly_stats_unique_key'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} {self.week_start} {self.meeting_type}: {self.attended} attended, {self.minutes} min"
+    
 class MeetingReminder(models.Model):
     """Model for tracking meeting reminders"""
     
@@ -197,14 +294,27 @@ class MeetingReminder(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='meeting_reminders')
     reminder_type = models.CharField(max_length=20, choices=REMINDER_TYPE_CHOICES)
     scheduled_for = models.DateTimeField()
+    occurrence_start = models.DateTimeField(null=True, blank=True, help_text="Start of the meeting or recurring occurrence the reminder is for")
     sent_at = models.DateTimeField(null=True, blank=True)
     is_sent = models.BooleanField(default=False)
+    attempts = models.PositiveSmallIntegerField(default=0, help_text="Failed delivery attempts")
+    last_error = models.TextField(blank=True)
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['scheduled_for']
+        indexes = [
+            # The dispatcher claims the oldest unsent reminders that are due
+            models.Index(fields=['is_sent', 'scheduled_for']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['meeting', 'user', 'reminder_type', 'occurrence_start'],
+                name='meeting_reminder_unique_occurrence'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.meeting.title} - {self.user.get_full_name()} ({self.get_reminder_type_display()})"
@@ -266,6 +376,9 @@ class CalendarIntegration(models.Model):
     api_secret = models.CharField(max_length=500, blank=True)
     refresh_token = models.CharField(max_length=500, blank=True)
     
+    # Secret of the iCalendar feed URL (ical provider)
+    feed_token = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+    
     # Sync settings
     last_sync = models.DateTimeField(null=True, blank=True)
     sync_errors = models.JSONField(default=list, blank=True)
@@ -279,4 +392,14 @@ class CalendarIntegration(models.Model):
         verbose_name_plural = "Calendar Integrations"
     
     def __str__(self):
-        return f"{self.user.get_full_name()} - {self.get_provider_display()}" 
\ No newline at end of file
+        return f"{self.user.get_full_name()} - {self.get_provider_display()}"
+    
+    def save(self, *args, **kwargs):
+        if self.provider == 'ical' and not self.feed_token:
+            self.feed_token = secrets.token_urlsafe(32)
+        super().save(*args, **kwargs)
+    
+    def rotate_feed_token(self):
+        """Issue a new feed URL; the old one stops working"""
+        self.feed_token = secrets.token_urlsafe(32)
+        self.save(update_fields=['feed_token', 'updated_at'])
@@ -0,0 +1,387 @@
+"""Expansion of recurring meetings into occurrences.
+
+A series is one ``Meeting`` row with ``is_recurring`` set and its rule in
+``recurrence_rule``, either as an RRULE string (``{"rrule": "FREQ=WEEKLY;BYDAY=MO"}``)
+or as rrule arguments (``{"freq": "weekly", "interval": 2, "until": "2025-12-31"}``).
+Occurrences are generated with dateutil only for the requested window and are
+never stored. An occurrence that was moved, edited or cancelled is a child
+``Meeting`` row with ``parent_meeting`` set to the series and ``recurrence_id``
+set to the original start of the occurrence it replaces.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from datetime import timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from dateutil import rrule as rr
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Meeting
+
+logger = logging.getLogger(__name__)
+
+FREQUENCIES = {
+    'yearly': rr.YEARLY,
+    'monthly': rr.MONTHLY,
+    'weekly': rr.WEEKLY,
+    'daily': rr.DAILY,
+}
+
+WEEKDAYS = {'MO': rr.MO, 'TU': rr.TU, 'WE': rr.WE, 'TH': rr.TH, 'FR': rr.FR, 'SA': rr.SA, 'SU': rr.SU}
+
+RULE_OPTIONS = {'freq', 'interval', 'count', 'until', 'byweekday', 'bymonthday', 'bymonth', 'bysetpos'}
+
+# COUNT and UNTIL of new rules are bounded so the end of a series can be computed when it is saved
+MAX_COUNT = 1000
+MAX_UNTIL_YEARS = 100
+
+# Fields a series does not pass on to the rows overriding its occurrences
+SERIES_ONLY_FIELDS = {
+    'id', 'is_recurring', 'recurrence_rule', 'recurrence_end', 'parent_meeting',
+    'recurrence_id', 'created_at', 'updated_at',
+}
+
+
+class InvalidRule(ValueError):
+    """The recurrence rule cannot be understood"""
+
+
+class InvalidWindow(ValueError):
+    """The requested time window is missing, malformed or too long"""
+
+
+@dataclass
+class Occurrence:
+    """One occurrence of a series, or a meeting that replaces it"""
+
+    meeting: Meeting
+    start: datetime
+    end: datetime
+    series_id: int = None
+    recurrence_id: datetime = None
+
+    @property
+    def is_override(self):
+        return self.meeting.parent_meeting_id is not None
+
+
+def zone_named(name):
+    """Zone of a stored ``timezone`` value; UTC when blank or unknown"""
+    try:
+        return ZoneInfo(name or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        return dt_timezone.utc
+
+
+def meeting_zone(meeting):
+    return zone_named(meeting.timezone)
+
+
+def _local_datetime(value, tz, end_of_day=False):
+    """``until`` values: dates and naive datetimes are wall-clock times in ``tz``"""
+    if isinstance(value, str):
+        # Dates first: parse_datetime reads a bare date as midnight, losing end_of_day
+        parsed = parse_date(value)
+        if parsed is None:
+            parsed = parse_datetime(value)
+        if parsed is None:
+            raise InvalidRule(f"'{value}' is not a date or datetime")
+        value = parsed
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, time.max if end_of_day else time.min)
+    if timezone.is_naive(value):
+        return value.replace(tzinfo=tz)
+    return value.astimezone(tz)
+
+
+def _rrule_from_string(text, dtstart):
+    parts = {}
+    for part in text.upper().removeprefix('RRULE:').split(';'):
+        name, _, value = part.partition('=')
+        parts[name.strip()] = value.strip()
+    if parts.get('FREQ', '').lower() not in FREQUENCIES:
+        raise InvalidRule('FREQ must be one of ' + ', '.join(name.upper() for name in FREQUENCIES))
+    if 'COUNT' in parts and not (parts['COUNT'].isdigit() and 0 < int(parts['COUNT']) <= MAX_COUNT):
+        raise InvalidRule(f'COUNT must be between 1 and {MAX_COUNT}')
+    try:
+        rule = rr.rrulestr(text, dtstart=dtstart)
+    except (ValueError, TypeError) as e:
+        raise InvalidRule(f'Invalid RRULE: {e}')
+    if not isinstance(rule, rr.rrule):
+        # EXDATE/RDATE lines: exceptions are stored as overriding meetings instead
+        raise InvalidRule('Only a single RRULE is supported')
+    return rule
+
+
+def _rrule_from_options(options, dtstart):
+    unknown = set(options) - RULE_OPTIONS
+    if unknown:
+        raise InvalidRule(f"Unknown recurrence options: {', '.join(sorted(unknown))}")
+    freq = FREQUENCIES.get(str(options.get('freq', '')).lower())
+    if freq is None:
+        raise InvalidRule('freq must be one of ' + ', '.join(FREQUENCIES))
+
+    kwargs = {'dtstart': dtstart}
+    try:
+        kwargs['interval'] = int(options.get('interval') or 1)
+        if options.get('count') is not None:
+            kwargs['count'] = int(options['count'])
+            if not 0 < kwargs['count'] <= MAX_COUNT:
+                raise InvalidRule(f'count must be between 1 and {MAX_COUNT}')
+        if options.get('until'):
+            kwargs['until'] = _local_datetime(options['until'], dtstart.tzinfo, end_of_day=True)
+        if options.get('byweekday') is not None:
+            days = options['byweekday']
+            days = [days] if isinstance(days, (str, int)) else days
+            kwargs['byweekday'] = [WEEKDAYS[day.upper()[:2]] if isinstance(day, str) else int(day) for day in days]
+        for name in ('bymonthday', 'bymonth', 'bysetpos'):
+            if options.get(name) is not None:
+                kwargs[name] = options[name]
+        if kwargs['interval'] < 1:
+            raise InvalidRule('interval must be at least 1')
+        return rr.rrule(freq, **kwargs)
+    except (KeyError, ValueError, TypeError) as e:
+        if isinstance(e, InvalidRule):
+            raise
+        raise InvalidRule(f'Invalid recurrence options: {e}')
+
+
+def parse_rule(rule, dtstart):
+    """dateutil rule for a ``recurrence_rule`` value starting at ``dtstart``"""
+    if isinstance(rule, str):
+        rule = {'rrule': rule}
+    if not isinstance(rule, dict) or not rule:
+        raise InvalidRule('The recurrence rule must be an RRULE string or an object of rrule options')
+    if 'rrule' in rule:
+        if set(rule) != {'rrule'} or not isinstance(rule['rrule'], str):
+            raise InvalidRule("'rrule' cannot be combined with other options")
+        return _rrule_from_string(rule['rrule'], dtstart)
+    return _rrule_from_options(rule, dtstart)
+
+
+def validate_rule(rule, dtstart):
+    """``parse_rule`` for rules being stored, which must end within MAX_UNTIL_YEARS of their start"""
+    parsed = parse_rule(rule, dtstart)
+    if parsed._until is not None and parsed._until - dtstart > timedelta(days=366 * MAX_UNTIL_YEARS):
+        raise InvalidRule(f'The rule must end within {MAX_UNTIL_YEARS} years of its start')
+    return parsed
+
+
+def build_rule(meeting):
+    """Rule of a series, generating wall-clock times in the meeting's time zone"""
+    return parse_rule(meeting.recurrence_rule, meeting.start_time.astimezone(meeting_zone(meeting)))
+
+
+def is_series(meeting):
+    return meeting.is_recurring and meeting.parent_meeting_id is None and bool(meeting.recurrence_rule)
+
+
+def series_end(meeting):
+    """End of the last occurrence, or None when the series repeats forever"""
+    rule = build_rule(meeting)
+    if rule._count is None and rule._until is None:
+        return None
+    if rule._count is not None:
+        # At most MAX_COUNT occurrences
+        last = None
+        for last in rule:
+            pass
+    else:
+        # Stepping from the first occurrence would cost one step per occurrence up to UNTIL
+        last = _fast_forward(rule, rule._until).before(rule._until, inc=True)
+    if last is None:
+        return meeting.end_time
+    return last.astimezone(dt_timezone.utc) + (meeting.end_time - meeting.start_time)
+
+
+def recurrence_end(meeting):
+    """Value of ``Meeting.recurrence_end``: see the field's help text"""
+    try:
+        if is_series(meeting):
+            return series_end(meeting)
+    except InvalidRule:
+        return None
+    if meeting.parent_meeting_id and meeting.recurrence_id:
+        series = meeting.parent_meeting
+        return meeting.recurrence_id + (series.end_time - series.start_time)
+    return None
+
+
+def _fast_forward(rule, until):
+    """Move the start of a daily or weekly rule to the last period boundary before ``until``.
+
+    dateutil walks a rule from its first occurrence, so a years-old daily series
+    would otherwise be stepped through day by day for every window. Rules with
+    COUNT cannot be moved because the count runs from the first occurrence.
+    """
+    if rule._count is not None or rule._freq not in (rr.DAILY, rr.WEEKLY):
+        return rule
+    dtstart = rule._dtstart
+    period = timedelta(days=rule._interval * (7 if rule._freq == rr.WEEKLY else 1))
+    periods = (until - dtstart) // period
+    if periods <= 1:
+        return rule
+    # Aware arithmetic keeps the wall-clock time across DST changes
+    return rule.replace(dtstart=dtstart + period * (periods - 1))
+
+
+def occurrence_starts(meeting, window_start, window_end):
+    """Starts of the occurrences overlapping the window, capped at MEETING_OCCURRENCE_LIMIT"""
+    try:
+        rule = build_rule(meeting)
+    except InvalidRule as e:
+        logger.warning(f"Meeting {meeting.id} has an invalid recurrence rule: {e}")
+        return []
+
+    duration = meeting.end_time - meeting.start_time
+    after = window_start - duration
+    if after < meeting.start_time:
+        after = meeting.start_time - timedelta(microseconds=1)
+    rule = _fast_forward(rule, after)
+
+    starts = []
+    for start in rule.xafter(after, inc=False):
+        if start >= window_end or len(starts) >= settings.MEETING_OCCURRENCE_LIMIT:
+            break
+        starts.append(start.astimezone(dt_timezone.utc))
+    return starts
+
+
+def _cache_key(meeting, window_start, window_end):
+    # updated_at is part of the key, so saving the series invalidates its expansions
+    return 'meetings:occurrences:{}:{}:{}:{}'.format(
+        meeting.id, meeting.updated_at.timestamp(), window_start.timestamp(), window_end.timestamp()
+    )
+
+
+def cached_occurrence_starts(series, window_start, window_end):
+    """``{series id: [starts]}`` for saved series, expanded at most once per (series, window)"""
+    keys = {_cache_key(meeting, window_start, window_end): meeting for meeting in series}
+    found = cache.get_many(list(keys))
+    missing = {}
+    for key, meeting in keys.items():
+        if key not in found:
+            missing[key] = occurrence_starts(meeting, window_start, window_end)
+    if missing:
+        cache.set_many(missing, timeout=settings.MEETING_OCCURRENCE_CACHE_TIMEOUT)
+    found.update(missing)
+    return {meeting.id: found[key] for key, meeting in keys.items()}
+
+
+def series_in_window(window_start, window_end):
+    """Series that may have occurrences in the window"""
+    return Q(is_recurring=True, parent_meeting__isnull=True, start_time__lt=window_end) & (
+        Q(recurrence_end__isnull=True) | Q(recurrence_end__gt=window_start)
+    )
+
+
+def overlapping_overrides(window_start, window_end):
+    """Overrides shown in the window or replacing an occurrence that was in it"""
+    return Q(recurrence_id__isnull=False) & (
+        Q(recurrence_id__lt=window_end, recurrence_end__gt=window_start) |
+        Q(start_time__lt=window_end, end_time__gt=window_start)
+    )
+
+
+def expand(series, window_start, window_end, overrides=None):
+    """Occurrences of ``series`` overlapping the window, with their overrides applied.
+
+    ``overrides`` are the rows matching ``overlapping_overrides`` for the window
+    when the caller already fetched them; otherwise they are fetched for all of
+    ``series`` with one query. Cancelled overrides remove their occurrence; the
+    others replace it, wherever they were moved to.
+    """
+    series = [meeting for meeting in series if is_series(meeting)]
+    if not series:
+        return []
+
+    if overrides is None:
+        overrides = Meeting.objects.filter(
+            overlapping_overrides(window_start, window_end),
+            parent_meeting__in=[meeting.id for meeting in series],
+        )
+    replaced = {}
+    for override in overrides:
+        replaced.setdefault(override.parent_meeting_id, {})[override.recurrence_id] = override
+
+    occurrences = []
+    starts = cached_occurrence_starts(series, window_start, window_end)
+    for meeting in series:
+        duration = meeting.end_time - meeting.start_time
+        overrides_of = replaced.get(meeting.id, {})
+        for start in starts[meeting.id]:
+            if start not in overrides_of:
+                occurrences.append(Occurrence(meeting, start, start + duration, meeting.id, start))
+        for recurrence_id, override in overrides_of.items():
+            if override.status == 'cancelled' or not override.is_active:
+                continue
+            if override.start_time < window_end and override.end_time > window_start:
+                occurrences.append(
+                    Occurrence(override, override.start_time, override.end_time, meeting.id, recurrence_id)
+                )
+
+    occurrences.sort(key=lambda occurrence: (occurrence.start, occurrence.series_id))
+    return occurrences
+
+
+def is_occurrence(meeting, start):
+    """Whether the series has an occurrence starting exactly at ``start``"""
+    found = build_rule(meeting).after(start - timedelta(microseconds=1), inc=False)
+    return found is not None and found == start
+
+
+def override_occurrence(series, recurrence_id, changes=None, cancel=False):
+    """Create or update the row replacing one occurrence of ``series``.
+
+    New overrides start as a copy of the series at the occurrence's time,
+    attendees included. ``cancel`` marks the occurrence as cancelled.
+    """
+    override = Meeting.objects.filter(parent_meeting=series, recurrence_id=recurrence_id).first()
+    created = override is None
+    if created:
+        override = Meeting(parent_meeting=series, recurrence_id=recurrence_id)
+        for field in Meeting._meta.concrete_fields:
+            if field.name not in SERIES_ONLY_FIELDS:
+                setattr(override, field.attname, getattr(series, field.attname))
+        override.start_time = recurrence_id
+        override.end_time = recurrence_id + (series.end_time - series.start_time)
+
+    for name, value in (changes or {}).items():
+        setattr(override, name, value)
+    if cancel:
+        override.status = 'cancelled'
+    override.save()
+
+    if created:
+        override.attendees.set(series.attendees.all())
+    return override
+
+
+def parse_window(params):
+    """``(start, end)`` from ``start``/``end`` query parameters (dates or datetimes)"""
+    bounds = []
+    for name in ('start', 'end'):
+        value = params.get(name)
+        if not value:
+            raise InvalidWindow(f"'{name}' is required")
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                raise InvalidWindow(f"'{name}' must be a date or datetime")
+            parsed = datetime.combine(day, time.min)
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        bounds.append(parsed)
+
+    start, end = bounds
+    if end <= start:
+        raise InvalidWindow("'end' must be after 'start'")
+    if end - start > timedelta(days=settings.MEETING_CALENDAR_MAX_WINDOW_DAYS):
+        raise InvalidWindow(f'The window cannot be longer than {settings.MEETING_CALENDAR_MAX_WINDOW_DAYS} days')
+    return start, end
@@ -0,0 +1,268 @@
+"""Planning and delivery of meeting reminders.
+
+Reminder rows are planned per meeting for its organizer and attendees on
+every channel in ``MEETING_REMINDER_CHANNELS``: one batch of inserts when a
+meeting is created, and a delete plus re-insert when its time, reminder
+settings or attendees change. Recurring series get rows for the occurrences
+in the next ``MEETING_REMINDER_HORIZON_HOURS``, topped up by a periodic task.
+
+Due reminders are claimed in batches with ``SELECT ... FOR UPDATE SKIP
+LOCKED`` on the (is_sent, scheduled_for) index, so concurrent dispatchers never
+claim the same row, and each batch is delivered per channel in bulk. Emails
+go out one by one over a shared connection; reminders whose email fails are
+released for a later attempt until ``MEETING_REMINDER_MAX_ATTEMPTS``.
+Reminders that are not delivered at all, such as those of a meeting that
+started more than ``MEETING_REMINDER_GRACE_MINUTES`` ago, stay claimed with no
+``sent_at`` and the reason in ``last_error``.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from emails.models import SMS
+from notifications.models import Notification
+
+from .models import Meeting, MeetingReminder
+from .recurrence import expand, is_series, meeting_zone
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+# Meetings in these states are not reminded about
+SILENT_STATUSES = {'cancelled', 'completed'}
+
+
+def upcoming_starts(meeting, now, horizon_end):
+    """Starts still ahead of ``now``: the meeting's own, or its series occurrences before ``horizon_end``"""
+    if not is_series(meeting):
+        return [meeting.start_time] if meeting.start_time > now else []
+    return [
+        # Overridden occurrences are reminded about through their own row
+        event.start for event in expand([meeting], now, horizon_end)
+        if event.meeting.id == meeting.id and event.start > now
+    ]
+
+
+def plan_reminders(meeting_ids, replace=True):
+    """Create the reminders of the meetings; ``replace`` drops their unsent ones first.
+
+    Without ``replace`` existing rows are kept and only missing ones are added,
+    which is how series are rolled forward.
+    """
+    now = timezone.now()
+    horizon_end = now + timedelta(hours=settings.MEETING_REMINDER_HORIZON_HOURS)
+    channels = settings.MEETING_REMINDER_CHANNELS
+
+    with transaction.atomic():
+        if replace:
+            MeetingReminder.objects.filter(meeting_id__in=meeting_ids, is_sent=False).delete()
+
+        meetings = list(
+            Meeting.objects.filter(id__in=meeting_ids, send_reminders=True, is_active=True)
+            .exclude(status__in=SILENT_STATUSES)
+        )
+        if not meetings:
+            return 0
+
+        recipients = {meeting.id: {meeting.organizer_id} for meeting in meetings}
+        attendees = Meeting.attendees.through.objects.filter(meeting_id__in=recipients).values_list('meeting_id', 'user_id')
+        for meeting_id, user_id in attendees:
+            recipients[meeting_id].add(user_id)
+
+        with_phone = set()
+        if 'sms' in channels:
+            user_ids = set().union(*recipients.values())
+            with_phone = set(User.objects.filter(id__in=user_ids).exclude(phone='').values_list('id', flat=True))
+
+        reminders = []
+        for meeting in meetings:
+            for start in upcoming_starts(meeting, now, horizon_end):
+                # A meeting booked inside its reminder period is reminded about right away
+                scheduled_for = max(start - timedelta(minutes=meeting.reminder_minutes), now)
+                for user_id in recipients[meeting.id]:
+                    for channel in channels:
+                        if channel == 'sms' and user_id not in with_phone:
+                            continue
+                        reminders.append(MeetingReminder(
+                            meeting_id=meeting.id,
+                            user_id=user_id,
+                            reminder_type=channel,
+                            scheduled_for=scheduled_for,
+                            occurrence_start=start,
+                        ))
+
+        MeetingReminder.objects.bulk_create(reminders, batch_size=1000, ignore_conflicts=True)
+    return len(reminders)
+
+
+def claim_due_reminders(now, limit):
+    """Mark up to ``limit`` due reminders as sent and return their ids.
+
+    Claiming before delivery means a reminder is sent at most once, even with
+    several dispatchers running; ``release_reminders`` hands back those that failed.
+    """
+    with transaction.atomic():
+        ids = list(
+            MeetingReminder.objects.select_for_update(skip_locked=True)
+            .filter(is_sent=False, scheduled_for__lte=now)
+            .order_by('scheduled_for')
+            .values_list('id', flat=True)[:limit]
+        )
+        if ids:
+            MeetingReminder.objects.filter(id__in=ids).update(is_sent=True, sent_at=now)
+    return ids
+
+
+def release_reminders(failures, now):
+    """Record failed deliveries of ``{reminder_id: error}``; reminders with attempts left are retried later"""
+    retry_at = now + timedelta(minutes=settings.MEETING_REMINDER_RETRY_MINUTES)
+    by_error = {}
+    for reminder_id, error in failures.items():
+        by_error.setdefault(error, []).append(reminder_id)
+
+    released = 0
+    for error, ids in by_error.items():
+        reminders = MeetingReminder.objects.filter(id__in=ids)
+        last_attempt = settings.MEETING_REMINDER_MAX_ATTEMPTS - 1
+        # Out of attempts: the reminder stays claimed and records why it never went out
+        exhausted = list(reminders.filter(attempts__gte=last_attempt).values_list('id', flat=True))
+        reminders.filter(id__in=exhausted).update(sent_at=None, attempts=F('attempts') + 1, last_error=error)
+        released += reminders.exclude(id__in=exhausted).update(
+            is_sent=False, sent_at=None, scheduled_for=retry_at, attempts=F('attempts') + 1, last_error=error
+        )
+    return released
+
+
+def skip_reminders(skipped):
+    """Record why claimed reminders of ``{reminder_id: reason}`` were not delivered; they are not retried"""
+    by_reason = {}
+    for reminder_id, reason in skipped.items():
+        by_reason.setdefault(reason, []).append(reminder_id)
+    for reason, ids in by_reason.items():
+        MeetingReminder.objects.filter(id__in=ids).update(sent_at=None, last_error=reason)
+
+
+def skip_reason(reminder, start, now):
+    """Why a claimed reminder should not be delivered, or None"""
+    meeting = reminder.meeting
+    # Dispatching fell behind the meeting, or it changed after the claim
+    if start + timedelta(minutes=settings.MEETING_REMINDER_GRACE_MINUTES) <= now:
+        return 'The meeting had already started'
+    if meeting.status in SILENT_STATUSES:
+        return f'The meeting is {meeting.status}'
+    if not reminder.user.is_active:
+        return 'The user is inactive'
+    return None
+
+
+def reminder_text(meeting, start):
+    local_start = start.astimezone(meeting_zone(meeting))
+    text = f"Reminder: {meeting.title} starts at {local_start:%Y-%m-%d %H:%M} ({meeting.timezone})"
+    if meeting.location:
+        text += f" in {meeting.location}"
+    if meeting.meeting_url:
+        text += f". Join: {meeting.meeting_url}"
+    return text
+
+
+def deliver_reminders(reminder_ids):
+    """Send claimed reminders, one bulk operation per channel; returns counts per channel"""
+    now = timezone.now()
+    reminders = (
+        MeetingReminder.objects.filter(id__in=reminder_ids)
+        .select_related('meeting', 'user')
+        .order_by('reminder_type')
+    )
+
+    emails, sms, notifications = [], [], []
+    skipped = {}
+    counts = {'email': 0, 'sms': 0, 'push': 0, 'skipped': 0, 'failed': 0}
+    for reminder in reminders:
+        meeting = reminder.meeting
+        start = reminder.occurrence_start or meeting.start_time
+        reason = skip_reason(reminder, start, now)
+        if reason:
+            skipped[reminder.id] = reason
+            continue
+
+        text = reminder_text(meeting, start)
+        if reminder.reminder_type == 'email':
+            emails.append((reminder.id, EmailMessage(
+                subject=f"Reminder: {meeting.title}",
+                body=text,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[reminder.user.email],
+            )))
+        elif reminder.reminder_type == 'sms' and reminder.user.phone:
+            message = SMS(sms_type='outbound', status='queued', message=text[:1600], to_number=reminder.user.phone)
+            message.prepare_for_write()
+            sms.append(message)
+        elif reminder.reminder_type == 'push':
+            notifications.append(Notification(
+                title=f"Reminder: {meeting.title}",
+                message=text,
+                notification_type='meeting_reminder',
+                recipient_id=reminder.user_id,
+            ))
+        elif reminder.reminder_type == 'sms':
+            skipped[reminder.id] = 'The user has no phone number'
+        else:
+            # Calendar reminders are raised by the external calendar itself
+            skipped[reminder.id] = 'Raised by the external calendar'
+
+    if skipped:
+        skip_reminders(skipped)
+        counts['skipped'] = len(skipped)
+    if emails:
+        # One SMTP connection for the whole batch, with each message sent and checked on its own
+        failures = {}
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            logger.exception(f"Opening the mail connection for {len(emails)} meeting reminders failed: {e}")
+            failures = {reminder_id: str(e) or e.__class__.__name__ for reminder_id, _ in emails}
+        else:
+            try:
+                for reminder_id, message in emails:
+                    try:
+                        if connection.send_messages([message]):
+                            counts['email'] += 1
+                        else:
+                            failures[reminder_id] = 'Not accepted by the mail server'
+                    except Exception as e:
+                        failures[reminder_id] = str(e) or e.__class__.__name__
+            finally:
+                connection.close()
+        if failures:
+            logger.warning(f"{len(failures)} meeting reminder emails failed and were released for retry")
+            release_reminders(failures, now)
+            counts['failed'] = len(failures)
+    if sms:
+        from emails.tasks import dispatch_sms
+        created = SMS.objects.bulk_create(sms)
+        dispatch_sms.delay([message.id for message in created])
+        counts['sms'] = len(created)
+    if notifications:
+        counts['push'] = len(Notification.objects.bulk_create(notifications))
+    return counts
+
+
+def dispatch_due_reminders(batch_size=None, deliver=deliver_reminders):
+    """Claim every due reminder in batches and hand each batch to ``deliver``; returns the number claimed"""
+    batch_size = batch_size or settings.MEETING_REMINDER_BATCH_SIZE
+    now = timezone.now()
+    claimed = 0
+    while True:
+        ids = claim_due_reminders(now, batch_size)
+        if not ids:
+            return claimed
+        claimed += len(ids)
+        deliver(ids)
@@ -1,10 +1,33 @@
+import copy
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import Meeting, MeetingCategory, MeetingAttendance, MeetingReminder, MeetingTemplate, CalendarIntegration
+from django.conf import settings
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.functional import cached_property
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from .attendance import RESPONSE_STATUSES
+from .conflicts import POLICIES, MeetingConflict, describe_conflicts, find_conflicts
+from .recurrence import InvalidRule, validate_rule
 
 User = get_user_model()
 
+def validate_recurrence(attrs, instance=None):
+    """A recurring meeting needs a rule dateutil can expand from its start"""
+    def current(name):
+        return attrs[name] if name in attrs else getattr(instance, name, None)
+    
+    if current('is_recurring'):
+        if not current('recurrence_rule'):
+            raise serializers.ValidationError({'recurrence_rule': 'Recurring meetings need a recurrence rule'})
+        start_time = current('start_time')
+        try:
+            validate_rule(current('recurrence_rule'), start_time or timezone.now())
+        except InvalidRule as e:
+            raise serializers.ValidationError({'recurrence_rule': str(e)})
+    return attrs
+
 class UserMinimalSerializer(serializers.ModelSerializer):
     """Minimal user serializer for meeting relationships"""
     
@@ -63,7 +86,7 @@ class MeetingReminderSerializer(serializers.ModelSerializer):
         model = MeetingReminder
         fields = [
             'id', 'meeting', 'user', 'reminder_type', 'scheduled_for',
-            'sent_at', 'is_sent', 'created_at'
+            'sent_at', 'is_sent', 'attempts', 'last_error', 'created_at'
         ]
         read_only_fields = ['id', 'sent_at', 'is_sent', 'created_at']
 
@@ -126,9 +149,9 @@ class MeetingSerializer(serializers.ModelSerializer):
             'start_time', 'end_time', 'timezone', 'all_day', 'location',
             'location_type', 'meeting_url', 'organizer', 'attendees', 'category',
             'case', 'contact', 'company', 'is_recurring', 'recurrence_rule',
-            'parent_meeting', 'reminder_minutes', 'send_reminders', 'agenda',
-            'notes', 'outcome', 'is_active', 'is_private', 'created_at',
-            'updated_at', 'attendances', 'reminders', 'duration_minutes',
+            'parent_meeting', 'recurrence_id', 'recurrence_end', 'reminder_minutes',
+            'send_reminders', 'agenda', 'notes', 'outcome', 'is_active', 'is_private',
+            'created_at', 'updated_at', 'attendances', 'reminders', 'duration_minutes',
             'is_past', 'is_ongoing', 'is_upcoming', 'is_today'
         ]
         read_only_fields = [
@@ -136,7 +159,119 @@ class MeetingSerializer(serializers.ModelSerializer):
             'is_past', 'is_ongoing', 'is_upcoming', 'is_today'
         ]
 
-class MeetingCreateSerializer(serializers.ModelSerializer):
+class AttendeeIdsListSerializer(serializers.ListSerializer):
+    """Loads the attendee ids of a whole page with one query on the attendee table"""
+    
+    def to_representation(self, data):
+        meetings = list(data.all() if hasattr(data, 'all') else data)
+        attendee_ids = {meeting.id: [] for meeting in meetings}
+        rows = Meeting.attendees.through.objects.filter(meeting_id__in=attendee_ids).order_by('id')
+        for meeting_id, user_id in rows.values_list('meeting_id', 'user_id'):
+            attendee_ids[meeting_id].append(user_id)
+        for meeting in meetings:
+            meeting.attendee_ids = attendee_ids[meeting.id]
+        return super().to_representation(meetings)
+
+class MeetingListSerializer(serializers.ModelSerializer):
+    """Slim meeting serializer for lists: attendee ids and count instead of nested rows.
+    
+    Edits load the meeting's detail first, as agenda, notes and the other long fields are left out.
+    """
+    
+    organizer = UserMinimalSerializer(read_only=True)
+    category = MeetingCategorySerializer(read_only=True)
+    attendee_ids = serializers.SerializerMethodField()
+    attendee_count = serializers.SerializerMethodField()
+    
+    # Computed against one clock per response instead of timezone.now() per row and field
+    duration_minutes = serializers.IntegerField(read_only=True)
+    is_past = serializers.SerializerMethodField()
+    is_ongoing = serializers.SerializerMethodField()
+    is_upcoming = serializers.SerializerMethodField()
+    is_today = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Meeting
+        fields = [
+            'id', 'title', 'description', 'meeting_type', 'status', 'priority', 'start_time', 'end_time',
+            'timezone', 'all_day', 'location', 'location_type', 'meeting_url', 'organizer',
+            'category', 'case', 'contact', 'company', 'is_recurring', 'parent_meeting',
+            'recurrence_id', 'is_active', 'is_private', 'created_at', 'updated_at',
+            'attendee_ids', 'attendee_count', 'duration_minutes', 'is_past', 'is_ongoing',
+            'is_upcoming', 'is_today'
+        ]
+        list_serializer_class = AttendeeIdsListSerializer
+    
+    @cached_property
+    def now(self):
+        # With many=True one child instance serializes every row
+        return timezone.now()
+    
+    def get_attendee_ids(self, obj):
+        if not hasattr(obj, 'attendee_ids'):
+            obj.attendee_ids = list(Meeting.attendees.through.objects.filter(meeting=obj).values_list('user_id', flat=True))
+        return obj.attendee_ids
+    
+    def get_attendee_count(self, obj):
+        return len(self.get_attendee_ids(obj))
+    
+    def get_is_past(self, obj):
+        return obj.end_time < self.now
+    
+    def get_is_ongoing(self, obj):
+        return obj.start_time <= self.now <= obj.end_time
+    
+    def get_is_upcoming(self, obj):
+        return obj.start_time > self.now
+    
+    def get_is_today(self, obj):
+        return obj.start_time.date() == self.now.date()
+
+class ConflictCheckMixin(serializers.Serializer):
+    """Double-booking check of the organizer and attendees, as set by ``conflict_policy``"""
+    
+    conflict_policy = serializers.ChoiceField(choices=POLICIES, write_only=True, required=False)
+    
+    # Changes that can create a conflict
+    SCHEDULE_FIELDS = {
+        'start_time', 'end_time', 'timezone', 'is_recurring', 'recurrence_rule', 'status', 'attendee_ids',
+    }
+    
+    def check_conflicts(self, attrs):
+        policy = attrs.pop('conflict_policy', settings.MEETING_CONFLICT_POLICY)
+        self.conflicts = []
+        if policy == 'allow' or (self.instance is not None and not self.SCHEDULE_FIELDS & set(attrs)):
+            return attrs
+        
+        fields = {name: value for name, value in attrs.items() if name != 'attendee_ids'}
+        if self.instance is None:
+            meeting = Meeting(organizer=self.context['request'].user, **fields)
+        else:
+            meeting = copy.copy(self.instance)
+            for name, value in fields.items():
+                setattr(meeting, name, value)
+        
+        if 'attendee_ids' in attrs:
+            user_ids = set(attrs['attendee_ids'])
+        elif self.instance is not None:
+            user_ids = set(self.instance.attendees.values_list('id', flat=True))
+        else:
+            user_ids = set()
+        user_ids.add(meeting.organizer_id)
+        
+        conflicts = describe_conflicts(find_conflicts(meeting, user_ids))
+        if conflicts and policy == 'reject':
+            raise MeetingConflict(conflicts)
+        self.conflicts = conflicts
+        return attrs
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if getattr(self, 'conflicts', None):
+            data['conflicts'] = self.conflicts
+        return data
+
+class MeetingCreateSerializer(ConflictCheckMixin, serializers.ModelSerializer):
     """Serializer for creating meetings"""
     
     attendee_ids = serializers.ListField(
@@ -152,23 +287,26 @@ class MeetingCreateSerializer(serializers.ModelSerializer):
             'start_time', 'end_time', 'timezone', 'all_day', 'location',
             'location_type', 'meeting_url', 'category', 'case', 'contact',
             'company', 'is_recurring', 'recurrence_rule', 'reminder_minutes',
-            'send_reminders', 'agenda', 'notes', 'is_private', 'attendee_ids'
+            'send_reminders', 'agenda', 'notes', 'is_private', 'attendee_ids',
+            'conflict_policy'
         ]
     
+    def validate(self, attrs):
+        return self.check_conflicts(validate_recurrence(attrs))
+    
     def create(self, validated_data):
         attendee_ids = validated_data.pop('attendee_ids', [])
         validated_data['organizer'] = self.context['request'].user
         
         meeting = super().create(validated_data)
         
-        # Add attendees
+        # Add attendees by id, without loading them; their attendance rows follow in one insert
         if attendee_ids:
-            attendees = User.objects.filter(id__in=attendee_ids)
-            meeting.attendees.set(attendees)
+            meeting.attendees.set(User.objects.filter(id__in=attendee_ids).values_list('id', flat=True))
         
         return meeting
 
-class MeetingUpdateSerializer(serializers.ModelSerializer):
+class MeetingUpdateSerializer(ConflictCheckMixin, serializers.ModelSerializer):
     """Serializer for updating meetings"""
     
     attendee_ids = serializers.ListField(
@@ -184,9 +322,13 @@ class MeetingUpdateSerializer(serializers.ModelSerializer):
             'start_time', 'end_time', 'timezone', 'all_day', 'location',
             'location_type', 'meeting_url', 'category', 'case', 'contact',
             'company', 'is_recurring', 'recurrence_rule', 'reminder_minutes',
-            'send_reminders', 'agenda', 'notes', 'outcome', 'is_private', 'attendee_ids'
+            'send_reminders', 'agenda', 'notes', 'outcome', 'is_private', 'attendee_ids',
+            'conflict_policy'
         ]
     
+    def validate(self, attrs):
+        return self.check_conflicts(validate_recurrence(attrs, self.instance))
+    
     def update(self, instance, validated_data):
         attendee_ids = validated_data.pop('attendee_ids', None)
         
@@ -194,11 +336,68 @@ class MeetingUpdateSerializer(serializers.ModelSerializer):
         
         # Update attendees if provided
         if attendee_ids is not None:
-            attendees = User.objects.filter(id__in=attendee_ids)
-            meeting.attendees.set(attendees)
+            meeting.attendees.set(User.objects.filter(id__in=attendee_ids).values_list('id', flat=True))
         
         return meeting
 
+class OccurrenceSerializer(serializers.Serializer):
+    """Slim calendar event: a meeting or one occurrence of a recurring meeting"""
+    
+    id = serializers.IntegerField(source='meeting.id')
+    series_id = serializers.IntegerField()
+    recurrence_id = serializers.DateTimeField()
+    is_override = serializers.BooleanField()
+    title = serializers.CharField(source='meeting.title')
+    status = serializers.CharField(source='meeting.status')
+    meeting_type = serializers.CharField(source='meeting.meeting_type')
+    priority = serializers.CharField(source='meeting.priority')
+    start_time = serializers.DateTimeField(source='start')
+    end_time = serializers.DateTimeField(source='end')
+    all_day = serializers.BooleanField(source='meeting.all_day')
+    location = serializers.CharField(source='meeting.location')
+    location_type = serializers.CharField(source='meeting.location_type')
+    organizer_id = serializers.IntegerField(source='meeting.organizer_id')
+    category_id = serializers.IntegerField(source='meeting.category_id')
+    is_private = serializers.BooleanField(source='meeting.is_private')
+
+class OccurrenceOverrideSerializer(serializers.Serializer):
+    """Changes to one occurrence of a recurring meeting"""
+    
+    recurrence_id = serializers.DateTimeField()
+    cancel = serializers.BooleanField(default=False)
+    title = serializers.CharField(max_length=200, required=False)
+    description = serializers.CharField(required=False, allow_blank=True)
+    start_time = serializers.DateTimeField(required=False)
+    end_time = serializers.DateTimeField(required=False)
+    location = serializers.CharField(max_length=200, required=False, allow_blank=True)
+    meeting_url = serializers.URLField(required=False, allow_blank=True)
+    agenda = serializers.CharField(required=False, allow_blank=True)
+    notes = serializers.CharField(required=False, allow_blank=True)
+    
+    def validate(self, attrs):
+        start_time, end_time = attrs.get('start_time'), attrs.get('end_time')
+        if (start_time is None) != (end_time is None):
+            raise serializers.ValidationError('start_time and end_time must be changed together')
+        if start_time is not None and end_time <= start_time:
+            raise serializers.ValidationError({'end_time': 'The occurrence must end after it starts'})
+        return attrs
+
+class BulkRespondSerializer(serializers.Serializer):
+    """The user's response to the invitations of several meetings"""
+    
+    meetings = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=settings.MEETING_ATTENDANCE_BATCH_LIMIT
+    )
+    status = serializers.ChoiceField(choices=RESPONSE_STATUSES)
+    response_notes = serializers.CharField(required=False, allow_blank=True, default='')
+
+class CheckInSerializer(serializers.Serializer):
+    """Attendees checked in to a meeting by its organizer"""
+    
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=settings.MEETING_ATTENDANCE_BATCH_LIMIT
+    )
+
 class MeetingAttendanceUpdateSerializer(serializers.ModelSerializer):
     """Serializer for updating meeting attendance status"""
     
@@ -217,13 +416,14 @@ class CalendarIntegrationSerializer(serializers.ModelSerializer):
     
     user = UserMinimalSerializer(read_only=True)
     provider_display = serializers.CharField(source='get_provider_display', read_only=True)
+    feed_url = serializers.SerializerMethodField()
     
     class Meta:
         model = CalendarIntegration
         fields = [
             'id', 'user', 'provider', 'provider_display', 'is_active',
             'sync_meetings', 'sync_availability', 'last_sync', 'sync_errors',
-            'created_at', 'updated_at'
+            'feed_url', 'created_at', 'updated_at'
         ]
         read_only_fields = [
             'id', 'user', 'last_sync', 'sync_errors', 'created_at', 'updated_at'
@@ -237,6 +437,14 @@ class CalendarIntegrationSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
+    
+    def get_feed_url(self, obj):
+        """Secret subscription URL of the iCalendar feed"""
+        if obj.provider != 'ical' or not obj.feed_token:
+            return None
+        url = reverse('calendar-feed-detail', kwargs={'token': obj.feed_token})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
 
 class CalendarIntegrationCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating calendar integration"""
@@ -282,4 +490,54 @@ class MeetingSearchSerializer(serializers.Serializer):
     category = serializers.IntegerField(required=False)
     case = serializers.IntegerField(required=False)
     contact = serializers.IntegerField(required=False)
-    company = serializers.IntegerField(required=False) 
\ No newline at end of file
+    company = serializers.IntegerField(required=False) 
+
+class FreeBusySerializer(serializers.Serializer):
+    """Query parameters of the free/busy lookup"""
+    
+    users = serializers.CharField(help_text="Comma-separated user ids")
+    duration = serializers.IntegerField(min_value=5, max_value=1440, default=30)
+    timezone = serializers.CharField(default=settings.TIME_ZONE)
+    work_start = serializers.TimeField(required=False)
+    work_end = serializers.TimeField(required=False)
+    weekdays = serializers.CharField(required=False, help_text="Comma-separated weekdays, 0 is Monday")
+    limit = serializers.IntegerField(min_value=1, max_value=500, required=False)
+    
+    def _int_list(self, value, name):
+        try:
+            return sorted({int(item) for item in value.split(',') if item.strip()})
+        except ValueError:
+            raise serializers.ValidationError(f'{name} must be a comma-separated list of numbers')
+    
+    def validate_users(self, value):
+        user_ids = self._int_list(value, 'users')
+        if not user_ids:
+            raise serializers.ValidationError('At least one user is required')
+        if len(user_ids) > settings.MEETING_FREEBUSY_MAX_USERS:
+            raise serializers.ValidationError(f'At most {settings.MEETING_FREEBUSY_MAX_USERS} users')
+        return user_ids
+    
+    def validate_weekdays(self, value):
+        weekdays = self._int_list(value, 'weekdays')
+        if any(day not in range(7) for day in weekdays):
+            raise serializers.ValidationError('Weekdays go from 0 (Monday) to 6 (Sunday)')
+        return weekdays
+    
+    def validate_timezone(self, value):
+        try:
+            return ZoneInfo(value)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise serializers.ValidationError(f"Unknown time zone '{value}'")
+    
+    def validate(self, attrs):
+        if ('work_start' in attrs) != ('work_end' in attrs):
+            raise serializers.ValidationError('work_start and work_end must be given together')
+        if 'work_start' in attrs and attrs['work_end'] <= attrs['work_start']:
+            raise serializers.ValidationError({'work_end': 'Working hours must end after they start'})
+        return attrs
+
+class MeetingAnalyticsSerializer(serializers.Serializer):
+    """Query parameters of the weekly attendance analytics"""
+    
+    weeks = serializers.IntegerField(min_value=1, max_value=104, default=12, help_text="Weeks back, this week included")
+    user = serializers.IntegerField(required=False, help_text="Staff only; everyone when left out")
@@ -0,0 +1,120 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from .analytics import attendance_keys, refresh_attendances, refresh_meetings, refresh_rollups, week_start
+from .attendance import invite, uninvite
+from .models import Meeting, MeetingAttendance
+from .reminders import plan_reminders
+
+# Changes that move or silence a meeting's reminders
+REMINDER_SOURCE_FIELDS = [
+    'start_time', 'end_time', 'timezone', 'is_recurring', 'recurrence_rule',
+    'reminder_minutes', 'send_reminders', 'status', 'is_active',
+]
+
+# Changes that move a meeting's attendances to other weekly rollups, or out of them
+ROLLUP_MEETING_FIELDS = ['start_time', 'end_time', 'meeting_type', 'category_id', 'status', 'is_active']
+ROLLUP_ATTENDANCE_FIELDS = ['user_id', 'meeting_id', 'status', 'joined_at', 'left_at']
+
+
+def replan_reminders(meeting_ids):
+    meeting_ids = set(filter(None, meeting_ids))
+    if meeting_ids:
+        transaction.on_commit(lambda: plan_reminders(meeting_ids))
+
+
+def reminder_snapshot(meeting):
+    return tuple(getattr(meeting, field) for field in REMINDER_SOURCE_FIELDS)
+
+
+def snapshot(instance, fields):
+    if instance.pk is None or set(fields) & instance.get_deferred_fields():
+        return None
+    return {field: getattr(instance, field) for field in fields}
+
+
+@receiver(post_init, sender=Meeting)
+def remember_reminder_fields(sender, instance, **kwargs):
+    if instance.pk is None or set(REMINDER_SOURCE_FIELDS) & instance.get_deferred_fields():
+        instance._reminder_snapshot = None
+    else:
+        instance._reminder_snapshot = reminder_snapshot(instance)
+    instance._rollup_snapshot = snapshot(instance, ROLLUP_MEETING_FIELDS)
+
+
+@receiver(post_save, sender=Meeting)
+def replan_reminders_on_save(sender, instance, created, **kwargs):
+    previous = instance._reminder_snapshot
+    instance._reminder_snapshot = reminder_snapshot(instance)
+    if created or previous != instance._reminder_snapshot:
+        # An override also changes which occurrences of its series are reminded about
+        replan_reminders([instance.pk, instance.parent_meeting_id])
+
+
+@receiver(m2m_changed, sender=Meeting.attendees.through)
+def replan_reminders_on_attendees(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    # user.attended_meetings changes; a clear does not say which meetings
+    meeting_ids = (pk_set or []) if reverse else [instance.pk]
+    # Attendees are part of the meeting for calendar feeds, which are versioned by updated_at
+    Meeting.objects.filter(pk__in=meeting_ids).update(updated_at=timezone.now())
+    replan_reminders(meeting_ids)
+
+
+@receiver(m2m_changed, sender=Meeting.attendees.through)
+def sync_attendances_on_attendees(sender, instance, action, reverse, pk_set, **kwargs):
+    # Reverse changes come from user.attended_meetings, with meeting ids in pk_set
+    if action == 'post_add':
+        invite((pk, instance.pk) if reverse else (instance.pk, pk) for pk in pk_set)
+    elif action == 'post_remove' and reverse:
+        uninvite(MeetingAttendance.objects.filter(user_id=instance.pk, meeting_id__in=pk_set))
+    elif action == 'post_remove':
+        uninvite(MeetingAttendance.objects.filter(meeting_id=instance.pk, user_id__in=pk_set))
+    elif action == 'post_clear':
+        uninvite(MeetingAttendance.objects.filter(**{'user_id' if reverse else 'meeting_id': instance.pk}))
+
+
+@receiver(post_save, sender=Meeting)
+def refresh_rollups_on_meeting_save(sender, instance, created, **kwargs):
+    previous = instance._rollup_snapshot
+    instance._rollup_snapshot = snapshot(instance, ROLLUP_MEETING_FIELDS)
+    if created or previous == instance._rollup_snapshot:
+        # New meetings have no attendances yet
+        return
+    weeks = [week_start(previous['start_time'])] if previous else []
+    transaction.on_commit(lambda: refresh_meetings([instance.pk], weeks))
+
+
+@receiver(pre_delete, sender=Meeting)
+def refresh_rollups_on_meeting_delete(sender, instance, **kwargs):
+    # Read now: the attendances are gone by the time the deletion commits
+    keys = attendance_keys([instance.pk])
+    if keys:
+        transaction.on_commit(lambda: refresh_rollups(keys))
+
+
+@receiver(post_init, sender=MeetingAttendance)
+def remember_rollup_fields(sender, instance, **kwargs):
+    instance._rollup_snapshot = snapshot(instance, ROLLUP_ATTENDANCE_FIELDS)
+
+
+@receiver(post_save, sender=MeetingAttendance)
+def refresh_rollups_on_attendance_save(sender, instance, created, **kwargs):
+    previous = instance._rollup_snapshot
+    instance._rollup_snapshot = snapshot(instance, ROLLUP_ATTENDANCE_FIELDS)
+    if not created and previous == instance._rollup_snapshot:
+        return
+    pairs = [(instance.user_id, instance.meeting_id)]
+    if previous:
+        pairs.append((previous['user_id'], previous['meeting_id']))
+    transaction.on_commit(lambda: refresh_attendances(pairs))
+
+
+@receiver(post_delete, sender=MeetingAttendance)
+def refresh_rollups_on_attendance_delete(sender, instance, origin=None, **kwargs):
+    # Deleting a meeting refreshes its attendees' weeks once, deleting a user drops their rollups,
+    # and bulk deletes in ``attendance`` refresh what they deleted
+    if isinstance(origin, MeetingAttendance):
+        transaction.on_commit(lambda: refresh_attendances([(instance.user_id, instance.meeting_id)]))
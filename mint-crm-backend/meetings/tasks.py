@@ -0,0 +1,53 @@
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+from datetime import timedelta
+import logging
+
+from .analytics import reconcile_rollups
+from .models import Meeting
+from .recurrence import series_in_window
+from .reminders import deliver_reminders, dispatch_due_reminders, plan_reminders
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def dispatch_meeting_reminders():
+    """Claim due reminders in batches and hand each batch to a delivery worker"""
+    claimed = dispatch_due_reminders(deliver=lambda ids: deliver_meeting_reminders.delay(ids))
+    if claimed:
+        logger.info(f"Claimed {claimed} due meeting reminders")
+    return claimed
+
+
+@shared_task
+def deliver_meeting_reminders(reminder_ids):
+    """Send one claimed batch of reminders through their channels"""
+    counts = deliver_reminders(reminder_ids)
+    logger.info(f"Meeting reminders delivered: {counts}")
+    return counts
+
+
+@shared_task
+def plan_recurring_reminders():
+    """Add reminders for series occurrences entering the planning horizon"""
+    now = timezone.now()
+    horizon_end = now + timedelta(hours=settings.MEETING_REMINDER_HORIZON_HOURS)
+    series_ids = list(
+        Meeting.objects.filter(series_in_window(now, horizon_end), send_reminders=True)
+        .values_list('id', flat=True)
+    )
+    planned = 0
+    for offset in range(0, len(series_ids), settings.MEETING_REMINDER_BATCH_SIZE):
+        planned += plan_reminders(series_ids[offset:offset + settings.MEETING_REMINDER_BATCH_SIZE], replace=False)
+    logger.info(f"Planned {planned} reminders for {len(series_ids)} recurring meetings")
+    return planned
+
+
+@shared_task
+def reconcile_meeting_stats():
+    """Rebuild the weekly attendance rollups, catching writes that skipped the signals"""
+    reconciled = reconcile_rollups()
+    logger.info(f"Meeting stats reconciled for {reconciled} users")
+    return reconciled
@@ -3,17 +3,31 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.settings import api_settings
 from django.utils import timezone
 from django.db.models import Count, Q
 from datetime import datetime, timedelta
-from .models import Meeting, MeetingCategory, MeetingAttendance, MeetingReminder, MeetingTemplate, CalendarIntegration
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from .analytics import week_start, weekly_summary
+from .attendance import RESPONSE_STATUSES, check_in, respond
+from .availability import find_availability
+from .calendar import calendar_events, involving, visible_to
+from .ical import cached_render, feed_cache_key, feed_meetings, feed_version
+from .recurrence import InvalidWindow, expand, is_occurrence, is_series, override_occurrence, parse_window
+from .models import (
+    Meeting, MeetingCategory, MeetingAttendance, MeetingReminder, MeetingTemplate, MeetingWeeklyStats,
+    CalendarIntegration
+)
 from .serializers import (
-    MeetingSerializer, MeetingCreateSerializer, MeetingUpdateSerializer,
+    MeetingSerializer, MeetingListSerializer, MeetingCreateSerializer, MeetingUpdateSerializer,
     MeetingCategorySerializer, MeetingCategoryCreateSerializer,
     MeetingAttendanceSerializer, MeetingAttendanceUpdateSerializer,
     MeetingReminderSerializer, MeetingTemplateSerializer, MeetingTemplateCreateSerializer,
     CalendarIntegrationSerializer, CalendarIntegrationCreateSerializer,
-    MeetingStatsSerializer, MeetingSearchSerializer
+    MeetingStatsSerializer, MeetingSearchSerializer, OccurrenceSerializer, OccurrenceOverrideSerializer,
+    FreeBusySerializer, MeetingAnalyticsSerializer, BulkRespondSerializer, CheckInSerializer
 )
 
 class MeetingViewSet(viewsets.ModelViewSet):
@@ -30,31 +44,40 @@ class MeetingViewSet(viewsets.ModelViewSet):
     ordering_fields = ['start_time', 'end_time', 'created_at', 'title']
     ordering = ['-start_time'] 
     
+    # Actions answering with MeetingListSerializer
+    list_actions = ['list', 'today', 'upcoming', 'past', 'search']
+    # Actions changing attendance or status, which need the meeting row and nothing it links to
+    member_actions = ['join', 'leave', 'check_in', 'complete', 'cancel']
+    
     def get_queryset(self):
         """Filter meetings based on user permissions and visibility"""
         user = self.request.user
         
         # Base queryset
-        queryset = Meeting.objects.select_related(
-            'organizer', 'category', 'case', 'contact', 'company'
-        ).prefetch_related(
-            'attendees', 'attendances__user', 'reminders__user'
-        )
-        
-        # Filter by visibility
-        if not user.is_staff:
-            # Regular users see meetings they organize or attend
-            queryset = queryset.filter(
-                Q(organizer=user) | Q(attendees=user) | Q(is_private=False)
-            ).distinct()
+        if self.action in self.list_actions:
+            # Attendee ids are loaded per page by the list serializer
+            queryset = Meeting.objects.select_related('organizer', 'category__created_by')
+        elif self.action in self.member_actions:
+            # Prefetching attendees and attendances would load every row of an all-hands meeting
+            queryset = Meeting.objects.all()
+        else:
+            queryset = Meeting.objects.select_related(
+                'organizer', 'category', 'case', 'contact', 'company'
+            ).prefetch_related(
+                'attendees', 'attendances__user', 'reminders__user'
+            )
         
-        return queryset
+        # Regular users see meetings they organize or attend, and public ones;
+        # attendance is an EXISTS subquery, so no join to fan out and no DISTINCT
+        return visible_to(queryset, user)
     
     def get_serializer_class(self):
         if self.action == 'create':
             return MeetingCreateSerializer
         elif self.action in ['update', 'partial_update']:
             return MeetingUpdateSerializer
+        elif self.action in self.list_actions:
+            return MeetingListSerializer
         return MeetingSerializer
     
     @action(detail=True, methods=['post'])
@@ -63,8 +86,8 @@ class MeetingViewSet(viewsets.ModelViewSet):
         meeting = self.get_object()
         user = request.user
         
-        # Check if user is an attendee
-        if user not in meeting.attendees.all():
+        # Check if user is an attendee, with an EXISTS query rather than loading all attendees
+        if not meeting.attendees.filter(id=user.id).exists():
             return Response(
                 {'error': 'You are not an attendee of this meeting'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -84,6 +107,27 @@ class MeetingViewSet(viewsets.ModelViewSet):
         
         return Response({'message': 'Successfully joined the meeting'})
     
+    @action(detail=True, methods=['post'])
+    def check_in(self, request, pk=None):
+        """Mark several attendees as attended (organizer only)"""
+        meeting = self.get_object()
+        
+        if meeting.organizer_id != request.user.id and not request.user.is_staff:
+            return Response(
+                {'error': 'Only the organizer can check attendees in'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        serializer = CheckInSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user_ids = serializer.validated_data['user_ids']
+        
+        not_attendees = check_in(meeting, user_ids)
+        return Response({
+            'checked_in': len(set(user_ids)) - len(not_attendees),
+            'not_attendees': not_attendees,
+        })
+    
     @action(detail=True, methods=['post'])
     def leave(self, request, pk=None):
         """Leave a meeting (mark as left)"""
@@ -107,12 +151,16 @@ class MeetingViewSet(viewsets.ModelViewSet):
         meeting = self.get_object()
         
         # Check if user is organizer
-        if meeting.organizer != request.user:
+        if meeting.organizer_id != request.user.id:
             return Response(
                 {'error': 'Only the organizer can complete the meeting'},
                 status=status.HTTP_403_FORBIDDEN
             )
         
+        # Accepted but never joined; saving the meeting then refreshes its attendees' rollups
+        MeetingAttendance.objects.filter(meeting=meeting, status='accepted', joined_at__isnull=True).update(
+            status='no_show', updated_at=timezone.now()
+        )
         meeting.status = 'completed'
         meeting.save()
         
@@ -124,7 +172,7 @@ class MeetingViewSet(viewsets.ModelViewSet):
         meeting = self.get_object()
         
         # Check if user is organizer
-        if meeting.organizer != request.user:
+        if meeting.organizer_id != request.user.id:
             return Response(
                 {'error': 'Only the organizer can cancel the meeting'},
                 status=status.HTTP_403_FORBIDDEN
@@ -135,12 +183,120 @@ class MeetingViewSet(viewsets.ModelViewSet):
         
         return Response({'message': 'Meeting cancelled'})
     
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """Slim events between ``start`` and ``end``, recurring occurrences included"""
+        try:
+            start, end = parse_window(request.query_params)
+        except InvalidWindow as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Not get_queryset(): the calendar needs none of its joins or prefetches
+        queryset = visible_to(Meeting.objects.all(), request.user)
+        if request.query_params.get('user'):
+            try:
+                queryset = involving(queryset, [int(request.query_params['user'])])
+            except ValueError:
+                return Response({'error': 'user must be a user id'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Filters and search narrow the expanded events, so overrides are matched on their own fields
+        filter_params = [*self.filterset_fields, api_settings.SEARCH_PARAM]
+        matching = self.filter_queryset(queryset) if any(name in request.query_params for name in filter_params) else None
+        events = calendar_events(queryset, start, end, matching=matching)
+        return Response({
+            'start': start,
+            'end': end,
+            'count': len(events),
+            'results': OccurrenceSerializer(events, many=True).data,
+        })
+    
+    @action(detail=False, methods=['get'])
+    def free_busy(self, request):
+        """Combined busy time of ``users`` between ``start`` and ``end`` and free slots of ``duration`` minutes"""
+        serializer = FreeBusySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        
+        try:
+            start, end = parse_window(request.query_params)
+        except InvalidWindow as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        availability = find_availability(
+            params['users'], start, end,
+            duration=timedelta(minutes=params['duration']),
+            tz=params['timezone'],
+            day_start=params.get('work_start'),
+            day_end=params.get('work_end'),
+            weekdays=params.get('weekdays'),
+            limit=params.get('limit'),
+        )
+        return Response({
+            'start': start,
+            'end': end,
+            'users': params['users'],
+            'duration': params['duration'],
+            **{
+                key: [{'start': interval_start, 'end': interval_end} for interval_start, interval_end in intervals]
+                for key, intervals in availability.items()
+            },
+        })
+    
+    @action(detail=True, methods=['get'])
+    def occurrences(self, request, pk=None):
+        """Occurrences of a recurring meeting between ``start`` and ``end``"""
+        meeting = self.get_object()
+        
+        try:
+            start, end = parse_window(request.query_params)
+        except InvalidWindow as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not is_series(meeting):
+            return Response({'error': 'This meeting is not a recurring series'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        occurrences = expand([meeting], start, end)
+        return Response({
+            'start': start,
+            'end': end,
+            'results': OccurrenceSerializer(occurrences, many=True).data,
+        })
+    
+    @action(detail=True, methods=['post'])
+    def override_occurrence(self, request, pk=None):
+        """Move, edit or cancel one occurrence of a recurring meeting"""
+        meeting = self.get_object()
+        
+        if meeting.organizer != request.user:
+            return Response(
+                {'error': 'Only the organizer can change occurrences of the meeting'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        if not is_series(meeting):
+            return Response({'error': 'This meeting is not a recurring series'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer = OccurrenceOverrideSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        changes = dict(serializer.validated_data)
+        recurrence_id = changes.pop('recurrence_id')
+        cancel = changes.pop('cancel')
+        
+        if not is_occurrence(meeting, recurrence_id):
+            return Response(
+                {'error': 'The meeting has no occurrence starting at recurrence_id'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        override = override_occurrence(meeting, recurrence_id, changes, cancel=cancel)
+        return Response(MeetingSerializer(override).data)
+    
     @action(detail=False, methods=['get'])
     def today(self, request):
         """Get today's meetings"""
-        today = timezone.now().date()
+        day_start = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        # A range on start_time, unlike __date, can use the start_time indexes
         queryset = self.get_queryset().filter(
-            start_time__date=today
+            start_time__gte=day_start, start_time__lt=day_start + timedelta(days=1)
         )
         
         page = self.paginate_queryset(queryset)
@@ -188,13 +344,17 @@ class MeetingViewSet(viewsets.ModelViewSet):
         """Get meeting statistics"""
         queryset = self.get_queryset()
         now = timezone.now()
-        today = now.date()
-        
+        day_start = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+        
+        # The four counts in one pass
+        counts = queryset.order_by().aggregate(
+            total_meetings=Count('id'),
+            upcoming_meetings=Count('id', filter=Q(start_time__gt=now)),
+            today_meetings=Count('id', filter=Q(start_time__gte=day_start, start_time__lt=day_start + timedelta(days=1))),
+            past_meetings=Count('id', filter=Q(end_time__lt=now)),
+        )
         stats = {
-            'total_meetings': queryset.count(),
-            'upcoming_meetings': queryset.filter(start_time__gt=now).count(),
-            'today_meetings': queryset.filter(start_time__date=today).count(),
-            'past_meetings': queryset.filter(end_time__lt=now).count(),
+            **counts,
             'by_status': list(queryset.values('status').annotate(count=Count('id'))),
             'by_type': list(queryset.values('meeting_type').annotate(count=Count('id'))),
             'by_priority': list(queryset.values('priority').annotate(count=Count('id'))),
@@ -202,6 +362,33 @@ class MeetingViewSet(viewsets.ModelViewSet):
         
         return Response(stats)
     
+    @action(detail=False, methods=['get'])
+    def analytics(self, request):
+        """Weekly attendance, no-show rate and time in meetings by type and category, from the rollups"""
+        serializer = MeetingAnalyticsSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        
+        queryset = MeetingWeeklyStats.objects.all()
+        if request.user.is_staff:
+            if params.get('user'):
+                queryset = queryset.filter(user_id=params['user'])
+        elif params.get('user', request.user.id) != request.user.id:
+            return Response(
+                {'error': 'Only staff can see the analytics of other users'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        else:
+            queryset = queryset.filter(user=request.user)
+        
+        end = week_start(timezone.now())
+        start = end - timedelta(weeks=params['weeks'] - 1)
+        return Response({
+            'start': start,
+            'end': end + timedelta(days=6),
+            'weeks': weekly_summary(queryset.filter(week_start__gte=start, week_start__lte=end)),
+        })
+    
     @action(detail=False, methods=['post'])
     def search(self, request):
         """Advanced meeting search"""
@@ -321,7 +508,7 @@ class MeetingAttendanceViewSet(viewsets.ModelViewSet):
         status_response = request.data.get('status')
         notes = request.data.get('response_notes', '')
         
-        if status_response not in ['accepted', 'declined', 'tentative']:
+        if status_response not in RESPONSE_STATUSES:
             return Response(
                 {'error': 'Invalid status'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -333,6 +520,20 @@ class MeetingAttendanceViewSet(viewsets.ModelViewSet):
         attendance.save()
         
         return Response({'message': f'Response recorded: {status_response}'})
+    
+    @action(detail=False, methods=['post'])
+    def bulk_respond(self, request):
+        """Respond to the invitations of several meetings at once"""
+        serializer = BulkRespondSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        answered, not_invited = respond(request.user, data['meetings'], data['status'], data['response_notes'])
+        return Response({
+            'message': f"Response recorded: {data['status']}",
+            'updated': answered,
+            'not_invited': not_invited,
+        })
 
 class MeetingReminderViewSet(viewsets.ModelViewSet):
     """ViewSet for MeetingReminder model"""
@@ -440,4 +641,67 @@ class CalendarIntegrationViewSet(viewsets.ModelViewSet):
         integration.last_sync = timezone.now()
         integration.save()
         
-        return Response({'message': 'Sync completed successfully'}) 
\ No newline at end of file
+        if integration.provider == 'ical':
+            # iCal clients pull the feed themselves
+            return Response({
+                'message': 'Subscribe to the feed URL in your calendar app',
+                'feed_url': CalendarIntegrationSerializer(integration, context={'request': request}).data['feed_url'],
+            })
+        return Response({'message': 'Sync completed successfully'})
+    
+    @action(detail=True, methods=['post'])
+    def rotate_feed_token(self, request, pk=None):
+        """Replace the secret feed URL, e.g. after it leaked"""
+        integration = self.get_object()
+        
+        if integration.provider != 'ical':
+            return Response(
+                {'error': 'Only iCal integrations have a feed'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        integration.rotate_feed_token()
+        return Response(CalendarIntegrationSerializer(integration, context={'request': request}).data)
+
+class CalendarFeedViewSet(viewsets.ViewSet):
+    """iCalendar feed of a user's meetings at the secret URL of their iCal integration.
+    
+    Calendar clients poll it; unchanged feeds are answered 304 to If-None-Match
+    from a single aggregate query, and rendered feeds are cached per version.
+    """
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+    lookup_field = 'token'
+    lookup_value_regex = '[A-Za-z0-9_-]+'
+    
+    def retrieve(self, request, token=None):
+        integration = CalendarIntegration.objects.select_related('user').filter(
+            feed_token=token, provider='ical', is_active=True, sync_meetings=True, user__is_active=True
+        ).first()
+        if integration is None:
+            raise Http404
+        
+        user = integration.user
+        queryset = feed_meetings(user)
+        etag = feed_version(queryset)
+        headers = {'Cache-Control': 'private, no-cache'}
+        if etag:
+            # No Last-Modified: deleting a meeting or removing an attendee would not move it
+            headers['ETag'] = f'"{etag}"'
+            not_modified = get_conditional_response(request, etag=headers['ETag'])
+            if not_modified is not None:
+                for name, value in headers.items():
+                    not_modified[name] = value
+                return not_modified
+        
+        cache_key = feed_cache_key(user, etag or 'empty')
+        body = cache.get(cache_key)
+        if body is not None:
+            response = HttpResponse(body, content_type='text/calendar; charset=utf-8')
+        else:
+            response = StreamingHttpResponse(cached_render(queryset, cache_key), content_type='text/calendar; charset=utf-8')
+        
+        response['Content-Disposition'] = 'inline; filename="meetings.ics"'
+        for name, value in headers.items():
+            response[name] = value
+        return response
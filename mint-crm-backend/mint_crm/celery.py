@@ -27,10 +27,42 @@ app.conf.beat_schedule = {
         'task': 'emails.tasks.send_scheduled_emails',
         'schedule': 300.0,  # Every 5 minutes
     },
+    'reconcile-inbox-counters': {
+        'task': 'emails.tasks.reconcile_inbox_counters',
+        'schedule': 3600.0,  # Every hour
+    },
+    'fail-stalled-sms': {
+        'task': 'emails.tasks.fail_stalled_sms',
+        'schedule': 900.0,  # Every 15 minutes
+    },
+    'process-sms-receipts': {
+        'task': 'emails.tasks.process_sms_receipts',
+        'schedule': 60.0,  # Backstop for the flush scheduled by the webhooks
+    },
     'cleanup-old-emails': {
         'task': 'emails.tasks.cleanup_old_emails',
         'schedule': 86400.0,  # Daily
     },
+    'reconcile-company-stats': {
+        'task': 'contacts.tasks.reconcile_company_stats',
+        'schedule': 3600.0,  # Every hour
+    },
+    'find-duplicate-contacts': {
+        'task': 'contacts.tasks.find_duplicate_contacts',
+        'schedule': 86400.0,  # Daily
+    },
+    'dispatch-meeting-reminders': {
+        'task': 'meetings.tasks.dispatch_meeting_reminders',
+        'schedule': 60.0,  # Every minute
+    },
+    'plan-recurring-reminders': {
+        'task': 'meetings.tasks.plan_recurring_reminders',
+        'schedule': 3600.0,  # Every hour, well inside the planning horizon
+    },
+    'reconcile-meeting-stats': {
+        'task': 'meetings.tasks.reconcile_meeting_stats',
+        'schedule': 86400.0,  # Daily
+    },
     'generate-daily-reports': {
         'task': 'reports.tasks.generate_daily_reports',
         'schedule': 86400.0,  # Daily at midnight
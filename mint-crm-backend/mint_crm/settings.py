@@ -22,6 +22,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.sites',
+    'django.contrib.postgres',
     
     # Third party apps
     'rest_framework',
@@ -176,6 +177,94 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@mintcrm.com')
 
+# SMS Dispatch Configuration
+SMS_DEFAULT_PROVIDER = config('SMS_DEFAULT_PROVIDER', default='stub')
+SMS_DISPATCH_MAX_WORKERS = config('SMS_DISPATCH_MAX_WORKERS', default=16, cast=int)
+SMS_PROVIDER_TIMEOUT = config('SMS_PROVIDER_TIMEOUT', default=10, cast=int)  # seconds
+SMS_STUB_LATENCY_MS = config('SMS_STUB_LATENCY_MS', default=0, cast=int)
+# Claimed messages still sending after this long are failed; well above a dispatch batch
+SMS_SENDING_TIMEOUT = config('SMS_SENDING_TIMEOUT', default=1800, cast=int)  # seconds
+# Messages per second per (provider, sender number), enforced per worker process
+SMS_RATE_LIMITS = {
+    'twilio': 100,
+    'aws_sns': 20,
+    'nexmo': 30,
+    'stub': 1000,
+    'default': 10,
+}
+
+# Rows fetched per database round trip by the streaming export endpoints
+EXPORT_CHUNK_SIZE = 2000
+
+# Contact typeahead result limits
+CONTACT_TYPEAHEAD_LIMIT = 10
+CONTACT_TYPEAHEAD_MAX_LIMIT = 25
+
+# Companies listed in the contact stats breakdown
+CONTACT_STATS_TOP_COMPANIES = 10
+
+# Contact timeline page sizes
+CONTACT_TIMELINE_PAGE_SIZE = 25
+CONTACT_TIMELINE_MAX_PAGE_SIZE = 100
+
+# Duplicate contact detection: larger blocks are skipped, lower scores are not suggested
+CONTACT_DEDUPE_MAX_BLOCK_SIZE = config('CONTACT_DEDUPE_MAX_BLOCK_SIZE', default=50, cast=int)
+CONTACT_DEDUPE_MIN_SCORE = config('CONTACT_DEDUPE_MIN_SCORE', default=0.5, cast=float)
+
+# Longest calendar window, occurrences expanded per series and window, and how long expansions are cached
+MEETING_CALENDAR_MAX_WINDOW_DAYS = 366
+MEETING_OCCURRENCE_LIMIT = 1000
+MEETING_OCCURRENCE_CACHE_TIMEOUT = config('MEETING_OCCURRENCE_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Free/busy: default working hours (weekdays 0-4 are Monday to Friday), slot spacing and limits
+MEETING_WORKING_HOURS_START = config('MEETING_WORKING_HOURS_START', default='09:00')
+MEETING_WORKING_HOURS_END = config('MEETING_WORKING_HOURS_END', default='17:00')
+MEETING_WORKING_DAYS = [0, 1, 2, 3, 4]
+MEETING_SLOT_STEP_MINUTES = 15
+MEETING_FREEBUSY_SLOT_LIMIT = 50
+MEETING_FREEBUSY_MAX_USERS = 100
+
+# What happens when a new or changed meeting double-books someone: reject, warn or allow.
+# Occurrences of recurring meetings are checked this many days ahead.
+MEETING_CONFLICT_POLICY = config('MEETING_CONFLICT_POLICY', default='allow')
+MEETING_CONFLICT_HORIZON_DAYS = 90
+
+# Meeting reminders: channels (email, sms, push) each attendee is reminded on, how far ahead
+# recurring occurrences get reminder rows, and how many reminders one delivery batch sends
+MEETING_REMINDER_CHANNELS = config('MEETING_REMINDER_CHANNELS', default='email,push', cast=lambda v: [c.strip() for c in v.split(',') if c.strip()])
+MEETING_REMINDER_HORIZON_HOURS = 48
+MEETING_REMINDER_BATCH_SIZE = config('MEETING_REMINDER_BATCH_SIZE', default=500, cast=int)
+# Reminders that fail to send are retried this many minutes later, up to the attempt limit
+MEETING_REMINDER_MAX_ATTEMPTS = 3
+MEETING_REMINDER_RETRY_MINUTES = 5
+# Reminders still go out this many minutes after the meeting started, so those due at the start
+# (reminder_minutes=0) or in the last minute before it survive the once-a-minute dispatch
+MEETING_REMINDER_GRACE_MINUTES = 5
+
+# iCalendar feeds: days of past meetings included, meetings rendered per query, and how long a
+# rendered feed is kept (a change to any meeting in the feed makes a new version anyway)
+MEETING_FEED_PAST_DAYS = 90
+MEETING_FEED_CHUNK_SIZE = 500
+MEETING_FEED_CACHE_TIMEOUT = config('MEETING_FEED_CACHE_TIMEOUT', default=86400, cast=int)
+
+# Most meetings one bulk RSVP answers, and attendees one check-in marks
+MEETING_ATTENDANCE_BATCH_LIMIT = 5000
+
+# Phone numbers without an international prefix are stored as numbers in this country
+PHONE_DEFAULT_COUNTRY_CODE = config('PHONE_DEFAULT_COUNTRY_CODE', default='1')
+PHONE_NATIONAL_NUMBER_LENGTH = config('PHONE_NATIONAL_NUMBER_LENGTH', default=10, cast=int)
+
+# SMS delivery receipts are buffered in Redis and applied in batches by a worker
+SMS_RECEIPT_QUEUE_URL = config('SMS_RECEIPT_QUEUE_URL', default=config('CELERY_BROKER_URL', default='redis://localhost:6379/0'))
+SMS_RECEIPT_BATCH_SIZE = config('SMS_RECEIPT_BATCH_SIZE', default=1000, cast=int)
+SMS_RECEIPT_FLUSH_DELAY = config('SMS_RECEIPT_FLUSH_DELAY', default=2, cast=int)
+# Receipts for messages whose provider id is not saved yet are retried this often, for this long (seconds);
+# the window outlasts a dispatch batch, whose ids are saved when the whole batch has gone out
+SMS_RECEIPT_RETRY_DELAY = config('SMS_RECEIPT_RETRY_DELAY', default=30, cast=int)
+SMS_RECEIPT_RETRY_WINDOW = config('SMS_RECEIPT_RETRY_WINDOW', default=900, cast=int)
+# Required: SMS webhooks reject every callback while it is empty
+SMS_WEBHOOK_TOKEN = config('SMS_WEBHOOK_TOKEN', default='')
+
 # Celery Configuration
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://localhost:6379/0')
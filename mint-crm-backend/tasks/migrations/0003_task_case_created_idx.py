@@ -0,0 +1,20 @@
+# Generated by Django 5.0.2 on 2026-10-19 02:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0002_initial'),
+        ('tasks', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['case', 'created_at'], name='tasks_task_case_id_7f5f54_idx'),
+        ),
+    ]
@@ -48,6 +48,7 @@ class Task(models.Model):
             models.Index(fields=['status', 'priority']),
             models.Index(fields=['assigned_to', 'status']),
             models.Index(fields=['due_date']),
+            models.Index(fields=['case', 'created_at']),
         ]
     
     def __str__(self):
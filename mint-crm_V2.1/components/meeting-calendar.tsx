@@ -84,6 +84,13 @@ export default function MeetingCalendar() {
     }
   }
 
+  // List responses carry attendee ids only; names come from the loaded users
+  function attendeesOf(meeting: Meeting): User[] {
+    if (meeting.attendees) return meeting.attendees
+    const ids = new Set(meeting.attendee_ids ?? [])
+    return users.filter((u) => ids.has(u.id))
+  }
+
   async function handleCreateMeeting() {
     setCreating(true)
     setError(null)
@@ -148,7 +155,7 @@ export default function MeetingCalendar() {
       date: meeting.start_time ? meeting.start_time.slice(0, 10) : "",
       time: meeting.start_time ? new Date(meeting.start_time).toISOString().slice(11, 16) : "",
       duration: meeting.duration_minutes ? String(meeting.duration_minutes) : "60",
-      attendees: meeting.attendees ? meeting.attendees.map((u: any) => u.id) : [],
+      attendees: meeting.attendee_ids ?? attendeesOf(meeting).map((u) => u.id),
       meetingLink: meeting.meeting_url || "",
       is_recurring: meeting.is_recurring || false,
       recurrence_pattern: meeting.recurrence_pattern || "none",
@@ -168,37 +175,36 @@ export default function MeetingCalendar() {
         ? new Date(start_time.getTime() + Number(editMeeting.duration) * 60000)
         : null
       if (!start_time || !end_time) throw new Error("Please provide date and time")
-      // Merge all required fields from selectedMeeting and editMeeting
-      const payload = {
+      // List rows leave out agenda, notes and other long fields, so the edit is compared
+      // with the full meeting and only the fields that changed are sent
+      const current = await apiService.getMeeting(selectedMeeting.id)
+      const edited: Record<string, any> = {
         title: editMeeting.title,
         description: editMeeting.description,
-        meeting_type: editMeeting.type,
-        status: selectedMeeting.status || 'scheduled',
-        priority: selectedMeeting.priority || 'medium',
+        meeting_type: editMeeting.type ?? editMeeting.meeting_type,
         start_time: start_time.toISOString(),
         end_time: end_time.toISOString(),
-        timezone: selectedMeeting.timezone || 'UTC',
-        all_day: selectedMeeting.all_day || false,
         location: editMeeting.location,
-        location_type: editMeeting.location?.toLowerCase().includes("virtual") ? "virtual" : "physical",
         meeting_url: editMeeting.meetingLink,
-        category: selectedMeeting.category?.id ?? null,
-        case: typeof selectedMeeting.case === 'object' && selectedMeeting.case !== null ? selectedMeeting.case.id : (typeof selectedMeeting.case === 'number' ? selectedMeeting.case : null),
-        contact: typeof selectedMeeting.contact === 'object' && selectedMeeting.contact !== null ? selectedMeeting.contact.id : (typeof selectedMeeting.contact === 'number' ? selectedMeeting.contact : null),
-        company: typeof selectedMeeting.company === 'object' && selectedMeeting.company !== null ? selectedMeeting.company.id : (typeof selectedMeeting.company === 'number' ? selectedMeeting.company : null),
         is_recurring: editMeeting.is_recurring,
-        recurrence_pattern: editMeeting.is_recurring ? editMeeting.recurrence_pattern : "none",
-        recurrence_end_date: editMeeting.is_recurring && editMeeting.recurrence_end_date ? editMeeting.recurrence_end_date : null,
-        recurrence_rule: selectedMeeting.recurrence_rule || {},
-        reminder_minutes: selectedMeeting.reminder_minutes || 15,
-        send_reminders: selectedMeeting.send_reminders || true,
-        agenda: selectedMeeting.agenda || '',
-        notes: selectedMeeting.notes || '',
-        outcome: selectedMeeting.outcome || '',
-        is_private: selectedMeeting.is_private || false,
-        attendee_ids: editMeeting.attendees,
+        attendee_ids: [...editMeeting.attendees].sort((a: number, b: number) => a - b),
+      }
+      const stored: Record<string, any> = {
+        ...current,
+        start_time: new Date(current.start_time).toISOString(),
+        end_time: new Date(current.end_time).toISOString(),
+        attendee_ids: (current.attendees ?? []).map((u) => u.id).sort((a, b) => a - b),
+      }
+      const payload = Object.fromEntries(
+        Object.entries(edited).filter(([key, value]) => JSON.stringify(value) !== JSON.stringify(stored[key]))
+      )
+      if ("location" in payload) {
+        payload.location_type = editMeeting.location?.toLowerCase().includes("virtual") ? "virtual" : "physical"
+      }
+      if (Object.keys(payload).length) {
+        await apiService.patchMeeting(selectedMeeting.id, payload)
       }
-      const updated = await apiService.updateMeeting(selectedMeeting.id, payload)
+      const updated = await apiService.getMeeting(selectedMeeting.id)
       setMeetings((prev) => prev.map((m) => (m.id === updated.id ? updated : m)))
       setEditMode(false)
       setEditMeeting(null)
@@ -249,7 +255,7 @@ export default function MeetingCalendar() {
     const matchesSearch =
       meeting.title.toLowerCase().includes(searchLower) ||
       meeting.description?.toLowerCase().includes(searchLower) ||
-      (meeting.attendees && meeting.attendees.some((a: any) => `${a.first_name} ${a.last_name}`.toLowerCase().includes(searchLower)))
+      attendeesOf(meeting).some((a) => `${a.first_name} ${a.last_name}`.toLowerCase().includes(searchLower))
     // Filter by type
     const matchesType = filterType ? meeting.meeting_type === filterType : true
     // Filter by status
@@ -638,7 +644,7 @@ export default function MeetingCalendar() {
                           <span className="text-sm text-muted-foreground">Organizer:</span>
                           <span className="text-sm font-medium">{meeting.organizer?.first_name} {meeting.organizer?.last_name}</span>
                           <span className="text-sm text-muted-foreground">•</span>
-                          <span className="text-sm text-muted-foreground">{meeting.attendees?.length || 0} attendees</span>
+                          <span className="text-sm text-muted-foreground">{meeting.attendee_count ?? meeting.attendees?.length ?? 0} attendees</span>
                         </div>
                       </div>
 
@@ -688,15 +694,15 @@ export default function MeetingCalendar() {
                           <span>{meeting.location}</span>
                         </div>
                         <div className="flex items-center space-x-2">
-                          {meeting.attendees?.slice(0, 3).map((attendee) => (
+                          {attendeesOf(meeting).slice(0, 3).map((attendee) => (
                             <Avatar key={attendee.id} className="h-6 w-6">
                               <AvatarFallback className="text-xs">
                                 {attendee.first_name?.[0]}{attendee.last_name?.[0]}
                               </AvatarFallback>
                             </Avatar>
                           ))}
-                          {meeting.attendees && meeting.attendees.length > 3 && (
-                            <span className="text-xs text-muted-foreground">+{meeting.attendees.length - 3} more</span>
+                          {(meeting.attendee_count ?? attendeesOf(meeting).length) > 3 && (
+                            <span className="text-xs text-muted-foreground">+{(meeting.attendee_count ?? attendeesOf(meeting).length) - 3} more</span>
                           )}
                         </div>
                       </div>
@@ -744,7 +750,7 @@ export default function MeetingCalendar() {
                 </div>
                 <div className="text-sm">Location: {selectedMeeting.location}</div>
                 <div className="text-sm">Organizer: {selectedMeeting.organizer?.first_name} {selectedMeeting.organizer?.last_name}</div>
-                <div className="text-sm">Attendees: {selectedMeeting.attendees?.map((u: any) => `${u.first_name} ${u.last_name}`).join(", ")}</div>
+                <div className="text-sm">Attendees: {attendeesOf(selectedMeeting).map((u) => `${u.first_name} ${u.last_name}`).join(", ")}</div>
                 {selectedMeeting.is_recurring && (
                   <div className="text-sm">Recurrence: Repeats {selectedMeeting.recurrence_pattern ?? ''}{selectedMeeting.recurrence_end_date ? ` until ${selectedMeeting.recurrence_end_date}` : ''}</div>
                 )}
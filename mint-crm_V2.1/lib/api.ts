@@ -384,7 +384,7 @@ export interface EmailProvider {
 export interface SMS {
   id: number;
   sms_type: 'inbound' | 'outbound' | 'system';
-  status: 'draft' | 'queued' | 'sent' | 'delivered' | 'failed' | 'undelivered';
+  status: 'draft' | 'queued' | 'sending' | 'sent' | 'delivered' | 'failed' | 'undelivered';
   message: string;
   from_number: string;
   to_number: string;
@@ -527,7 +527,10 @@ export interface Meeting {
   location_type: 'physical' | 'virtual' | 'hybrid';
   meeting_url: string;
   organizer: User;
-  attendees: User[];
+  // Detail responses nest the attendees; list responses carry only their ids and count
+  attendees?: User[];
+  attendee_ids?: number[];
+  attendee_count?: number;
   category: MeetingCategory | null;
   case: string | null;
   contact: string | null;
@@ -544,8 +547,8 @@ export interface Meeting {
   is_private: boolean;
   created_at: string;
   updated_at: string;
-  attendances: MeetingAttendance[];
-  reminders: MeetingReminder[];
+  attendances?: MeetingAttendance[];
+  reminders?: MeetingReminder[];
   duration_minutes: number;
   is_past: boolean;
   is_ongoing: boolean;
@@ -629,6 +632,26 @@ export interface MeetingStats {
   by_priority: Array<{ priority: string; count: number }>;
 }
 
+export interface MeetingAnalyticsMeasures {
+  invited: number;
+  attended: number;
+  no_shows: number;
+  minutes: number;
+}
+
+export interface MeetingAnalyticsWeek extends MeetingAnalyticsMeasures {
+  week_start: string;
+  no_show_rate: number | null;
+  by_type: Array<MeetingAnalyticsMeasures & { meeting_type: string }>;
+  by_category: Array<MeetingAnalyticsMeasures & { category: number | null; category_name: string | null }>;
+}
+
+export interface MeetingAnalytics {
+  start: string;
+  end: string;
+  weeks: MeetingAnalyticsWeek[];
+}
+
 export interface MeetingSearchParams {
   search?: string;
   start_date?: string;
@@ -1608,6 +1631,14 @@ class ApiService {
     return response;
   }
 
+  async patchMeeting(id: number, data: any): Promise<Meeting> {
+    const response = await this.request<Meeting>(`/meetings/${id}/`, {
+      method: 'PATCH',
+      body: JSON.stringify(data),
+    });
+    return response;
+  }
+
   async deleteMeeting(id: number): Promise<void> {
     await this.request(`/meetings/${id}/`, {
       method: 'DELETE',
@@ -1625,6 +1656,15 @@ class ApiService {
     return response;
   }
 
+  // Mark several attendees as attended (organizer only)
+  async checkInAttendees(id: number, userIds: number[]): Promise<{ checked_in: number; not_attendees: number[] }> {
+    const response = await this.request<{ checked_in: number; not_attendees: number[] }>(`/meetings/${id}/check_in/`, {
+      method: 'POST',
+      body: JSON.stringify({ user_ids: userIds }),
+    });
+    return response;
+  }
+
   async completeMeeting(id: number): Promise<any> {
     const response = await this.request<any>(`/meetings/${id}/complete/`);
     return response;
@@ -1659,6 +1699,14 @@ class ApiService {
     return response;
   }
 
+  // Get weekly attendance analytics; staff may pass a user id
+  async getMeetingAnalytics(weeks = 12, user?: number): Promise<MeetingAnalytics> {
+    const params = new URLSearchParams({ weeks: String(weeks) });
+    if (user !== undefined) params.append('user', String(user));
+    const response = await this.request<MeetingAnalytics>(`/meetings/analytics/?${params.toString()}`);
+    return response;
+  }
+
   // Search meetings
   async searchMeetings(params: MeetingSearchParams): Promise<{ results: Meeting[]; count: number }> {
     const response = await this.request<{ results: Meeting[]; count: number }>(`/meetings/search/`, {
@@ -1751,6 +1799,22 @@ class ApiService {
     return response;
   }
 
+  // Respond to the invitations of several meetings at once
+  async bulkRespondToInvitations(
+    meetingIds: number[],
+    status: string,
+    notes?: string
+  ): Promise<{ message: string; updated: number[]; not_invited: number[] }> {
+    const response = await this.request<{ message: string; updated: number[]; not_invited: number[] }>(
+      '/meeting-attendance/bulk_respond/',
+      {
+        method: 'POST',
+        body: JSON.stringify({ meetings: meetingIds, status, response_notes: notes }),
+      }
+    );
+    return response;
+  }
+
   // Meeting Reminder API Methods
   async getReminders(params?: any): Promise<{ results: MeetingReminder[]; count: number }> {
     const queryString = params ? `?${new URLSearchParams(params).toString()}` : '';